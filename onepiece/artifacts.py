@@ -0,0 +1,364 @@
+"""Build a chapter's artifacts from its page images in one pass.
+
+``download_chapter`` used to go over the pages three times: ``images_to_pdf``,
+then ``images_to_cbz``, then ``ensure_discord_copy`` -> ``compress_pdf_to_size``,
+which decoded every page again. ``run_sinks`` reads each page file once and
+hands the bytes to every sink, each on its own thread:
+
+  PdfSink       the full PDF (onepiece.pdfwriter; JPEG pages passed through)
+  CbzSink       the CBZ (page bytes stored as-is)
+  PreviewSink   the cover preview, draft-decoded from page 1
+  DiscordSink   the Discord-sized PDF at a compression step chosen up front
+                by ``plan_compression``; pages are encoded on a small pool
+
+Each sink has a bounded queue (ARTIFACT_QUEUE_PAGES), so the reader never runs
+more than a few pages ahead of the slowest sink and memory stays flat however
+long the chapter is. Every sink writes to a temp file and renames it into
+place at the end; if any sink fails mid-chapter, all of them are discarded.
+
+Also home to the image helpers shared with ``compress_pdf_to_size`` (draft
+decoding, fitting to a width) and the one size model for the Discord copy:
+the compression ladder and ``CompressionPlan``, which both ``plan_compression``
+and ``compress_pdf_to_size`` use.
+
+Env:
+  ARTIFACT_QUEUE_PAGES   pages buffered per sink (default 4)
+  PREVIEW_MAX_WIDTH      cover preview width, px; 0 keeps the full page (default 1000)
+  COMPRESS_WORKERS       threads encoding Discord-copy pages (default: all cores)
+"""
+
+import io
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from .atomic import atomic_write
+from .cbz import CbzWriter
+from .pdfwriter import PdfWriter, encode_jpeg
+
+# Discord-copy compression steps, (max_width_px, jpeg_quality) — least
+# aggressive first. CompressionPlan predicts which fits.
+COMPRESS_LADDER = [
+    (1600, 75),
+    (1400, 65),
+    (1200, 60),
+    (1100, 50),
+    (1000, 45),
+    (900,  40),
+    (800,  35),
+]
+COMPRESS_SAMPLE_PAGES = 4   # pages encoded per step to estimate bytes-per-pixel
+PDF_PAGE_OVERHEAD = 600     # bytes of PDF structure per image page
+
+
+def fit_width(img, max_width):
+    """Downscale a Pillow image to at most max_width wide (aspect kept)."""
+    if img.width <= max_width:
+        return img
+    ratio = max_width / img.width
+    return img.resize((max_width, max(1, int(img.height * ratio))), Image.LANCZOS)
+
+
+def _fitted_pixels(size, max_width):
+    width, height = size
+    if width <= max_width:
+        return width * height
+    return max_width * max(1, int(height * max_width / width))
+
+
+def open_rgb(path, max_width=None):
+    """Decode an image (a path or file object) to RGB. For a JPEG wider than
+    ``max_width``, ask the decoder for a draft at 1/2, 1/4 or 1/8 scale — the
+    smallest that is still at least ``max_width`` wide — which is much faster
+    and smaller than a full decode. Callers finish with a LANCZOS resize
+    (fit_width)."""
+    img = Image.open(path)
+    if max_width and img.format == "JPEG" and img.width > max_width:
+        img.draft("RGB", (max_width, max(1, img.height * max_width // img.width)))
+    return img.convert("RGB")
+
+
+def _draft_scale(width, max_width):
+    """The reduction (1, 2, 4 or 8) a JPEG draft decode gives for max_width."""
+    scale = 1
+    while scale < 8 and width // (scale * 2) >= max_width:
+        scale *= 2
+    return scale
+
+
+def _sample_indices(n, k):
+    """Up to k indices spread evenly over range(n), ends included."""
+    if n <= k:
+        return list(range(n))
+    return sorted({round(i * (n - 1) / (k - 1)) for i in range(k)})
+
+
+def _extrapolate(encoded, pixels, sizes, max_width):
+    """Predicted PDF bytes for a whole chapter at max_width, from the encoded
+    bytes / pixels of some sample pages and every page's (w, h)."""
+    total_pixels = sum(_fitted_pixels(size, max_width) for size in sizes)
+    return int(encoded / pixels * total_pixels + PDF_PAGE_OVERHEAD * len(sizes))
+
+
+def page_headers(image_paths):
+    """(sizes, is_jpeg) for each page, from the image headers only."""
+    sizes, jpeg = [], []
+    for p in image_paths:
+        with Image.open(p) as im:
+            sizes.append(im.size)
+            jpeg.append(im.format == "JPEG")
+    return sizes, jpeg
+
+
+class CompressionPlan:
+    """The size model for a chapter's Discord copy: predicts, per ladder step,
+    the PDF bytes from a few sample pages encoded in memory, and picks the
+    least aggressive step predicted to fit ``max_bytes``.
+
+    Pages are draft-decoded once and re-decoded only when a step needs a
+    different reduction; ``encode`` reuses those decodes for full encodes.
+    After a full encode misses, ``learn`` scales later predictions by how far
+    off this one was. Sample encodes run on ``pool`` if one is given."""
+
+    def __init__(self, image_paths, max_bytes, ladder=COMPRESS_LADDER, pool=None):
+        self.image_paths = image_paths
+        self.max_bytes = max_bytes
+        self.ladder = ladder
+        self.pool = pool
+        self.sizes, self.jpeg = page_headers(image_paths)
+        self.sample = _sample_indices(len(image_paths), COMPRESS_SAMPLE_PAGES)
+        self.predictions = {}
+        self.correction = 1.0  # actual / predicted, from a missed full encode
+        self.decodes = self.sample_encodes = 0
+        self._decoded = {}  # idx -> (draft scale, image)
+
+    def page(self, idx, max_width):
+        """Page ``idx`` decoded for ``max_width`` (not yet resized)."""
+        scale = _draft_scale(self.sizes[idx][0], max_width) if self.jpeg[idx] else 1
+        cached = self._decoded.get(idx)
+        if cached is None or cached[0] != scale:
+            cached = self._decoded[idx] = (scale, open_rgb(self.image_paths[idx], max_width))
+            self.decodes += 1
+        return cached[1]
+
+    def encode(self, idx, max_width, quality):
+        """Page ``idx`` fitted to ``max_width`` and JPEG-encoded (encode_jpeg)."""
+        return encode_jpeg(fit_width(self.page(idx, max_width), max_width), quality)
+
+    def _sample_one(self, idx, max_width, quality):
+        data, width, height, _ = self.encode(idx, max_width, quality)
+        return len(data), width * height
+
+    def predict(self, step):
+        """Predicted PDF bytes at ladder step ``step`` (before correction)."""
+        if step not in self.predictions:
+            max_width, quality = self.ladder[step]
+            mapper = self.pool.map if self.pool else map
+            results = list(mapper(lambda idx: self._sample_one(idx, max_width, quality),
+                                  self.sample))
+            self.sample_encodes += len(results)
+            self.predictions[step] = _extrapolate(sum(r[0] for r in results),
+                                                  sum(r[1] for r in results),
+                                                  self.sizes, max_width)
+        return self.predictions[step]
+
+    def choose(self, first=0):
+        """First step from ``first`` predicted to fit; else the last step."""
+        for step in range(first, len(self.ladder)):
+            if self.predict(step) * self.correction <= self.max_bytes:
+                return step
+        return len(self.ladder) - 1
+
+    def learn(self, step, actual):
+        """A full encode at ``step`` came out ``actual`` bytes."""
+        self.correction = actual / self.predictions[step]
+
+
+def plan_compression(image_paths, max_bytes, ladder=COMPRESS_LADDER):
+    """Predict the least aggressive ladder step whose PDF fits in max_bytes
+    (see CompressionPlan). Returns (step, predicted bytes); the last step if
+    none is predicted to fit."""
+    plan = CompressionPlan(image_paths, max_bytes, ladder)
+    step = plan.choose()
+    return step, plan.predictions[step]
+
+
+def save_preview(source, preview_path, width=None):
+    """Save a page (path or file object) as a PNG preview no wider than
+    ``width`` (PREVIEW_MAX_WIDTH; 0 keeps full size)."""
+    if width is None:
+        width = int(os.environ.get("PREVIEW_MAX_WIDTH", 1000))
+    img = open_rgb(source, width or None)
+    if width:
+        img = fit_width(img, width)
+    img.save(preview_path, "PNG")
+
+
+# -- sinks -----------------------------------------------------------------
+# A sink gets add(index, path, data) once per page in reading order (from its
+# own thread), then exactly one of close() or abort().
+
+class PdfSink:
+    def __init__(self, output_pdf):
+        self.path = output_pdf
+        self.pdf = PdfWriter(output_pdf)
+
+    def add(self, index, path, data):
+        self.pdf.add_image_bytes(data)
+
+    def close(self):
+        self.pdf.close()
+
+    def abort(self):
+        self.pdf.abort()
+
+
+class CbzSink:
+    def __init__(self, output_cbz):
+        self.path = output_cbz
+        self.cbz = CbzWriter(output_cbz)
+
+    def add(self, index, path, data):
+        self.cbz.add_bytes(data, os.path.splitext(path)[1])
+
+    def close(self):
+        self.cbz.close()
+
+    def abort(self):
+        self.cbz.abort()
+
+
+class PreviewSink:
+    def __init__(self, preview_path, width=None):
+        self.path = preview_path
+        self.width = width
+        self.png = None
+
+    def add(self, index, path, data):
+        if index == 0:
+            self.png = io.BytesIO()
+            save_preview(io.BytesIO(data), self.png, self.width)
+
+    def close(self):
+        if self.png is not None:
+            atomic_write(self.path, self.png.getvalue())
+
+    def abort(self):
+        self.png = None
+
+
+class DiscordSink:
+    """Downscale and re-encode each page at one (max_width, quality) step into
+    a PDF. Up to ``workers`` pages are encoded at a time and written in order.
+    Stops encoding once the output passes max_bytes (the prediction missed);
+    ``fits`` then stays False and close() leaves no file behind. With
+    ``best_effort`` (the last ladder step: nothing smaller to fall back to) it
+    finishes and keeps the file either way."""
+
+    def __init__(self, output_pdf, max_width, quality, max_bytes, workers=None,
+                 best_effort=False):
+        self.path = output_pdf
+        self.max_width = max_width
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.best_effort = best_effort
+        self.workers = max(1, int(workers or os.environ.get("COMPRESS_WORKERS")
+                                  or os.cpu_count() or 1))
+        self.pdf = PdfWriter(output_pdf)
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        self.pending = deque()
+        self.size = 0
+        self.over = False
+        self.fits = False
+
+    def _encode(self, data):
+        img = open_rgb(io.BytesIO(data), self.max_width)
+        return encode_jpeg(fit_width(img, self.max_width), self.quality)
+
+    def _write(self, page):
+        self.pdf.add_jpeg(*page)
+        self.size += len(page[0]) + PDF_PAGE_OVERHEAD
+        if self.size > self.max_bytes and not self.best_effort:
+            self.over = True
+
+    def add(self, index, path, data):
+        if self.over:
+            return
+        self.pending.append(self.pool.submit(self._encode, data))
+        while len(self.pending) >= self.workers and not self.over:
+            self._write(self.pending.popleft().result())
+
+    def close(self):
+        while self.pending and not self.over:
+            self._write(self.pending.popleft().result())
+        self.pool.shutdown(cancel_futures=True)
+        if self.over:
+            self.pdf.abort()
+            return
+        self.pdf.close()
+        self.fits = os.path.getsize(self.path) <= self.max_bytes
+
+    def abort(self):
+        self.pool.shutdown(cancel_futures=True)
+        self.pdf.abort()
+
+
+def run_sinks(image_paths, sinks, depth=None):
+    """Read each page once and feed it to every sink, each sink on its own
+    thread behind a queue of ``depth`` pages (ARTIFACT_QUEUE_PAGES). Closes
+    every sink if all succeeded; otherwise aborts them all and re-raises the
+    first error."""
+    depth = max(1, int(depth or os.environ.get("ARTIFACT_QUEUE_PAGES", 4)))
+    queues = [queue.Queue(maxsize=depth) for _ in sinks]
+    errors = [None] * len(sinks)
+
+    def drain(k):
+        # Keep consuming after a failure so the reader never blocks on us.
+        while True:
+            item = queues[k].get()
+            if item is None:
+                return
+            if errors[k] is None:
+                try:
+                    sinks[k].add(*item)
+                except Exception as e:
+                    errors[k] = e
+
+    threads = [threading.Thread(target=drain, args=(k,), daemon=True)
+               for k in range(len(sinks))]
+    for t in threads:
+        t.start()
+    try:
+        for i, path in enumerate(image_paths):
+            with open(path, "rb") as f:
+                data = f.read()
+            for k, q in enumerate(queues):
+                if errors[k] is None:
+                    q.put((i, path, data))
+    except Exception as e:
+        errors.append(e)
+    finally:
+        for q in queues:
+            q.put(None)
+        for t in threads:
+            t.join()
+
+    failed = next((e for e in errors if e is not None), None)
+    if failed is None:
+        for k, sink in enumerate(sinks):
+            try:
+                sink.close()
+            except Exception as e:
+                failed = e
+                for rest in sinks[k + 1:]:
+                    rest.abort()
+                break
+    else:
+        for sink in sinks:
+            sink.abort()
+    if failed is not None:
+        raise failed
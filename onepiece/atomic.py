@@ -0,0 +1,214 @@
+"""Atomic, crash-safe file writes for the shared storage.
+
+Storage used to rewrite its small mutable files (chapter metadata,
+``last_chapter.txt``, request markers, ...) in place, so a reader in another
+container could open one half-written — truncated JSON, an empty chapter
+number. ``atomic_write`` writes a temp file next to the target and renames it
+over, so readers see the old content or the new, never a mix:
+
+    atomic_write(storage.meta_path(1160), json.dumps(meta))
+
+Durability follows STORAGE_FSYNC:
+
+  always   (default) fsync the temp file before the rename and the directory
+           after it, so a power cut can't leave an empty or missing file
+  never    rename only: still atomic for readers, but the last writes may be
+           lost to a power cut (not to a process crash)
+
+A heavy backfill can batch that cost instead of paying an fsync per file:
+
+    with batch():
+        for ch in chapters:
+            ...  # atomic writes here skip their own fsyncs
+    # one syncfs(2) for the filesystem, then one fsync per touched directory
+
+Writes inside ``batch()`` are still visible (renamed) at once; only their
+durability waits for the end of the block. Batches are per thread and nest.
+``sync(f)`` is the same policy for files written other ways (the journal's
+appends). Writers that stream a big file into ``temp_path(path)`` themselves
+(PDFs, CBZs) ``sync`` it and ``commit`` it into place.
+
+A writer killed mid-write leaves its temp file (``.<name>.<pid>.<tid>.tmp``,
+see ``temp_path``) behind. ``sweep_temp(dir)`` removes the ones older than
+TEMP_MAX_AGE; Storage runs it over its directories at startup. Age rather
+than pid decides, since writers in other containers have their own pids.
+
+Stdlib only.
+
+Env:
+  STORAGE_FSYNC   always (default) | never
+"""
+
+import ctypes
+import ctypes.util
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+
+# A temp file is open for milliseconds; one this old was left by a crash.
+TEMP_MAX_AGE = 3600
+_TEMP_RE = re.compile(r"\..+\.\d+\.\d+\.tmp$")
+
+
+def fsync_enabled():
+    return os.environ.get("STORAGE_FSYNC", "always").lower() not in ("never", "0", "off")
+
+
+def _current_batch():
+    return getattr(_local, "batch", None)
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass  # some filesystems don't support fsync on a directory
+    finally:
+        os.close(fd)
+
+
+def sync(f):
+    """Make an open file's writes durable per STORAGE_FSYNC, or leave that
+    to the enclosing ``batch()``."""
+    f.flush()
+    if not fsync_enabled():
+        return
+    pending = _current_batch()
+    if pending is not None:
+        pending["files"].add(os.path.abspath(f.name))
+        return
+    os.fsync(f.fileno())
+
+
+def temp_path(path):
+    """This thread's temp file for writing ``path``: hidden, in the same
+    directory (so the rename is atomic) and matched by ``sweep_temp``."""
+    directory = os.path.dirname(os.path.abspath(path))
+    return os.path.join(directory, f".{os.path.basename(path)}."
+                                   f"{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def sweep_temp(directory, max_age=TEMP_MAX_AGE):
+    """Remove temp files crashed writers left in ``directory`` (not
+    recursive). Returns how many were removed."""
+    removed = 0
+    cutoff = time.time() - max_age
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        if not _TEMP_RE.match(name):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+@contextmanager
+def atomic_open(path, mode="w"):
+    """Open a temp file to write ``path``'s new content; on a clean exit it
+    replaces ``path`` in one rename. On an exception the temp file is removed
+    and ``path`` is left as it was."""
+    tmp = temp_path(path)
+    try:
+        with open(tmp, mode) as f:
+            yield f
+            sync(f)
+        commit(tmp, path)
+    except BaseException:
+        discard(tmp)
+        raise
+
+
+def commit(tmp, path):
+    """Rename a finished temp file (see ``temp_path``) over ``path`` and make
+    the rename durable per STORAGE_FSYNC. For writers that stream into the
+    temp file themselves: ``sync`` it, close it, then commit."""
+    os.replace(tmp, path)
+    if not fsync_enabled():
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    pending = _current_batch()
+    if pending is not None:
+        pending["files"].add(os.path.abspath(path))
+        pending["dirs"].add(directory)
+    else:
+        _fsync_dir(directory)
+
+
+def discard(tmp):
+    """Remove an abandoned temp file, if it's there."""
+    try:
+        os.remove(tmp)
+    except FileNotFoundError:
+        pass
+
+
+def atomic_write(path, data):
+    """Replace ``path`` with ``data`` (str or bytes) atomically."""
+    with atomic_open(path, "wb" if isinstance(data, bytes) else "w") as f:
+        f.write(data)
+
+
+def _syncfs(path):
+    """syncfs(2) on the filesystem holding ``path``. False if unavailable."""
+    libc_name = ctypes.util.find_library("c")
+    if not libc_name:
+        return False
+    try:
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        fd = os.open(path, os.O_RDONLY)
+    except (OSError, AttributeError):
+        return False
+    try:
+        return libc.syncfs(fd) == 0
+    except AttributeError:
+        return False
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def batch():
+    """Defer the fsyncs of the writes in this block (this thread) to its end."""
+    if _current_batch() is not None:
+        yield  # nested: the outermost batch flushes
+        return
+    _local.batch = pending = {"files": set(), "dirs": set()}
+    try:
+        yield
+    finally:
+        _local.batch = None
+        _flush(pending)
+
+
+def _flush(pending):
+    if not pending["files"] and not pending["dirs"]:
+        return
+    anchor = next(iter(pending["dirs"] or pending["files"]))
+    if not _syncfs(anchor):
+        for path in pending["files"]:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except OSError:
+                continue  # renamed away or removed since
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+    for directory in pending["dirs"]:
+        _fsync_dir(directory)
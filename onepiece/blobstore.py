@@ -0,0 +1,196 @@
+"""Content-addressed store for downloaded page images.
+
+Sources reuse the same credit pages, banners and filler images across many
+chapters, and a ``--force`` re-download fetches pages we already have byte for
+byte. Each downloaded page is now filed under its SHA-256 in ``blobs/``:
+
+    blobs/<first 2 hex digits>/<sha256>
+
+and the job's scratch dir gets a hard link to it (``work/<job>/<job>_<n>.jpg``,
+same name as before), so the PDF/CBZ/preview builders read the blob's bytes
+without knowing about the store. A page whose hash is already stored isn't
+written again — the new download is dropped and the existing blob linked —
+and a resumed job whose scratch file is gone relinks the blob instead of
+fetching the page again.
+
+Blobs are referenced by the chapter metadata (``page_files[].sha256``). The
+store keeps the pages of the newest BLOB_KEEP_CHAPTERS chapters — the ones a
+correction or re-download is likely to touch, and where shared pages recur —
+and ``gc`` removes every other blob, unless a download in progress still has
+it linked. Pages used to be deleted once their chapter was built, so that
+window is extra disk (about one more copy of those chapters' pages) traded for
+cheap re-downloads; BLOB_KEEP_CHAPTERS=0 keeps only in-flight pages. A sweep
+walks the whole store, so ``gc_due`` spaces them BLOB_GC_INTERVAL apart.
+``dedup_report`` shows how much the shared pages add up to across the whole
+library (``opctl blobs``).
+
+Keeping the bytes is also what lets a re-download revalidate its pages with
+conditional requests (MangaDownloader._fetch_page) and reuse them on a 304.
+
+Blobs and work dirs must be on one filesystem for the hard links (they're
+both under the storage root); elsewhere the page is copied instead.
+
+Stdlib only.
+
+Env:
+  BLOB_KEEP_CHAPTERS   newest chapters whose pages are kept in the store (default 20;
+                       0 keeps only pages of downloads in progress)
+  BLOB_GC_INTERVAL     min seconds between sweeps (default 3600)
+"""
+
+import errno
+import os
+import re
+import shutil
+import time
+from collections import Counter, defaultdict
+
+_SHA_RE = re.compile(r"[0-9a-f]{64}$")
+
+# Blobs younger than this are never collected.
+GC_GRACE = 3600
+
+
+class BlobStore:
+    def __init__(self, root):
+        self.root = root
+        self.keep_chapters = int(os.environ.get("BLOB_KEEP_CHAPTERS", 20))
+        self.gc_interval = float(os.environ.get("BLOB_GC_INTERVAL", 3600))
+        self.gc_stamp = os.path.join(root, ".last_gc")
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, sha):
+        return os.path.join(self.root, sha[:2], sha)
+
+    def has(self, sha):
+        return os.path.exists(self.path(sha))
+
+    def store(self, src, sha, dest):
+        """File ``src`` (already hashed to ``sha``) into the store, consuming
+        it, and link ``dest`` to the blob. If the blob already exists ``src``
+        is just dropped. Returns whether the blob was new."""
+        try:
+            self.link(sha, dest)
+        except FileNotFoundError:
+            pass
+        else:
+            os.remove(src)
+            return False
+        blob = self.path(sha)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        try:
+            os.replace(src, blob)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(src, blob)
+        self.link(sha, dest)
+        return True
+
+    def link(self, sha, dest):
+        """Make ``dest`` a hard link to the blob (a copy across filesystems)."""
+        blob = self.path(sha)
+        tmp = dest + ".link"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        try:
+            os.link(blob, tmp)
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                raise
+            shutil.copyfile(blob, tmp)
+        os.replace(tmp, dest)
+        return dest
+
+    def blobs(self):
+        """Yield (sha, size, link count) for every stored blob."""
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if not _SHA_RE.match(name):
+                    continue
+                try:
+                    st = os.stat(os.path.join(shard_dir, name))
+                except FileNotFoundError:
+                    continue
+                yield name, st.st_size, st.st_nlink
+
+    def gc_due(self):
+        """Whether BLOB_GC_INTERVAL has passed since the last sweep (by any
+        process sharing the store)."""
+        try:
+            return time.time() - os.path.getmtime(self.gc_stamp) >= self.gc_interval
+        except FileNotFoundError:
+            return True
+
+    def gc(self, keep, dry_run=False, grace=GC_GRACE):
+        """Remove blobs whose hash isn't in ``keep``, that no work dir links
+        to and that weren't stored in the last ``grace`` seconds (a download
+        between storing a page and linking it). Returns (blobs removed, bytes
+        freed)."""
+        removed = freed = 0
+        cutoff = time.time() - grace
+        for sha, size, nlink in list(self.blobs()):
+            if sha in keep or nlink > 1:
+                continue
+            try:
+                if os.path.getmtime(self.path(sha)) > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            if not dry_run:
+                try:
+                    os.remove(self.path(sha))
+                except FileNotFoundError:
+                    continue
+            removed += 1
+            freed += size
+        if not dry_run:
+            with open(self.gc_stamp, "a"):
+                os.utime(self.gc_stamp)
+        return removed, freed
+
+
+def page_refs(rows):
+    """{sha: [chapter, ...]} from catalog rows' metadata ``page_files``."""
+    refs = defaultdict(list)
+    for row in rows:
+        for page in (row.get("meta") or {}).get("page_files") or []:
+            if page.get("sha256"):
+                refs[page["sha256"]].append(row["chapter"])
+    return refs
+
+
+def dedup_report(rows, store=None, top=10):
+    """Duplicate-page statistics over catalog rows (and the store, if given)."""
+    sizes = {}
+    refs = page_refs(rows)
+    pages = total = 0
+    for row in rows:
+        for page in (row.get("meta") or {}).get("page_files") or []:
+            if page.get("sha256"):
+                pages += 1
+                total += page.get("bytes") or 0
+                sizes[page["sha256"]] = page.get("bytes") or 0
+    unique = sum(sizes.values())
+    shared = sorted(((sha, chs) for sha, chs in refs.items() if len(set(chs)) > 1),
+                    key=lambda item: (-len(set(item[1])), item[0]))
+    report = {
+        "chapters": sum(1 for row in rows if (row.get("meta") or {}).get("page_files")),
+        "pages": pages,
+        "unique_pages": len(sizes),
+        "bytes": total,
+        "unique_bytes": unique,
+        "duplicate_bytes": total - unique,
+        "shared": [{"sha256": sha, "bytes": sizes[sha],
+                    "chapters": sorted(set(chs))} for sha, chs in shared[:top]],
+    }
+    if store is not None:
+        counts = Counter()
+        for _, size, _ in store.blobs():
+            counts["blobs"] += 1
+            counts["blob_bytes"] += size
+        report.update(blobs=counts["blobs"], blob_bytes=counts["blob_bytes"])
+    return report
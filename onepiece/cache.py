@@ -0,0 +1,102 @@
+"""In-memory cache in front of Storage for read-heavy consumers (the webapp).
+
+Every webapp request used to go back to disk: the chapter list, a metadata
+sidecar per chapter, ``last_chapter.txt``, ``last_check.txt``, the request
+queue and the schedule override. ``CachedStorage`` is a drop-in ``Storage``
+that memoizes those reads:
+
+    list_chapters, read_meta, get_last_chapter, and the expected-schedule
+    parse
+
+plus ``cached(key, fn)`` for whole derived payloads (the webapp caches its
+``/api/chapters`` and ``/api/stats`` responses this way).
+
+Invalidation is one ``stat`` of ``.generation`` in the storage root, which
+every Storage write bumps (``Storage.changed``) — from any process, so a
+chapter the downloader just wrote is served on the next request. The one
+exception is ``last_check.txt``, rewritten on every poll: bumping for it
+would empty the cache every few minutes, so ``get_last_check`` isn't
+memoized and callers read it fresh. The request queue isn't either
+(``pending_requests``, ``request_source``): leases expire and failed requests
+come due by the clock, with no write to bump the stamp, and a listing of a
+handful of small files is cheap anyway. When the stamp differs from the one
+the cache last saw, everything is dropped. As a backstop for edits that
+bypass Storage (files copied in by hand), entries also expire after
+STORAGE_CACHE_TTL seconds.
+
+Writes made through the cache itself invalidate it at once. Cached values
+are shared between callers: treat them as read-only.
+
+Stdlib only.
+
+Env:
+  STORAGE_CACHE_TTL   max seconds an entry is served without a re-read (default 30)
+"""
+
+import os
+import threading
+import time
+
+from .storage import Storage
+
+_MISSING = object()
+
+
+class CachedStorage(Storage):
+    def __init__(self, root=None, ttl=None):
+        super().__init__(root)
+        self.ttl = float(ttl if ttl is not None else os.environ.get("STORAGE_CACHE_TTL", 30))
+        self._memo = {}            # key -> (value, stored_at)
+        self._generation = _MISSING
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.generation_file)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def cached(self, key, fn):
+        """``fn()``, memoized under ``key`` until the storage changes."""
+        now = time.monotonic()
+        with self._lock:
+            stamp = self._stamp()
+            if stamp != self._generation:
+                self._memo.clear()
+                self._generation = stamp
+            entry = self._memo.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        # Compute outside the lock; a concurrent miss just computes twice.
+        value = fn()
+        with self._lock:
+            if self._generation == stamp:
+                self._memo[key] = (value, now)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._memo.clear()
+            self._generation = _MISSING
+
+    def changed(self):
+        super().changed()
+        self.invalidate()
+
+    # ----- memoized reads ----------------------------------------------------
+    def list_chapters(self):
+        return self.cached("list_chapters", super().list_chapters)
+
+    def read_meta(self, chapter):
+        return self.cached(("read_meta", int(chapter)),
+                           lambda: super(CachedStorage, self).read_meta(chapter))
+
+    def get_last_chapter(self):
+        return self.cached("last_chapter", super().get_last_chapter)
+
+    def _read_expected(self):
+        return self.cached("expected", super()._read_expected)
@@ -0,0 +1,222 @@
+"""Indexed chapter catalog: a SQLite read model of the shared storage.
+
+Answering "what chapters do we have, and what do they look like" from the
+files themselves costs a directory listing plus, per chapter, a metadata JSON
+open and two ``os.path.exists`` calls — over a thousand of each for the
+webapp's chapter list. ``Catalog`` keeps one row per chapter in
+``catalog.sqlite3`` under the storage root:
+
+    chapter (primary key), title, pages, downloaded_at,
+    has_pdf, has_cbz, has_preview, meta (the sidecar JSON), updated_at,
+    repair_error
+
+Storage keeps it current as the files change — ``write_meta`` upserts the
+row (and checks the chapter's artifacts, which are all on disk by then), and
+a CBZ or preview built later flips its flag — so readers answer with one
+indexed query: ``chapters()``, ``range(lo, hi)``, ``newest(n)``, ``get(ch)``
+and ``missing("cbz" | "preview")``.
+
+``repair_error`` is the one column that isn't derived from the files: the
+downloader's repair pass records why rebuilding a chapter's CBZ/preview from
+its PDF failed, and skips the chapter from then on. Rewriting the row (a
+re-download, a rebuild) clears it, so a new PDF gets another try.
+
+The files stay the source of truth; the catalog can always be rebuilt from
+them (``opctl catalog --rebuild``), and is built that way the first time it
+is opened. A catalog write that fails is logged and skipped, never fatal —
+rebuild to catch up.
+
+WAL mode lets the webapp read while the downloader (or the bot) writes, from
+separate processes; like any SQLite database it needs a local filesystem,
+not a network share. Each thread gets its own connection.
+
+Stdlib only.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+ARTIFACTS = ("pdf", "cbz", "preview")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chapters (
+    chapter       INTEGER PRIMARY KEY,
+    title         TEXT,
+    pages         INTEGER,
+    downloaded_at TEXT,
+    has_pdf       INTEGER NOT NULL DEFAULT 0,
+    has_cbz       INTEGER NOT NULL DEFAULT 0,
+    has_preview   INTEGER NOT NULL DEFAULT 0,
+    meta          TEXT,
+    updated_at    TEXT,
+    repair_error  TEXT
+);
+CREATE INDEX IF NOT EXISTS chapters_no_cbz ON chapters(chapter)
+    WHERE has_pdf AND NOT has_cbz;
+CREATE INDEX IF NOT EXISTS chapters_no_preview ON chapters(chapter)
+    WHERE has_pdf AND NOT has_preview;
+CREATE TABLE IF NOT EXISTS catalog_info (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_COLUMNS = "chapter, title, pages, downloaded_at, has_pdf, has_cbz, has_preview, meta"
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _row(r):
+    return {
+        "chapter": r[0],
+        "title": r[1],
+        "pages": r[2],
+        "downloaded_at": r[3],
+        "has_pdf": bool(r[4]),
+        "has_cbz": bool(r[5]),
+        "has_preview": bool(r[6]),
+        "meta": json.loads(r[7]) if r[7] else None,
+    }
+
+
+class Catalog:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._migrate(conn)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _migrate(conn):
+        """Add columns newer than an existing catalog file."""
+        columns = {r[1] for r in conn.execute("PRAGMA table_info(chapters)")}
+        if "repair_error" not in columns:
+            try:
+                conn.execute("ALTER TABLE chapters ADD COLUMN repair_error TEXT")
+            except sqlite3.OperationalError:
+                pass  # another process added it first
+
+    @property
+    def built(self):
+        """Whether the catalog was ever (re)built from disk."""
+        row = self._conn().execute(
+            "SELECT value FROM catalog_info WHERE key = 'built_at'").fetchone()
+        return row is not None
+
+    # ----- writes ----------------------------------------------------------
+    def upsert(self, chapter, meta=None, has_pdf=False, has_cbz=False, has_preview=False):
+        """Insert or replace a chapter's row."""
+        meta = meta or {}
+        self._conn().execute(
+            f"INSERT OR REPLACE INTO chapters ({_COLUMNS}, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (int(chapter), meta.get("title"), meta.get("pages"), meta.get("downloaded_at"),
+             int(bool(has_pdf)), int(bool(has_cbz)), int(bool(has_preview)),
+             json.dumps(meta) if meta else None, _now()))
+
+    def set_artifact(self, chapter, kind, present=True):
+        """Flip one artifact flag ("pdf", "cbz" or "preview") for a chapter,
+        adding a bare row if the chapter isn't catalogued yet."""
+        if kind not in ARTIFACTS:
+            raise ValueError(f"unknown artifact {kind!r}")
+        self._conn().execute(
+            f"INSERT INTO chapters (chapter, has_{kind}, updated_at) VALUES (?, ?, ?) "
+            f"ON CONFLICT(chapter) DO UPDATE SET has_{kind} = excluded.has_{kind}, "
+            "updated_at = excluded.updated_at",
+            (int(chapter), int(bool(present)), _now()))
+
+    def set_repair_error(self, chapter, error):
+        """Record (or with None, clear) why a chapter's artifacts couldn't be
+        rebuilt from its PDF."""
+        self._conn().execute(
+            "UPDATE chapters SET repair_error = ?, updated_at = ? WHERE chapter = ?",
+            (error, _now(), int(chapter)))
+
+    def rebuild(self, storage):
+        """Replace the catalog with what's on disk. Returns the row count."""
+        chapters = set(storage.list_chapters())
+        for name in os.listdir(storage.meta_dir):
+            stem, ext = os.path.splitext(name)
+            if ext == ".json" and stem.isdigit():
+                chapters.add(int(stem))
+        rows = []
+        for ch in sorted(chapters):
+            try:
+                meta = storage.read_meta(ch)
+            except (ValueError, OSError):
+                meta = None
+            meta = meta or {}
+            rows.append((ch, meta.get("title"), meta.get("pages"), meta.get("downloaded_at"),
+                         int(storage.has_chapter(ch)), int(storage.has_cbz(ch)),
+                         int(os.path.exists(storage.preview_path(ch))),
+                         json.dumps(meta) if meta else None, _now()))
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM chapters")
+            conn.executemany(
+                f"INSERT INTO chapters ({_COLUMNS}, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("INSERT OR REPLACE INTO catalog_info (key, value) "
+                         "VALUES ('built_at', ?)", (_now(),))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    # ----- queries ---------------------------------------------------------
+    def get(self, chapter):
+        r = self._conn().execute(
+            f"SELECT {_COLUMNS} FROM chapters WHERE chapter = ?", (int(chapter),)).fetchone()
+        return _row(r) if r else None
+
+    def chapters(self):
+        """Chapter numbers with a PDF, ascending."""
+        return [r[0] for r in self._conn().execute(
+            "SELECT chapter FROM chapters WHERE has_pdf ORDER BY chapter")]
+
+    def range(self, lo, hi):
+        """Rows for chapters lo..hi (inclusive) with a PDF, ascending."""
+        return [_row(r) for r in self._conn().execute(
+            f"SELECT {_COLUMNS} FROM chapters WHERE chapter BETWEEN ? AND ? AND has_pdf "
+            "ORDER BY chapter", (int(lo), int(hi)))]
+
+    def newest(self, n=None):
+        """Rows for the ``n`` highest chapters with a PDF (all if None),
+        newest first."""
+        return [_row(r) for r in self._conn().execute(
+            f"SELECT {_COLUMNS} FROM chapters WHERE has_pdf "
+            "ORDER BY chapter DESC LIMIT ?", (-1 if n is None else int(n),))]
+
+    def missing(self, kind):
+        """Chapters with a PDF but no ``kind`` ("cbz" or "preview"), ascending."""
+        if kind not in ("cbz", "preview"):
+            raise ValueError(f"unknown artifact {kind!r}")
+        return [r[0] for r in self._conn().execute(
+            f"SELECT chapter FROM chapters WHERE has_pdf AND NOT has_{kind} "
+            "ORDER BY chapter")]
+
+    def repair_failed(self):
+        """{chapter: error} for chapters whose artifact repair failed."""
+        return dict(self._conn().execute(
+            "SELECT chapter, repair_error FROM chapters "
+            "WHERE has_pdf AND repair_error IS NOT NULL ORDER BY chapter"))
+
+    def count(self):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM chapters WHERE has_pdf").fetchone()[0]
@@ -1,21 +1,27 @@
 """Build CBZ (comic-archive) files for chapters.
 
-A CBZ is just a ZIP of page images named so they sort in reading order. Two
+A CBZ is just a ZIP of page images named so they sort in reading order. Three
 inputs are supported:
 
   images_to_cbz  — zip page images straight from disk (used by the downloader,
                    which still has the freshly-downloaded pages). stdlib only.
+  CbzWriter      — add pages one at a time from bytes already in memory (used
+                   by onepiece.artifacts, which reads each page once for every
+                   artifact). stdlib only.
   pdf_to_cbz     — rebuild a CBZ from an existing chapter PDF (used by the webapp
                    button, where the source pages are long gone). Needs PyMuPDF,
                    imported lazily so storage-only consumers don't pull it in.
 
-Both write to a temp file and atomically rename, so a reader never sees a
-half-written archive and a crashed build leaves no partial .cbz behind.
+All three write to a temp file (onepiece.atomic.temp_path) and atomically
+rename, so a reader never sees a half-written archive and a crashed build leaves
+no partial .cbz behind.
 """
 
 import os
 import zipfile
 
+from .atomic import atomic_open, commit, discard, sync, temp_path
+
 
 def _entry_name(index, ext):
     """Zero-padded page name so archives sort in reading order (001, 002, …)."""
@@ -30,16 +36,58 @@ def images_to_cbz(image_paths, output_cbz):
     if not image_paths:
         raise ValueError("no images to write into CBZ")
 
-    tmp = output_cbz + ".tmp"
-    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_STORED) as zf:
+    with atomic_open(output_cbz, "wb") as f, \
+            zipfile.ZipFile(f, "w", zipfile.ZIP_STORED) as zf:
         for i, path in enumerate(image_paths, start=1):
             ext = os.path.splitext(path)[1] or ".jpg"
             zf.write(path, _entry_name(i, ext))
-    os.replace(tmp, output_cbz)
     print(f"CBZ saved: {output_cbz}")
     return output_cbz
 
 
+class CbzWriter:
+    """Build a CBZ one page at a time from in-memory image bytes.
+
+        with CbzWriter(path) as cbz:
+            cbz.add_bytes(data, ".jpg")
+    """
+
+    def __init__(self, output_cbz):
+        self.output_cbz = output_cbz
+        self.tmp = temp_path(output_cbz)
+        self._f = open(self.tmp, "wb")
+        self._zf = zipfile.ZipFile(self._f, "w", zipfile.ZIP_STORED)
+        self.pages = 0
+
+    def add_bytes(self, data, ext):
+        self.pages += 1
+        self._zf.writestr(_entry_name(self.pages, ext or ".jpg"), data)
+
+    def close(self):
+        if self._zf.fp is None:
+            return
+        self._zf.close()
+        sync(self._f)
+        self._f.close()
+        commit(self.tmp, self.output_cbz)
+        print(f"CBZ saved: {self.output_cbz}")
+
+    def abort(self):
+        self._zf.close()
+        self._f.close()
+        discard(self.tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None and self.pages:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
 def pdf_to_cbz(pdf_path, output_cbz):
     """Rebuild a CBZ from an existing chapter PDF by pulling each page's image
     out of the PDF. These PDFs are one full-page image per page, so the embedded
@@ -50,23 +98,34 @@ def pdf_to_cbz(pdf_path, output_cbz):
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(pdf_path)
 
-    tmp = output_cbz + ".tmp"
     doc = fitz.open(pdf_path)
     try:
         if doc.page_count == 0:
             raise ValueError(f"{pdf_path} has no pages")
-        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_STORED) as zf:
+        with atomic_open(output_cbz, "wb") as f, \
+                zipfile.ZipFile(f, "w", zipfile.ZIP_STORED) as zf:
             for i in range(doc.page_count):
                 page = doc.load_page(i)
                 data, ext = _page_image(doc, page)
                 zf.writestr(_entry_name(i + 1, ext), data)
     finally:
         doc.close()
-    os.replace(tmp, output_cbz)
     print(f"CBZ saved: {output_cbz}")
     return output_cbz
 
 
+def pdf_page_image(pdf_path, index=0):
+    """(bytes, ext) of one page's image from a chapter PDF (see _page_image).
+    Used to rebuild a missing cover preview. Needs PyMuPDF."""
+    import fitz  # PyMuPDF — lazy so non-webapp consumers don't need it
+
+    doc = fitz.open(pdf_path)
+    try:
+        return _page_image(doc, doc.load_page(index))
+    finally:
+        doc.close()
+
+
 def _page_image(doc, page):
     """Return (bytes, ext) for a page: the largest embedded image if present,
     otherwise a rendered PNG of the whole page."""
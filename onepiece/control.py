@@ -6,7 +6,10 @@ the host ./opctl script:
 
   ./opctl request 1180             download chapter 1180 now; bot + calibre react
   ./opctl request 1180 --no-post   download it but mark it so the bot skips it
-  ./opctl request 1180 --force     re-download even if already on disk
+  ./opctl request 1180 --force     re-download even if already on disk (pages
+                                   the source hasn't changed aren't refetched)
+  ./opctl request 1180 --queue     hand it to the running downloader (ahead of
+                                   webapp requests) instead of downloading here
 
 A requested download goes straight into the shared storage, so the webapp shows
 it immediately and the calibre uploader (and bot, unless --no-post) pick it up on
@@ -17,6 +20,8 @@ import argparse
 import sys
 from datetime import date, datetime
 
+from .blobstore import dedup_report
+from .catalog import Catalog
 from .storage import Storage, Reconciler
 # Heavy/per-container deps (MangaDownloader needs Pillow; CalibreWebClient runs in
 # the calibre container) are imported lazily inside the commands that use them, so
@@ -36,12 +41,39 @@ def cmd_request(args):
         print(f"chapter {args.chapter} already present (use --force to re-download)")
         return 0
 
+    if args.queue:
+        if args.force:
+            print("--force can't be queued; run without --queue to re-download now")
+            return 1
+        storage.request_chapter(args.chapter, source="opctl")
+        print(f"queued chapter {args.chapter} for the downloader, ahead of webapp "
+              f"requests; it starts right away")
+        return 0
+
+    # If the chapter is also in the request queue, take it off the queue while
+    # we download, so the downloader service doesn't fetch it at the same time.
+    queued = storage.requests.get(args.chapter)
+    if queued and queued["state"] == "lease":
+        print(f"the downloader is already fetching chapter {args.chapter}; "
+              f"it will land shortly")
+        return 0
+    claimed = queued is not None and storage.claim_request(args.chapter) is not None
+
     from .downloader import MangaDownloader
     downloader = MangaDownloader(storage)
-    pdf, _ = downloader.download_chapter(args.chapter)
+    try:
+        pdf, _ = downloader.download_chapter(args.chapter)
+    except BaseException:
+        if claimed:
+            storage.retry_request(args.chapter, "opctl download failed")
+        raise
     if not pdf:
+        if claimed:
+            storage.retry_request(args.chapter, "not available")
         print(f"chapter {args.chapter} could not be downloaded (not released yet?)")
         return 1
+    if claimed:
+        storage.finish_request(args.chapter)
 
     # Monotonic — only advances the pointer, so backfilling an older chapter
     # leaves "latest" alone while requesting a newer one moves it forward.
@@ -103,6 +135,10 @@ def cmd_reprocess(args):
             unmarked.append(name)
             print(f"un-marked chapter {args.chapter} for {name}; "
                   f"it will re-process on the next pass")
+        elif args.chapter in r.failed:
+            r.unmark(args.chapter)  # clears the failure record and its backoff
+            print(f"chapter {args.chapter} was failing for {name}; "
+                  f"it will be retried on the next pass")
         else:
             print(f"chapter {args.chapter} isn't marked for {name} yet — it's "
                   f"already pending, so {name} will handle it on its next pass")
@@ -116,6 +152,73 @@ def cmd_reprocess(args):
     return 0
 
 
+def cmd_failures(args):
+    storage = Storage()
+    now = datetime.now().timestamp()
+    found = False
+    for name in ("bot", "calibre"):
+        r = Reconciler(storage, name)
+        for ch, (attempts, at) in sorted(r.failed.items()):
+            found = True
+            wait = r.retry_at(ch) - now
+            when = f"retry in {wait / 60:.0f} min" if wait > 0 else "retry due"
+            last = datetime.fromtimestamp(at).strftime("%Y-%m-%d %H:%M") if at else "?"
+            print(f"{name}: chapter {ch}: {attempts} failed attempt(s), last {last}; {when}")
+    if not found:
+        print("no chapters are failing to post or upload")
+    else:
+        print("('reprocess <n>' retries one now)")
+    return 0
+
+
+def cmd_catalog(args):
+    storage = Storage()
+    if args.rebuild:
+        count = Catalog(storage.catalog_path).rebuild(storage)
+        print(f"catalog rebuilt from disk: {count} chapter(s)")
+        return 0
+
+    catalog = storage.catalog
+    newest = catalog.newest(1)
+    print(f"chapters: {catalog.count()}"
+          + (f" (newest {newest[0]['chapter']})" if newest else ""))
+    for kind in ("cbz", "preview"):
+        missing = catalog.missing(kind)
+        shown = ", ".join(str(c) for c in missing[:20]) + (" ..." if len(missing) > 20 else "")
+        print(f"missing {kind}: {len(missing)}" + (f"  [{shown}]" if missing else ""))
+    failed = catalog.repair_failed()
+    for ch, error in list(failed.items())[:20]:
+        print(f"repair failed: chapter {ch}: {error}")
+    if failed:
+        print("(re-download with 'request <n> --force', or --rebuild to retry them)")
+    return 0
+
+
+def cmd_blobs(args):
+    storage = Storage()
+    if args.gc:
+        removed, freed = storage.gc_blobs(dry_run=args.dry_run)
+        print(f"{'would remove' if args.dry_run else 'removed'} {removed} blob(s), "
+              f"{freed / 1e6:.1f} MB (keeping the newest "
+              f"{storage.blobs.keep_chapters} chapter(s)' pages)")
+        return 0
+
+    r = dedup_report(storage.catalog.newest(), storage.blobs, top=args.top)
+    print(f"page store: {r['blobs']} blob(s), {r['blob_bytes'] / 1e6:.1f} MB")
+    if not r["pages"]:
+        print("no chapter metadata records page hashes yet")
+        return 0
+    print(f"library: {r['pages']} page(s) in {r['chapters']} chapter(s), "
+          f"{r['unique_pages']} unique; {r['bytes'] / 1e6:.1f} MB, "
+          f"{r['duplicate_bytes'] / 1e6:.1f} MB of it duplicate pages")
+    for blob in r["shared"]:
+        chs = ", ".join(str(c) for c in blob["chapters"][:10])
+        more = " ..." if len(blob["chapters"]) > 10 else ""
+        print(f"  {blob['sha256'][:12]}  {blob['bytes']:>9} bytes  "
+              f"{len(blob['chapters']):>4} chapters  [{chs}{more}]")
+    return 0
+
+
 def cmd_retitle(args):
     """Re-apply title/series/author/tags to books already in Calibre-Web, in place
     (no re-upload, no duplicates). Fixes books uploaded before the metadata fix."""
@@ -160,11 +263,16 @@ def main(argv=None):
             "  opctl request 1180             download chapter 1180 now\n"
             "  opctl request 1180 --no-post   download it, but the bot won't post it\n"
             "  opctl request 1180 --force     re-download even if already on disk\n"
+            "  opctl request 1180 --queue     let the running downloader fetch it\n"
             "  opctl schedule 2026-06-07      expect the next chapter on Jun 7\n"
             "  opctl schedule                 show the current expected date\n"
             "  opctl schedule --clear         revert to the automatic heuristic\n"
             "  opctl reprocess 1183           re-post + re-upload a corrected chapter\n"
             "  opctl reprocess 1183 --calibre re-upload to Calibre-Web only\n"
+            "  opctl catalog                  chapter count and missing CBZ/previews\n"
+            "  opctl catalog --rebuild        rebuild the chapter catalog from disk\n"
+            "  opctl blobs                    page store size and duplicate-page report\n"
+            "  opctl blobs --gc               drop page blobs no recent chapter uses\n"
             "  opctl retitle                  fix titles/metadata of books already in Calibre-Web\n"
         ),
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -182,7 +290,12 @@ def main(argv=None):
     req.add_argument("--no-post", action="store_true",
                      help="download but mark it so the bot doesn't post it (calibre still uploads)")
     req.add_argument("--force", action="store_true",
-                     help="re-download even if already on disk")
+                     help="re-download even if already on disk; unchanged pages are "
+                          "revalidated, not refetched, and an unchanged chapter "
+                          "isn't rebuilt")
+    req.add_argument("--queue", action="store_true",
+                     help="queue it for the downloader service (priority over webapp "
+                          "requests) instead of downloading in this process")
     req.set_defaults(func=cmd_request)
 
     sch = sub.add_parser(
@@ -191,7 +304,7 @@ def main(argv=None):
         description="Set the date the next chapter is expected, as YYYY-MM-DD "
                     "(e.g. 2026-06-07). The downloader idles until the set time "
                     "(keeping a light daily check on the way), then polls hourly "
-                    "until it lands, and reacts to the change within ~a minute. "
+                    "until it lands, and reacts to the change right away. "
                     "For a specific hour/timezone, use the webapp. "
                     "Past dates are rejected; a date more "
                     "than a month out warns. It clears automatically once a new "
@@ -219,6 +332,49 @@ def main(argv=None):
     rep.add_argument("--calibre", action="store_true", help="re-upload to Calibre-Web")
     rep.set_defaults(func=cmd_reprocess)
 
+    fal = sub.add_parser(
+        "failures",
+        help="chapters the bot or calibre keep failing to post/upload",
+        description="A chapter that fails to post or upload is retried with a "
+                    "growing delay (RECONCILE_BACKOFF, doubling up to "
+                    "RECONCILE_BACKOFF_MAX) until it succeeds. Lists those "
+                    "chapters, their attempt counts and when they're retried "
+                    "next; 'reprocess <n>' retries one now.",
+    )
+    fal.set_defaults(func=cmd_failures)
+
+    cat = sub.add_parser(
+        "catalog",
+        help="show or rebuild the chapter catalog",
+        description="The catalog (catalog.sqlite3) indexes the chapters on disk "
+                    "for the webapp and the downloader's repair pass. With no "
+                    "flag, show what it holds: chapter count and chapters missing "
+                    "a CBZ or preview. --rebuild re-reads every chapter from disk, "
+                    "e.g. after files were added or removed by hand.",
+    )
+    cat.add_argument("--rebuild", action="store_true",
+                     help="rebuild the catalog from the files on disk")
+    cat.set_defaults(func=cmd_catalog)
+
+    blb = sub.add_parser(
+        "blobs",
+        help="page store report, or garbage-collect it",
+        description="Downloaded page images are stored once per content hash "
+                    "(blobs/), so pages shared between chapters (credits, "
+                    "banners) and re-downloads aren't stored twice. With no "
+                    "flag, show the store's size and the pages shared most "
+                    "across the library. --gc removes blobs outside the newest "
+                    "BLOB_KEEP_CHAPTERS chapters (the downloader does this "
+                    "every pass).",
+    )
+    blb.add_argument("--gc", action="store_true",
+                     help="remove blobs no recent chapter or running job uses")
+    blb.add_argument("--dry-run", action="store_true",
+                     help="with --gc, only report what would be removed")
+    blb.add_argument("--top", type=int, default=10,
+                     help="how many of the most-shared pages to list (default 10)")
+    blb.set_defaults(func=cmd_blobs)
+
     ret = sub.add_parser(
         "retitle",
         help="fix title/metadata of books already in Calibre-Web (in place)",
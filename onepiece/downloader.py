@@ -1,22 +1,32 @@
+import hashlib
 import os
 import requests
 from PIL import Image
 from bs4 import BeautifulSoup
 import re
+import time
+from dataclasses import dataclass, field
 
 from .storage import Storage
 from .cbz import images_to_cbz
+from .pdfwriter import PdfWriter, images_to_pdf as write_pdf
+from .artifacts import (
+    COMPRESS_LADDER, PDF_PAGE_OVERHEAD,
+    CbzSink, DiscordSink, PdfSink, PreviewSink,
+    CompressionPlan, plan_compression, run_sinks, save_preview,
+)
+from .fetch import FetchEngine
+from .transport import HttpTransport
+from .toc import TableOfContents
+from .urlfilter import env_extra_hosts, filter_for
+from .manifest import BLOCKED, FAILED, OK, OVERSIZE, WorkManifest
 
 # Patterns that mark an acceptable image, matched against the WHOLE URL (host or
 # path) — e.g. "wp-content"/"cdn" are path markers, not hosts. Junk patterns are
 # rejected first. Shared by all download paths. Add new source hosts without a
-# code change via ALLOWED_IMAGE_HOSTS (comma/space-separated) in .env.
-def _env_extra_hosts():
-    raw = os.environ.get("ALLOWED_IMAGE_HOSTS", "")
-    return [re.escape(h) for h in re.split(r"[,\s]+", raw.strip()) if h]
-
-
-ALLOWED_DOMAINS = [
+# code change via ALLOWED_IMAGE_HOSTS (comma/space-separated) in .env; it's read
+# at startup, so restart the downloader (and bot) after changing it.
+BASE_ALLOWED_DOMAINS = [
     r"blogger\.googleusercontent\.com",
     r"cdn\.onepiecechapters\.com",
     r"([a-z0-9]+)\.wp\.com",  # any subdomain of wp.com
@@ -25,7 +35,9 @@ ALLOWED_DOMAINS = [
     r"nangca\.com",
     r"mangaread\.org",
     r"mangaclash\.com",
-] + _env_extra_hosts()
+]
+
+ALLOWED_DOMAINS = BASE_ALLOWED_DOMAINS + env_extra_hosts()
 
 BLOCKED_PATTERNS = [
     r"\.avif$",
@@ -38,6 +50,19 @@ BLOCKED_PATTERNS = [
 ]
 
 
+class PageTooLarge(ValueError):
+    """A page image's body exceeded MAX_PAGE_BYTES; the download was aborted."""
+
+
+@dataclass
+class ChapterPage:
+    """A chapter's HTML page, fetched and parsed once."""
+    url: str
+    title: str
+    images: list                             # page image URLs, reading order
+    og: dict = field(default_factory=dict)   # og:* property -> [content, ...]
+
+
 class MangaDownloader:
     BASE_URL = "https://www.read-onepiece-manga.com/manga/one-piece-chapter-{}/"
     TABLE_OF_CONTENTS_URL = 'https://w17.read-onepiece-manga.com/'
@@ -48,97 +73,356 @@ class MangaDownloader:
     # cover previews (no "_<digit>" before the ext).
     PAGE_IMAGE_RE = re.compile(r"_\d+(?:_compressed)?\.(?:jpe?g|png)$", re.IGNORECASE)
 
-    def __init__(self, storage=None):
+    def __init__(self, storage=None, fetch_engine=None, transport=None):
         self.storage = storage or Storage()
+        self.fetch_engine = fetch_engine or FetchEngine()
+        # Every HTTP request goes through this pooled, timed-out, retrying
+        # transport. Pass your own to point the downloader somewhere else.
+        self.transport = transport or HttpTransport()
+        self._toc = None
+        self.url_filter = filter_for(tuple(ALLOWED_DOMAINS), tuple(BLOCKED_PATTERNS))
+        # Per-page byte cap; a body past it is junk (ads, video posters).
+        self.max_page_bytes = int(float(os.environ.get("MAX_PAGE_BYTES", 25 * 1024 * 1024)))
+        # Build a chapter with pages still missing after retries? "never"
+        # (default: keep what was fetched and resume next attempt) or "allow".
+        self.partial_policy = os.environ.get("DOWNLOAD_PARTIAL", "never").strip().lower()
         # Back-compat aliases so existing callers that reference these keep working.
         self.OUTPUT_DIR = self.storage.work_dir
+        # Job locks kept for callers holding on to a download's pages, by job
+        # dir; released by delete_images().
+        self._held_jobs = {}
         self.LAST_CHAPTER_FILE = self.storage.last_chapter_file
 
-    def delete_images(self):
+    def delete_images(self, images=None):
+        """Clean up after a download. With ``images`` (the paths a download
+        returned), remove the job dir(s) they live in — that job's pages and
+        temp files only, never another job's. Without, remove loose page images
+        left at the top of the work dir by older versions."""
+        if images is not None:
+            for job_dir in {os.path.dirname(p) for p in images}:
+                self.storage.remove_job(job_dir)
+                job = self._held_jobs.pop(job_dir, None)
+                if job is not None:
+                    job.release()
+            return
         for file in os.listdir(self.storage.work_dir):
             if self.PAGE_IMAGE_RE.search(file):
                 os.remove(os.path.join(self.storage.work_dir, file))
 
     def download_and_get_title(self, url, chapter=None):
-        response = requests.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        title = self.get_title(soup, chapter)
+        title = self.fetch_page(url, chapter).title
         print(title)
         return title
 
     # -------------------------------
     # Helper: Domain filtering
     # -------------------------------
-    def is_allowed(self, url, allowed_domains=ALLOWED_DOMAINS, blocked_patterns=BLOCKED_PATTERNS):
-        # Block junk first.
-        if any(re.search(pattern, url) for pattern in blocked_patterns):
-            return False
-
-        # Allow if any pattern matches the whole URL (host OR path). Matching the
-        # full URL is the fix for the bug where path markers like "wp-content"
-        # never matched because only the host was checked.
-        return any(re.search(pattern, url, re.IGNORECASE) for pattern in allowed_domains)
-
-    def _download_pages(self, images, name_prefix):
-        """Download a list of image URLs into the work dir as
-        ``<name_prefix>_<n>.<ext>``. Returns the list of saved paths."""
-        images_on_disk = []
+    def is_allowed(self, url, allowed_domains=None, blocked_patterns=None):
+        """Whether an image URL is a real page: not junk, and from a known host
+        or path. Custom pattern lists get their own compiled filter, built
+        once per pair of lists (urlfilter.filter_for)."""
+        if allowed_domains is None and blocked_patterns is None:
+            return self.url_filter(url)
+        return filter_for(
+            tuple(ALLOWED_DOMAINS if allowed_domains is None else allowed_domains),
+            tuple(BLOCKED_PATTERNS if blocked_patterns is None else blocked_patterns),
+        )(url)
+
+    def _fetch_page(self, index, image_url, name_prefix, job_dir, known=None):
+        """Stream one page image to ``<name_prefix>_<index+1>.<ext>`` in the
+        job's scratch dir, hashing and counting bytes as they arrive. The
+        bytes are kept in the page store (storage.blobs) and the page file is
+        a link to them. Returns a page record ``{"path", "url", "bytes",
+        "sha256", "etag", "last_modified", "new", "revalidated"}`` (``new``:
+        the bytes weren't in the store yet). Raises on HTTP errors, and
+        PageTooLarge as soon as the body passes max_page_bytes (ads and video
+        posters, not pages) — the partial file is removed.
+
+        ``known`` is this URL's record from the chapter's last download
+        (meta ``page_files``). If its bytes are still in the store, the
+        request is conditional on its ETag / Last-Modified, and a 304 reuses
+        the stored bytes without transferring them."""
+        ext = os.path.splitext(image_url)[1].split('?')[0]
+        if ext.lower() not in ['.jpg', '.jpeg', '.png']:
+            ext = self.IMAGE_EXTENSION  # fallback extension
+        image_path = os.path.join(job_dir, f"{name_prefix}_{index+1}{ext}")
+
+        headers = {}
+        if known and known.get("sha256") and self.storage.blobs.has(known["sha256"]):
+            if known.get("etag"):
+                headers["If-None-Match"] = known["etag"]
+            if known.get("last_modified"):
+                headers["If-Modified-Since"] = known["last_modified"]
+
+        response = self.transport.get(image_url, stream=True, headers=headers or None)
+        try:
+            if headers and response.status_code == 304:
+                try:
+                    self.storage.blobs.link(known["sha256"], image_path)
+                except FileNotFoundError:
+                    # Swept from the store since has(): fetch it in full.
+                    return self._fetch_page(index, image_url, name_prefix, job_dir)
+                return {"path": image_path, "url": image_url, "bytes": known["bytes"],
+                        "sha256": known["sha256"],
+                        "etag": response.headers.get("ETag") or known.get("etag"),
+                        "last_modified": (response.headers.get("Last-Modified")
+                                          or known.get("last_modified")),
+                        "new": False, "revalidated": True}
+            response.raise_for_status()
+            limit = self.max_page_bytes
+            declared = int(response.headers.get("Content-Length") or 0)
+            if limit and declared > limit:
+                raise PageTooLarge(f"{declared} bytes declared, limit {limit}")
+
+            digest = hashlib.sha256()
+            size = 0
+            tmp = image_path + ".part"
+            try:
+                with open(tmp, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        size += len(chunk)
+                        if limit and size > limit:
+                            raise PageTooLarge(f"over {limit} bytes")
+                        digest.update(chunk)
+                        f.write(chunk)
+                # File the bytes by hash; the job's page is a link to the blob.
+                new = self.storage.blobs.store(tmp, digest.hexdigest(), image_path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+        finally:
+            response.close()
+        return {"path": image_path, "url": image_url, "bytes": size,
+                "sha256": digest.hexdigest(), "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "new": new, "revalidated": False}
+
+    def _download_pages(self, images, name_prefix, job_dir, known=None):
+        """Download a list of image URLs into the job's scratch dir as
+        ``<name_prefix>_<n>.<ext>``, several at a time (see onepiece.fetch).
+        ``n`` is the page's position in ``images``, so numbering matches reading
+        order however the fetches finish.
+
+        Progress is recorded in a WorkManifest as each page finishes, so a
+        retry after a crash or a flaky CDN only fetches pages that aren't
+        already on disk. Returns the manifest: ``ok_pages()`` are the page
+        records (see _fetch_page) in reading order, ``complete`` says whether
+        any page is still missing.
+
+        ``known`` maps page URLs to their records from an earlier download of
+        the same chapter; those pages are revalidated rather than refetched
+        (see _fetch_page)."""
+        known = known or {}
+        manifest = WorkManifest.open(job_dir, name_prefix, images)
+        todo = []
         for i, image_url in enumerate(images):
-            print(f"Downloading image {i+1}... {image_url}", end=' ')
-
+            page = manifest.pages[i]
             if not self.is_allowed(image_url):
-                print("[Blocked]")
-                continue
+                print(f"Downloading image {i+1}... {image_url} [Blocked]")
+                manifest.pages[i] = {"index": i, "url": image_url, "status": BLOCKED}
+            elif manifest.reusable(page):
+                print(f"Downloading image {i+1}... {image_url} already downloaded")
+            elif self._relink(manifest, page):
+                print(f"Downloading image {i+1}... {image_url} reused from the page store")
+            elif (page["status"] == OVERSIZE and self.max_page_bytes
+                    and page.get("limit", 0) >= self.max_page_bytes):
+                print(f"Downloading image {i+1}... {image_url} [Too large, skipped]")
+            else:
+                todo.append((i, image_url))
+        manifest.save()
 
+        def fetch(k, url):
+            i = todo[k][0]
             try:
-                response = requests.get(image_url)
-                response.raise_for_status()
+                record = self._fetch_page(i, url, name_prefix, job_dir, known.get(url))
+            except PageTooLarge as e:
+                manifest.update(i, OVERSIZE, error=str(e), limit=self.max_page_bytes)
+                raise
             except Exception as e:
-                print(f"Failed to download image: {e}")
-                continue
-
-            ext = os.path.splitext(image_url)[1].split('?')[0]
-            if ext.lower() not in ['.jpg', '.jpeg', '.png']:
-                ext = self.IMAGE_EXTENSION  # fallback extension
+                manifest.update(i, FAILED, error=f"{type(e).__name__}: {e}")
+                raise
+            manifest.update(i, OK, file=os.path.basename(record["path"]),
+                            bytes=record["bytes"], sha256=record["sha256"],
+                            etag=record["etag"], last_modified=record["last_modified"])
+            return record
 
-            image_path = os.path.join(self.storage.work_dir, f"{name_prefix}_{i+1}{ext}")
-            with open(image_path, "wb") as f:
-                f.write(response.content)
+        t0 = time.monotonic()
+        results = self.fetch_engine.run([u for _, u in todo], fetch)
+
+        fetched = deduped = unchanged = 0
+        for (i, image_url), res in zip(todo, results):
+            if res.ok and res.value["revalidated"]:
+                unchanged += 1
+                print(f"Downloading image {i+1}... {image_url} not modified "
+                      f"({res.seconds:.2f}s)")
+            elif res.ok:
+                fetched += res.value["bytes"]
+                deduped += not res.value["new"]
+                print(f"Downloading image {i+1}... {image_url} ok "
+                      f"({res.value['bytes']} bytes, {res.seconds:.2f}s)")
+            elif isinstance(res.error, PageTooLarge):
+                print(f"Downloading image {i+1}... {image_url} "
+                      f"[Too large: {res.error}]")
+            else:
+                print(f"Downloading image {i+1}... {image_url} "
+                      f"Failed to download image: {res.error} ({res.seconds:.2f}s)")
+        ok = len(manifest.ok_pages())
+        print(f"[pages] {ok}/{len(images)} page(s) ({ok - sum(r.ok for r in results)} "
+              f"reused), {len(todo)} fetched in {time.monotonic() - t0:.2f}s "
+              f"({unchanged} not modified), {fetched} bytes, {deduped} already in "
+              f"the page store "
+              f"(workers={self.fetch_engine.workers}, "
+              f"per_host={self.fetch_engine.per_host}); {manifest.counts()}")
+        return manifest
+
+    def _relink(self, manifest, page):
+        """Restore an ``ok`` page whose scratch file is gone from its blob."""
+        if page["status"] != OK or not page.get("sha256"):
+            return False
+        try:
+            self.storage.blobs.link(page["sha256"], manifest.path_of(page))
+        except OSError:
+            return False
+        return True
+
+    def _finalizable(self, manifest, what):
+        """Whether to build ``what`` from this manifest: yes if it's complete,
+        or if DOWNLOAD_PARTIAL=allow. Logs the missing pages either way."""
+        if manifest.complete:
+            return True
+        missing = ", ".join(map(str, manifest.missing))
+        if self.partial_policy == "allow":
+            print(f"[pages] {what}: page(s) {missing} missing; building anyway "
+                  f"(DOWNLOAD_PARTIAL=allow)")
+            return True
+        print(f"[pages] {what}: page(s) {missing} missing; not building it. Fetched "
+              f"pages are kept in {manifest.path} and the next attempt resumes")
+        return False
 
-            images_on_disk.append(image_path)
-            print('ok')
-        return images_on_disk
+    def _unchanged(self, chapter, previous, pages):
+        """Whether a re-download got byte-identical pages, in the same order,
+        as the chapter's PDF and CBZ on disk were built from."""
+        before = [p.get("sha256") for p in previous.get("page_files") or []]
+        return (bool(before) and before == [p["sha256"] for p in pages]
+                and self.storage.has_chapter(chapter) and self.storage.has_cbz(chapter))
+
+    def _restore_extras(self, chapter, output_pdf, image_paths):
+        """For a chapter kept as-is: rebuild its preview and Discord copy if
+        they're gone (the bot deletes the Discord copy once it's posted).
+        Returns the Discord copy's path, or None if the full PDF fits."""
+        preview = self.storage.preview_path(chapter)
+        if not os.path.exists(preview):
+            save_preview(image_paths[0], preview)
+            self.storage.note_artifact(chapter, "preview")
+            print(f"Preview image saved: {preview}")
+        if os.path.getsize(output_pdf) <= self.discord_pdf_limit():
+            return None
+        dpath = self.storage.discord_copy_for(output_pdf)
+        if os.path.exists(dpath):
+            return dpath
+        return self.ensure_discord_copy(output_pdf, image_paths)
+
+    @staticmethod
+    def _page_files(pages):
+        """Per-page hash/size records for the meta sidecar, so later stages can
+        check pages without re-reading them, plus the HTTP validators a
+        re-download revalidates with."""
+        return [{"file": os.path.basename(p["path"]), "url": p["url"],
+                 "bytes": p["bytes"], "sha256": p["sha256"], "etag": p.get("etag"),
+                 "last_modified": p.get("last_modified")} for p in pages]
+
+    def download_chapter(self, chapter, delete_images=True, page=None, publish_gate=None):
+        """Download a chapter and build its PDF, CBZ, preview and metadata.
+        ``page`` is an already-fetched ChapterPage (see fetch_page) for callers
+        that looked at the page first; otherwise it's fetched here, once.
+
+        ``publish_gate``, if given, is called once the pages are all down and
+        before anything appears in storage; it may block (callers downloading
+        several chapters at once use it to publish them in order), and if it
+        returns False nothing is built — the pages stay for the next attempt.
+
+        Pages go to the chapter's own scratch dir (Storage.job_dir), held under
+        its job lock, so different chapters can be built at once from any
+        number of threads or processes. With ``delete_images=False`` the
+        returned page paths stay on disk, and the job lock stays held (no other
+        download of the chapter can touch them), until the caller passes them
+        to delete_images() — which it must do, error or not."""
+        return self._run_job(chapter, delete_images, lambda job_dir: self._download_chapter(
+            chapter, delete_images, page, job_dir, publish_gate))
+
+    def _run_job(self, key, delete_images, fn):
+        """Run ``fn(job_dir)`` under the job's lock. The lock is released on
+        return, unless the caller keeps the returned pages (delete_images=False):
+        then delete_images() releases it."""
+        job = self.storage.acquire_job(key)
+        try:
+            pdf, images = fn(job.dir)
+        except BaseException:
+            job.release()
+            raise
+        if delete_images or not images:
+            job.release()
+        else:
+            self._held_jobs[job.dir] = job
+        return pdf, images
 
-    def download_chapter(self, chapter, delete_images=True):
-        url = self.get_url(chapter)
+    def _download_chapter(self, chapter, delete_images, page, job_dir, publish_gate=None):
+        url = page.url if page else self.get_url(chapter)
         print(f"Downloading chapter {chapter} from {url}...")
         if not url:
             print("No chapter URL found.")
             return None, []
 
-        title = self.download_and_get_title(url, chapter)
-        images = self.find_images(url)
-        images_on_disk = self._download_pages(images, str(chapter))
+        if page is None:
+            page = self.fetch_page(url, chapter)
+        title = page.title
+        print(title)
+        # A chapter we already have: revalidate its pages instead of refetching.
+        previous = self.storage.read_meta(chapter) or {}
+        known = {p["url"]: p for p in previous.get("page_files") or [] if p.get("url")}
+        manifest = self._download_pages(page.images, str(chapter), job_dir, known)
+        pages = manifest.ok_pages()
+        images_on_disk = [p["path"] for p in pages]
 
         if not images_on_disk:
             print("No images downloaded.")
             return None, []
+        if not self._finalizable(manifest, f"chapter {chapter}"):
+            return None, []
+        if publish_gate is not None and not publish_gate():
+            print(f"[pages] chapter {chapter}: not publishing it yet; pages are "
+                  f"kept in {manifest.path}")
+            return None, []
 
         output_pdf = self.storage.pdf_path(chapter)
-        preview_path = self.storage.preview_path(chapter)
-        self.images_to_pdf(images_on_disk, output_pdf, preview_image=preview_path)
-
-        # Build a CBZ alongside the PDF, straight from the freshly-downloaded
-        # pages (best quality — no PDF round-trip). Done before delete_images().
+        if self._unchanged(chapter, previous, pages):
+            print(f"[pages] chapter {chapter}: all {len(pages)} page(s) unchanged; "
+                  f"keeping its PDF/CBZ")
+            discord_copy = self._restore_extras(chapter, output_pdf, images_on_disk)
+            discord_pdf = os.path.basename(discord_copy) if discord_copy else None
+            page_files = self._page_files(pages)
+            if (page_files != previous.get("page_files") or title != previous.get("title")
+                    or discord_pdf != previous.get("discord_pdf")):
+                fields = dict(previous, title=title, source_url=url, page_files=page_files,
+                              discord_pdf=discord_pdf)
+                fields.pop("chapter", None)
+                self.storage.write_meta(chapter, **fields)
+            manifest.remove()
+            if delete_images:
+                self.storage.remove_job(job_dir)
+            return output_pdf, images_on_disk
+
+        # PDF, preview, a CBZ straight from the freshly-downloaded pages (best
+        # quality — no PDF round-trip) and, if the PDF will be over Discord's
+        # upload limit, a compressed copy the bot can post instead. All built
+        # in one pass over the pages, before delete_images(). The full PDF is
+        # never altered — calibre and the webapp always use it.
         output_cbz = self.storage.cbz_path(chapter)
-        images_to_cbz(images_on_disk, output_cbz)
-
-        # Build a Discord-sized copy now, while the source pages still exist, so
-        # the bot can post chapters whose full PDF exceeds Discord's upload limit.
-        # The full PDF is never altered — calibre and the webapp always use it.
-        discord_copy = self.ensure_discord_copy(output_pdf, images_on_disk)
+        discord_copy = self.build_artifacts(
+            images_on_disk, output_pdf, output_cbz=output_cbz,
+            preview_image=self.storage.preview_path(chapter),
+        )
 
         self.storage.write_meta(
             chapter,
@@ -148,12 +432,15 @@ class MangaDownloader:
             pdf=os.path.basename(output_pdf),
             cbz=os.path.basename(output_cbz),
             discord_pdf=(os.path.basename(discord_copy) if discord_copy else None),
+            page_files=self._page_files(pages),
+            missing_pages=manifest.missing,
         )
+        manifest.remove()
 
         print(f"Chapter {chapter} downloaded as PDF: {output_pdf}")
 
         if delete_images:
-            self.delete_images()
+            self.storage.remove_job(job_dir)
 
         return output_pdf, images_on_disk
 
@@ -163,7 +450,7 @@ class MangaDownloader:
         return its path. Otherwise return None — the full PDF fits and should be
         posted as-is. The full PDF is left untouched. Call while page images exist."""
         if limit is None:
-            limit = int(float(os.environ.get("DISCORD_PDF_LIMIT", 10 * 1024 * 1024)))
+            limit = self.discord_pdf_limit()
         if os.path.getsize(full_pdf) <= limit:
             return None
         dpath = self.storage.discord_copy_for(full_pdf)
@@ -172,26 +459,111 @@ class MangaDownloader:
         self.compress_pdf_to_size(image_paths, dpath, target)
         return dpath
 
-    def download_from_url(self, url, output_name="manual", delete_images=True):
+    @staticmethod
+    def discord_pdf_limit():
+        return int(float(os.environ.get("DISCORD_PDF_LIMIT", 10 * 1024 * 1024)))
+
+    def build_artifacts(self, image_paths, output_pdf, output_cbz=None, preview_image=None):
+        """Build the PDF and, optionally, CBZ and preview from the page images,
+        plus the Discord copy when the PDF will be over DISCORD_PDF_LIMIT — all
+        from one read of each page (see onepiece.artifacts). Returns the Discord
+        copy's path, or None if the full PDF fits. PDF_WRITER=pillow takes the
+        old one-artifact-at-a-time path."""
+        if os.environ.get("PDF_WRITER", "passthrough").lower() == "pillow":
+            self.images_to_pdf(image_paths, output_pdf, preview_image=preview_image)
+            if output_cbz:
+                images_to_cbz(image_paths, output_cbz)
+            return self.ensure_discord_copy(output_pdf, image_paths)
+
+        t0 = time.monotonic()
+        limit = self.discord_pdf_limit()
+        target = int(limit * 0.95)  # leave headroom under the hard limit
+        dpath = self.storage.discord_copy_for(output_pdf)
+
+        # JPEG pages go into the PDF as-is, so the page files' total is a good
+        # estimate of its size; PNG pages usually shrink when re-encoded, so
+        # this errs towards building a copy that turns out not to be needed.
+        # Planned before any sink opens a temp file, so a page the planner
+        # can't decode leaves nothing behind.
+        estimate = (sum(os.path.getsize(p) for p in image_paths)
+                    + PDF_PAGE_OVERHEAD * len(image_paths))
+        step = None
+        if estimate > limit:
+            step, predicted = plan_compression(image_paths, target)
+            max_width, quality = COMPRESS_LADDER[step]
+            print(f"[discord] PDF estimated at {estimate} bytes, over {limit}; building "
+                  f"compressed copy at max_width={max_width} quality={quality} "
+                  f"(predicted {predicted} bytes)")
+
+        sinks, discord = [], None
+        try:
+            sinks.append(PdfSink(output_pdf))
+            if output_cbz:
+                sinks.append(CbzSink(output_cbz))
+            if preview_image:
+                sinks.append(PreviewSink(preview_image))
+            if step is not None:
+                discord = DiscordSink(dpath, max_width, quality, target,
+                                      best_effort=step == len(COMPRESS_LADDER) - 1)
+                sinks.append(discord)
+        except BaseException:
+            for sink in sinks:
+                sink.abort()
+            raise
+
+        run_sinks(image_paths, sinks)
+        pdf = sinks[0].pdf
+        print(f"PDF saved: {output_pdf} ({pdf.passthrough} page(s) passed "
+              f"through, {pdf.reencoded} re-encoded)")
+        if preview_image:
+            print(f"Preview image saved: {preview_image}")
+        print(f"[artifacts] {len(sinks)} artifact(s) from {len(image_paths)} page(s) "
+              f"in one pass, {time.monotonic() - t0:.1f}s")
+
+        if os.path.getsize(output_pdf) <= limit:
+            if discord and os.path.exists(dpath):
+                os.remove(dpath)  # the estimate was high; the full PDF fits
+            return None
+        if discord and (discord.fits or discord.best_effort):
+            print(f"[discord] compressed copy {'fits' if discord.fits else 'still over'}: "
+                  f"{os.path.getsize(dpath)} bytes")
+            return dpath
+        # Not planned (estimate too low) or the prediction missed: fall back to
+        # the search, skipping the step that already came out too big.
+        print(f"[discord] full PDF over {limit} bytes; "
+              f"{'compressed copy missed the target' if discord else 'building compressed copy'}")
+        self.compress_pdf_to_size(image_paths, dpath, target,
+                                  first_step=step + 1 if discord else 0)
+        return dpath
+
+    def download_from_url(self, url, output_name="manual", delete_images=True, page=None):
+        """Download the page images at ``url`` into ``pdfs/<output_name>.pdf``
+        (plus a Discord copy if needed). Uses its own job dir and lock, like
+        download_chapter."""
+        return self._run_job(output_name, delete_images, lambda job_dir: self._download_from_url(
+            url, output_name, delete_images, page, job_dir))
+
+    def _download_from_url(self, url, output_name, delete_images, page, job_dir):
         print(f"Downloading from direct URL: {url}")
-        images = self.find_images(url)
+        images = page.images if page else self.find_images(url)
 
         if not images:
             print("No images found.")
             return None, []
 
-        images_on_disk = self._download_pages(images, output_name)
+        manifest = self._download_pages(images, output_name, job_dir)
+        images_on_disk = [p["path"] for p in manifest.ok_pages()]
 
-        if not images_on_disk:
+        if not images_on_disk or not self._finalizable(manifest, output_name):
             return None, []
 
         output_pdf = os.path.join(self.storage.pdf_dir, f"{output_name}.pdf")
-        self.images_to_pdf(images_on_disk, output_pdf)
-        self.ensure_discord_copy(output_pdf, images_on_disk)
+        self.build_artifacts(images_on_disk, output_pdf)
+        manifest.remove()
         print(f"Download complete: {output_pdf}")
 
         if delete_images:
-            self.delete_images()
+            self.storage.remove_job(job_dir)
 
         return output_pdf, images_on_disk
 
@@ -200,35 +572,46 @@ class MangaDownloader:
 
     def find_images(self, url):
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-
-            image_links = []
-
-            # Extract images from <img> tags
-            for img in soup.find_all('img', src=True):
-                img_src = img['src'].strip()
-                if img_src.startswith("http") and img_src not in image_links:
-                    image_links.append(img_src)
-
-            # Extract images from <meta property="og:image">
-            for meta in soup.find_all("meta", attrs={"property": "og:image"}):
-                img_src = meta.get("content", "").strip()
-                if img_src.startswith("http") and img_src not in image_links:
-                    image_links.append(img_src)
-
-            if len(image_links) <= 5:
-                print("Not enough images found, rejecting")
-                for i in image_links:
-                    print("  " + i)
-                image_links = []
-
-            return image_links
+            return self.fetch_page(url).images
         except requests.RequestException as e:
             print(f"Error downloading the page: {e}")
             return []
 
+    def fetch_page(self, url, chapter=None):
+        """GET and parse a chapter page once. The returned ChapterPage carries
+        everything the download paths need from it (title, image list, og tags),
+        so callers pass it along instead of re-fetching the same page."""
+        response = self.transport.get(url)
+        response.raise_for_status()
+        soup = BeautifulSoup(response.content, 'html.parser')
+
+        image_links = []
+
+        # Extract images from <img> tags
+        for img in soup.find_all('img', src=True):
+            img_src = img['src'].strip()
+            if img_src.startswith("http") and img_src not in image_links:
+                image_links.append(img_src)
+
+        # Extract images from <meta property="og:image">
+        for meta in soup.find_all("meta", attrs={"property": "og:image"}):
+            img_src = meta.get("content", "").strip()
+            if img_src.startswith("http") and img_src not in image_links:
+                image_links.append(img_src)
+
+        if len(image_links) <= 5:
+            print("Not enough images found, rejecting")
+            for i in image_links:
+                print("  " + i)
+            image_links = []
+
+        og = {}
+        for meta in soup.find_all("meta", attrs={"property": re.compile(r"^og:")}):
+            og.setdefault(meta["property"], []).append(meta.get("content", ""))
+
+        return ChapterPage(url=url, title=self.get_title(soup, chapter),
+                           images=image_links, og=og)
+
     def get_last_chapter(self):
         return self.storage.get_last_chapter()
 
@@ -280,116 +663,133 @@ class MangaDownloader:
     def get_url(self, chapter):
         return self.get_url_from_table_of_contents(chapter)
 
+    @property
+    def toc(self):
+        """The cached TOC index (see onepiece.toc). Rebuilt if
+        TABLE_OF_CONTENTS_URL is changed on the instance."""
+        if self._toc is None or self._toc.url != self.TABLE_OF_CONTENTS_URL:
+            self._toc = TableOfContents(self.transport, self.TABLE_OF_CONTENTS_URL)
+        return self._toc
+
     def get_url_from_table_of_contents(self, chapter):
-        response = requests.get(self.TABLE_OF_CONTENTS_URL)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        links = soup.find_all('a', href=True)
-        chapter_str = f"one-piece-chapter-{chapter}"
-        for link in links:
-            href = link['href']
-            if chapter_str in href:
-                return href
-        return None
+        return self.toc.lookup(chapter)
+
+    def _revalidate_toc(self):
+        before = self.toc.fingerprint
+        self.toc.refresh(force=True)
+        after = self.toc.fingerprint
+        if before is not None and after != before:
+            print(f"[probe] table of contents changed ({before} -> {after})")
+
+    def probe_many(self, chapters):
+        """Which of ``chapters`` the TOC lists, in the order given — one
+        conditional request however many are asked about."""
+        chapters = [int(c) for c in chapters]
+        if not chapters:
+            return []
+        self._revalidate_toc()
+        listed = [c for c in chapters if c in self.toc.index]
+        print(f"[probe] chapters {chapters[0]}-{chapters[-1]}: "
+              f"{', '.join(map(str, listed)) or 'none'} listed")
+        return listed
 
     def images_to_pdf(self, image_paths, output_pdf, preview_image=None):
         """
         Convert images to a PDF. Optionally save the first page as a preview image.
-        """
-        # Open images in RGB so the preview looks correct
-        images = [Image.open(p).convert("RGB") for p in image_paths]
 
-        # Save PDF
-        images[0].save(output_pdf, "PDF", resolution=100.0, save_all=True, append_images=images[1:])
-        print(f"PDF saved: {output_pdf}")
+        By default pages are streamed through onepiece.pdfwriter, which embeds
+        JPEG pages byte-for-byte and only decodes PNG/odd formats. Set
+        PDF_WRITER=pillow for the old decode-everything-and-re-encode path.
+        """
+        if os.environ.get("PDF_WRITER", "passthrough").lower() == "pillow":
+            # Open images in RGB so the preview looks correct
+            images = [Image.open(p).convert("RGB") for p in image_paths]
 
-        # Save first page as preview
-        if preview_image and images:
-            images[0].save(preview_image, "PNG")
+            # Save PDF
+            images[0].save(output_pdf, "PDF", resolution=100.0, save_all=True, append_images=images[1:])
+            print(f"PDF saved: {output_pdf}")
+        else:
+            pdf = write_pdf(image_paths, output_pdf)
+            print(f"PDF saved: {output_pdf} ({pdf.passthrough} page(s) passed "
+                  f"through, {pdf.reencoded} re-encoded)")
+
+        # Save first page as preview, downscaled to PREVIEW_MAX_WIDTH (0 keeps
+        # full size) — a draft decode when the source is a big JPEG.
+        if preview_image and image_paths:
+            save_preview(image_paths[0], preview_image)
             print(f"Preview image saved: {preview_image}")
 
-    def compress_pdf_to_size(self, image_paths, output_pdf, max_bytes):
+    def compress_pdf_to_size(self, image_paths, output_pdf, max_bytes, first_step=0):
         """
         Rebuild a PDF from source images, shrinking until it fits under max_bytes.
-        Decodes each source image once, resizes in parallel, and writes the PDF
-        directly from in-memory images (no on-disk JPEG round-trip).
-        Returns True if the result fits, False otherwise.
+        Decodes each source image once. Instead of walking COMPRESS_LADDER one
+        full encode at a time, it asks the size model (artifacts.CompressionPlan,
+        the same one plan_compression uses) for the least aggressive step
+        predicted to fit, and confirms it with a full in-memory encode —
+        correcting the model and jumping ahead if it missed. Pages
+        are encoded in parallel (COMPRESS_WORKERS, default: all cores) and the
+        PDF is assembled from the encoded JPEGs and written to disk once. JPEG
+        sources are decoded in draft mode at 1/2, 1/4... scale when the step's
+        width allows (see open_rgb). ``first_step`` skips ladder steps already
+        known to be too big. Returns True if the result fits, False otherwise.
         """
         if not image_paths:
             return False
 
-        import time
         from concurrent.futures import ThreadPoolExecutor
 
         def mb(n):
             return f"{n / (1024 * 1024):.2f}MB"
 
-        # (max_width_px, jpeg_quality) — least aggressive first.
-        passes = [
-            (1600, 75),
-            (1400, 65),
-            (1200, 60),
-            (1100, 50),
-            (1000, 45),
-            (900,  40),
-            (800,  35),
-        ]
-
+        ladder = COMPRESS_LADDER
         target_mb = mb(max_bytes)
         original_mb = mb(os.path.getsize(output_pdf)) if os.path.exists(output_pdf) else "?"
         print(f"[compress] start: pages={len(image_paths)} "
               f"original={original_mb} target<={target_mb}")
 
         t0 = time.monotonic()
-        originals = [Image.open(p).convert("RGB") for p in image_paths]
-        print(f"[compress] decoded {len(originals)} pages "
-              f"in {time.monotonic() - t0:.1f}s")
-
-        cached_pages = None
-        cached_width = None
-
-        for i, (max_width, quality) in enumerate(passes, start=1):
-            print(f"[compress] pass {i}/{len(passes)} "
-                  f"max_width={max_width} quality={quality}")
-
-            if max_width != cached_width:
-                def resize_one(img, mw=max_width):
-                    if img.width <= mw:
-                        return img
-                    ratio = mw / img.width
-                    new_size = (mw, max(1, int(img.height * ratio)))
-                    return img.resize(new_size, Image.LANCZOS)
-
+        workers = max(1, int(os.environ.get("COMPRESS_WORKERS") or os.cpu_count() or 1))
+        pool = ThreadPoolExecutor(max_workers=workers)
+        plan = CompressionPlan(image_paths, max_bytes, ladder, pool=pool)
+
+        # --- confirm with full encodes -------------------------------------
+        # Each page is resized and JPEG-encoded on its own worker (Pillow
+        # releases the GIL in resize and the codec), so this scales with cores;
+        # the PDF is then assembled from the pre-encoded streams as-is.
+        try:
+            encodes = 0
+            step = plan.choose(min(first_step, len(ladder) - 1))
+            while True:
+                max_width, quality = ladder[step]
                 t = time.monotonic()
-                with ThreadPoolExecutor() as ex:
-                    cached_pages = list(ex.map(resize_one, originals))
-                cached_width = max_width
-                print(f"[compress]   resized to {max_width}px wide "
-                      f"in {time.monotonic() - t:.1f}s")
-            else:
-                print(f"[compress]   reusing {max_width}px resized pages")
-
-            t = time.monotonic()
-            cached_pages[0].save(
-                output_pdf, "PDF",
-                resolution=100.0,
-                save_all=True,
-                append_images=cached_pages[1:],
-                quality=quality,
-            )
-            write_s = time.monotonic() - t
-            size = os.path.getsize(output_pdf)
-            print(f"[compress]   wrote PDF in {write_s:.1f}s → {mb(size)}")
-
-            if size <= max_bytes:
-                print(f"[compress] fits target ({mb(size)} <= {target_mb}) "
-                      f"after pass {i}, total {time.monotonic() - t0:.1f}s")
-                return True
-
-        print(f"[compress] exhausted all {len(passes)} passes; "
-              f"final size {mb(os.path.getsize(output_pdf))} still over "
-              f"{target_mb} (total {time.monotonic() - t0:.1f}s)")
-        return False
+                encoded = list(pool.map(lambda idx: plan.encode(idx, max_width, quality),
+                                        range(len(image_paths))))
+                size = sum(len(e[0]) for e in encoded) + PDF_PAGE_OVERHEAD * len(encoded)
+                encodes += 1
+                print(f"[compress]   step {step + 1}/{len(ladder)} max_width={max_width} "
+                      f"quality={quality}: predicted "
+                      f"{mb(plan.predictions[step] * plan.correction)}, "
+                      f"got {mb(size)} in {time.monotonic() - t:.1f}s "
+                      f"({workers} encoder thread(s))")
+                if size <= max_bytes or step == len(ladder) - 1:
+                    break
+                plan.learn(step, size)
+                step = plan.choose(step + 1)
+        finally:
+            pool.shutdown()
+
+        with PdfWriter(output_pdf) as pdf:
+            for page in encoded:
+                pdf.add_jpeg(*page)
+        size = os.path.getsize(output_pdf)
+        fits = size <= max_bytes
+        print(f"[compress] {'fits target' if fits else 'exhausted the ladder; still over'} "
+              f"({mb(size)} vs {target_mb}) with {encodes} full encode(s) + "
+              f"{plan.sample_encodes} sample page encode(s), {plan.decodes} page "
+              f"decode(s); the "
+              f"fixed ladder would have needed {step + 1} full encode(s) "
+              f"(total {time.monotonic() - t0:.1f}s)")
+        return fits
 
     def save_last_chapter(self, chapter):
         if chapter is None:
@@ -0,0 +1,262 @@
+"""Append-only change journal for the shared storage.
+
+Consumers used to find new chapters by listing ``pdfs/`` and diffing every
+file name against their full processed set on each poll. The writers now
+append a typed event to ``journal/`` whenever something changes, and each
+consumer keeps a durable read offset, so a poll only reads what's new:
+
+    {"seq": 412, "at": "2026-10-18T09:12:03+00:00", "type": "chapter_added", "chapter": 1161}
+
+Event types:
+
+  chapter_added      a chapter's metadata was written for the first time (its
+                     PDF, CBZ and preview are already in place)
+  meta_updated       an existing chapter's metadata was rewritten (re-download)
+  cbz_built          a CBZ was (re)built outside a download (webapp, repair)
+  preview_built      likewise a cover preview (repair)
+  request_enqueued   a chapter was queued in ``requests/``
+  request_cleared    a queued request was fulfilled or cancelled
+  chapter_unmarked   ``opctl reprocess`` reset a chapter for one consumer
+                     (``consumer`` names it)
+
+The journal is a series of JSON-lines segment files named after their first
+sequence number (``journal/000000000001.log``). Appends are serialized with
+``flock`` on ``journal.lock`` (the bot and the webapp append too, from other
+processes) — kept beside the directory rather than in it, since every open
+for writing inside ``journal/`` would wake the consumers watching it. Each
+event is written as one line and fsynced (per STORAGE_FSYNC) before
+returning. A line torn by a crash is cut off by the next append and never
+read, so every event a reader
+sees was completely written, and sequence numbers have no gaps.
+
+A ``JournalReader`` keeps its offset — sequence number, segment and byte
+position — in ``.journal_<name>.json`` under the storage root, written
+with ``atomic_write``. ``read()`` seeks straight to it; the caller commits the returned
+cursor once it has handled the events, so a crash in between re-reads them
+(handling must be idempotent — the reconciler's processed set makes it so)
+and nothing is skipped. A reader with no offset yet, or whose unread events
+were compacted away, gets ``None`` and must rescan the storage instead.
+
+When a segment fills up (JOURNAL_SEGMENT_EVENTS), a new one is started and
+old segments are dropped once every reader has moved past them. At most
+JOURNAL_KEEP_SEGMENTS are kept regardless, so a reader that is gone for good
+doesn't pin the journal forever; if it comes back, it rescans.
+
+Stdlib only.
+
+Env:
+  JOURNAL_SEGMENT_EVENTS   events per segment file (default 1000)
+  JOURNAL_KEEP_SEGMENTS    segments kept for lagging readers (default 8)
+"""
+
+import fcntl
+import json
+import os
+import re
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from .atomic import atomic_write, sync
+
+_SEGMENT_RE = re.compile(r"(\d{12})\.log$")
+_READER_RE = re.compile(r"\.journal_(.+)\.json$")
+_TAIL_BYTES = 64 * 1024
+
+
+def _segment_name(first_seq):
+    return f"{first_seq:012d}.log"
+
+
+class Journal:
+    def __init__(self, path, offsets_dir=None, segment_events=None, keep_segments=None):
+        self.path = path
+        self.offsets_dir = offsets_dir or path
+        self.segment_events = max(1, int(
+            segment_events or os.environ.get("JOURNAL_SEGMENT_EVENTS", 1000)))
+        self.keep_segments = max(1, int(
+            keep_segments or os.environ.get("JOURNAL_KEEP_SEGMENTS", 8)))
+        # Beside the directory: consumers watch journal/ for new events.
+        self._lock_path = os.path.normpath(path) + ".lock"
+        os.makedirs(path, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def segments(self):
+        """[(first_seq, path)] of the segment files, oldest first."""
+        found = []
+        for name in os.listdir(self.path):
+            m = _SEGMENT_RE.match(name)
+            if m:
+                found.append((int(m.group(1)), os.path.join(self.path, name)))
+        return sorted(found)
+
+    @staticmethod
+    def _tail(path):
+        """(last complete seq or None, byte length of the complete lines, file size)."""
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            start = max(0, size - _TAIL_BYTES)
+            while True:
+                f.seek(start)
+                data = f.read(size - start)
+                end = data.rfind(b"\n")
+                # A complete line needs a newline before it too, unless we're
+                # reading from the top of the file.
+                if end >= 0 and (start == 0 or data.rfind(b"\n", 0, end) >= 0):
+                    break
+                if start == 0:
+                    return None, 0, size
+                start = max(0, start - _TAIL_BYTES)
+        line = data[:end].rsplit(b"\n", 1)[-1]
+        try:
+            seq = int(json.loads(line)["seq"])
+        except (ValueError, KeyError, TypeError):
+            seq = None
+        return seq, start + end + 1, size
+
+    def _head(self, segments):
+        """(last seq, segment path, byte end of its complete lines)."""
+        if not segments:
+            return 0, None, 0
+        first, path = segments[-1]
+        seq, end, _ = self._tail(path)
+        return (first - 1 if seq is None else seq), path, end
+
+    def position(self):
+        """A cursor at the current end of the journal."""
+        with self._locked():
+            seq, path, end = self._head(self.segments())
+        return {"seq": seq, "segment": path and os.path.basename(path), "pos": end}
+
+    def append(self, type, **fields):
+        """Append one event and return it (with its ``seq``)."""
+        with self._locked():
+            segments = self.segments()
+            seq, path, end = self._head(segments)
+            if path is not None and os.path.getsize(path) > end:
+                print(f"[journal] dropping a torn write at the end of {os.path.basename(path)}")
+                with open(path, "r+b") as f:
+                    f.truncate(end)
+            seq += 1
+            rotated = path is None or seq - segments[-1][0] >= self.segment_events
+            if rotated:
+                path = os.path.join(self.path, _segment_name(seq))
+            event = {"seq": seq, "at": datetime.now(timezone.utc).isoformat(), "type": type}
+            event.update(fields)
+            with open(path, "a") as f:
+                f.write(json.dumps(event) + "\n")
+                sync(f)
+            if rotated and segments:
+                self._compact(self.segments())
+        return event
+
+    def reader_offsets(self):
+        """{reader name: committed seq} for every reader that has an offset."""
+        offsets = {}
+        for name in os.listdir(self.offsets_dir):
+            m = _READER_RE.match(name)
+            if not m:
+                continue
+            try:
+                with open(os.path.join(self.offsets_dir, name)) as f:
+                    offsets[m.group(1)] = int(json.load(f)["seq"])
+            except (ValueError, OSError, KeyError, TypeError):
+                continue
+        return offsets
+
+    def compact(self):
+        """Drop segments every reader has moved past (and any beyond
+        JOURNAL_KEEP_SEGMENTS). Runs on its own whenever a segment fills up."""
+        with self._locked():
+            return self._compact(self.segments())
+
+    def _compact(self, segments):
+        offsets = self.reader_offsets()
+        floor = min(offsets.values()) if offsets else self._head(segments)[0]
+        removed = 0
+        # The newest segment is always kept; older ones only go oldest-first,
+        # so what's left stays contiguous.
+        for i in range(len(segments) - 1):
+            last_in_segment = segments[i + 1][0] - 1
+            if last_in_segment > floor and len(segments) - i <= self.keep_segments:
+                break
+            os.remove(segments[i][1])
+            removed += 1
+        if removed:
+            print(f"[journal] compacted {removed} segment(s)")
+        return removed
+
+
+class JournalReader:
+    """One consumer's position in the journal."""
+
+    def __init__(self, journal, name):
+        self.journal = journal
+        self.name = name
+        self.offset_path = os.path.join(journal.offsets_dir, f".journal_{name}.json")
+
+    def cursor(self):
+        """The committed cursor, or None if this reader never committed one."""
+        try:
+            with open(self.offset_path) as f:
+                cursor = json.load(f)
+            int(cursor["seq"])
+            return cursor
+        except (ValueError, OSError, KeyError, TypeError):
+            return None
+
+    def read(self):
+        """(events, cursor): the events after the committed offset, oldest
+        first, and the cursor to commit once they're handled. ``events`` is
+        None when the reader must rescan instead — it has no offset yet, or
+        events it never read were compacted away; the cursor is then the
+        journal's current end, to commit after the rescan."""
+        cursor = self.cursor()
+        if cursor is None:
+            return None, self.journal.position()
+        seq = int(cursor["seq"])
+        segments = self.journal.segments()
+        names = [os.path.basename(p) for _, p in segments]
+        if seq > 0 and (not segments or (cursor.get("segment") not in names
+                                         and segments[-1][0] <= seq)):
+            # The journal was reset underneath us.
+            return None, self.journal.position()
+        events = []
+        for i, (first, path) in enumerate(segments):
+            if i + 1 < len(segments) and segments[i + 1][0] <= seq + 1:
+                continue  # everything in it was already read
+            if first > seq + 1:
+                return None, self.journal.position()  # compacted past us
+            name = names[i]
+            start = int(cursor.get("pos") or 0) if name == cursor.get("segment") else 0
+            with open(path, "rb") as f:
+                f.seek(start)
+                data = f.read()
+            data = data[:data.rfind(b"\n") + 1]  # complete lines only
+            offset = start
+            for line in data.splitlines(keepends=True):
+                offset += len(line)
+                try:
+                    event = json.loads(line)
+                    event_seq = int(event["seq"])
+                except (ValueError, KeyError, TypeError):
+                    return None, self.journal.position()
+                if event_seq <= seq:
+                    continue
+                if event_seq != seq + 1:
+                    return None, self.journal.position()
+                events.append(event)
+                seq = event_seq
+                cursor = {"seq": seq, "segment": name, "pos": offset}
+        return events, cursor
+
+    def commit(self, cursor):
+        """Persist ``cursor`` (from ``read``) as this reader's offset."""
+        atomic_write(self.offset_path, json.dumps(cursor))
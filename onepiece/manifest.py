@@ -0,0 +1,132 @@
+"""Per-chapter work manifest, so an interrupted download resumes.
+
+A chapter's page downloads used to be all-or-nothing per attempt: if the
+process died or a CDN flaked halfway, the next attempt fetched every page
+again, and pages that failed were silently dropped from a short PDF.
+``WorkManifest`` records each page of a download in the work dir
+(``work/<job>/<job>.manifest.json``) as it finishes:
+
+    {"prefix": "1160", "pages": [
+        {"index": 0, "url": "...", "status": "ok", "file": "1160_1.jpeg",
+         "bytes": 812345, "sha256": "...", "etag": "...", "last_modified": "..."},
+        {"index": 1, "url": "...", "status": "failed", "error": "..."},
+        ...]}
+
+Statuses: ``pending`` (not tried yet), ``ok``, ``failed`` (retry next time),
+``blocked`` (the URL filter rejected it) and ``oversize`` (over
+MAX_PAGE_BYTES — ads and video posters, not pages). A retry only fetches
+pages that aren't ``ok`` with their file still on disk at the recorded size.
+
+A manifest is ``complete`` when nothing is pending or failed; blocked and
+oversize pages are deliberately left out, as before. The downloader only
+builds a chapter from a complete manifest unless DOWNLOAD_PARTIAL=allow.
+
+Stdlib only.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+from .atomic import atomic_write
+
+PENDING = "pending"
+OK = "ok"
+FAILED = "failed"
+BLOCKED = "blocked"
+OVERSIZE = "oversize"
+
+# Statuses that still need a fetch before the chapter is whole.
+INCOMPLETE = (PENDING, FAILED)
+
+
+class WorkManifest:
+    def __init__(self, work_dir, prefix):
+        self.work_dir = work_dir
+        self.prefix = str(prefix)
+        self.path = os.path.join(work_dir, f"{self.prefix}.manifest.json")
+        self.pages = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, work_dir, prefix, urls):
+        """The manifest for this download: the saved one, with entries kept
+        for pages whose position and URL are unchanged, or a fresh one. Every
+        other entry starts ``pending``."""
+        manifest = cls(work_dir, prefix)
+        saved = {}
+        if os.path.exists(manifest.path):
+            try:
+                with open(manifest.path) as f:
+                    data = json.load(f)
+                saved = {(p["index"], p["url"]): p for p in data.get("pages", [])}
+            except (ValueError, OSError, KeyError, TypeError):
+                saved = {}
+        manifest.pages = [saved.get((i, url)) or {"index": i, "url": url, "status": PENDING}
+                          for i, url in enumerate(urls)]
+        return manifest
+
+    @property
+    def resumed(self):
+        """How many pages are reusable from an earlier attempt."""
+        return sum(1 for p in self.pages if self.reusable(p))
+
+    def path_of(self, page):
+        return os.path.join(self.work_dir, page["file"])
+
+    def reusable(self, page):
+        """An ``ok`` page whose file is still on disk at the recorded size."""
+        if page["status"] != OK:
+            return False
+        try:
+            return os.path.getsize(self.path_of(page)) == page["bytes"]
+        except (OSError, KeyError):
+            return False
+
+    def update(self, index, status, **fields):
+        """Record a page's outcome and save. Safe to call from fetch threads."""
+        with self._lock:
+            page = {"index": index, "url": self.pages[index]["url"], "status": status}
+            page.update(fields)
+            self.pages[index] = page
+            self._save()
+
+    def _save(self):
+        data = {
+            "prefix": self.prefix,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "pages": self.pages,
+        }
+        atomic_write(self.path, json.dumps(data, indent=2))
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    @property
+    def complete(self):
+        return not self.missing
+
+    @property
+    def missing(self):
+        """1-based page numbers still pending or failed."""
+        return [p["index"] + 1 for p in self.pages if p["status"] in INCOMPLETE]
+
+    def ok_pages(self):
+        """Page records (as _fetch_page returns them) of the ``ok`` pages, in
+        reading order."""
+        return [{"path": self.path_of(p), "url": p["url"], "bytes": p["bytes"],
+                 "sha256": p["sha256"], "etag": p.get("etag"),
+                 "last_modified": p.get("last_modified")}
+                for p in self.pages if p["status"] == OK]
+
+    def counts(self):
+        counts = {}
+        for p in self.pages:
+            counts[p["status"]] = counts.get(p["status"], 0) + 1
+        return counts
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
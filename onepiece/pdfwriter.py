@@ -0,0 +1,205 @@
+"""Streaming image-per-page PDF writer with JPEG passthrough.
+
+Pillow's ``save(..., "PDF", save_all=True)`` needs every page decoded and held
+in memory at once, then re-encodes each one to JPEG. Chapter pages are almost
+always JPEGs already, and a PDF can embed JPEG data as-is (a DCTDecode image
+XObject). ``PdfWriter`` writes one page at a time straight to disk:
+
+  - JPEG pages (8-bit grey or RGB, baseline or progressive) are embedded
+    byte-for-byte — no decode, no re-encode, no generational loss;
+  - anything else (PNG, CMYK/odd JPEGs) is decoded with Pillow and encoded to
+    JPEG, one page at a time.
+
+Memory stays flat regardless of chapter length. Pages are laid out the way
+Pillow did it (``resolution`` pixels per inch, default 100), so output page
+sizes are unchanged. Like the CBZ writer it builds into a temp file
+(onepiece.atomic.temp_path) and atomically renames, so a reader never sees a
+half-written PDF.
+
+Pillow is only imported for the fallback path.
+
+Env:
+  PDF_FALLBACK_QUALITY   JPEG quality for pages that must be re-encoded (default 75,
+                         Pillow's own PDF default)
+"""
+
+import io
+import os
+import struct
+
+from .atomic import commit, discard, sync, temp_path
+
+# Start-of-frame markers we pass through: baseline, extended sequential and
+# progressive Huffman. Arithmetic-coded and lossless JPEGs are rare and poorly
+# supported by readers, so those go through the re-encode path.
+_PASSTHROUGH_SOF = {0xC0, 0xC1, 0xC2}
+_ANY_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+            0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_COLORSPACES = {1: b"/DeviceGray", 3: b"/DeviceRGB"}
+
+
+def jpeg_info(data):
+    """(width, height, components) if ``data`` is a JPEG we can embed as-is,
+    else None. Reads only the marker segments up to the frame header."""
+    if data[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    n = len(data)
+    while i + 4 <= n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in (0x01,) or 0xD0 <= marker <= 0xD7:  # no length field
+            i += 2
+            continue
+        (length,) = struct.unpack(">H", data[i + 2:i + 4])
+        if marker in _ANY_SOF:
+            if marker not in _PASSTHROUGH_SOF or i + 10 > n:
+                return None
+            precision = data[i + 4]
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            components = data[i + 9]
+            if precision != 8 or not width or not height or components not in _COLORSPACES:
+                return None
+            return width, height, components
+        if marker == 0xDA:  # start of scan before any frame header
+            return None
+        i += 2 + length
+    return None
+
+
+def encode_jpeg(img, quality):
+    """Encode a Pillow image to JPEG bytes (grey stays grey, everything else RGB).
+    Returns (data, width, height, components)."""
+    if img.mode not in ("L", "RGB"):
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=quality)
+    return buf.getvalue(), img.width, img.height, 1 if img.mode == "L" else 3
+
+
+class PdfWriter:
+    """Write a PDF one full-page image at a time.
+
+        with PdfWriter(path) as pdf:
+            for p in pages:
+                pdf.add_image_file(p)
+    """
+
+    def __init__(self, output_pdf, resolution=100.0, fallback_quality=None):
+        self.output_pdf = output_pdf
+        self.resolution = float(resolution)
+        self.fallback_quality = int(fallback_quality or
+                                    os.environ.get("PDF_FALLBACK_QUALITY", 75))
+        self.tmp = temp_path(output_pdf)
+        self._f = open(self.tmp, "wb")
+        self._offsets = {}
+        self._pages = []
+        # Objects 1 and 2 (catalog, page tree) are written last, once the page
+        # list is known; the xref table doesn't care about file order.
+        self._next_id = 3
+        self.passthrough = 0
+        self.reencoded = 0
+        self._f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    # -- low level ---------------------------------------------------------
+    def _obj(self, body, stream=None, num=None):
+        if num is None:
+            num = self._next_id
+            self._next_id += 1
+        self._offsets[num] = self._f.tell()
+        self._f.write(b"%d 0 obj\n" % num)
+        if stream is None:
+            self._f.write(body + b"\nendobj\n")
+        else:
+            self._f.write(body[:-2] + b" /Length %d >>\nstream\n" % len(stream))
+            self._f.write(stream)
+            self._f.write(b"\nendstream\nendobj\n")
+        return num
+
+    # -- pages -------------------------------------------------------------
+    def add_jpeg(self, data, width, height, components):
+        """Add a page from JPEG bytes embedded as-is."""
+        image = self._obj(
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d "
+            b"/ColorSpace %s /BitsPerComponent 8 /Filter /DCTDecode >>"
+            % (width, height, _COLORSPACES[components]),
+            stream=data,
+        )
+        w = width * 72.0 / self.resolution
+        h = height * 72.0 / self.resolution
+        content = self._obj(b"<< >>", stream=b"q %.4f 0 0 %.4f 0 0 cm /Im0 Do Q" % (w, h))
+        page = self._obj(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.4f %.4f] "
+            b"/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+            % (w, h, image, content)
+        )
+        self._pages.append(page)
+
+    def add_image(self, img):
+        """Add a page from a decoded Pillow image (encoded to JPEG)."""
+        self.add_jpeg(*encode_jpeg(img, self.fallback_quality))
+        self.reencoded += 1
+
+    def add_image_bytes(self, data):
+        """Add a page from an image file's bytes: passthrough if it's an
+        embeddable JPEG, decoded and re-encoded otherwise."""
+        info = jpeg_info(data)
+        if info:
+            self.add_jpeg(data, *info)
+            self.passthrough += 1
+            return
+        from PIL import Image  # only for non-JPEG pages
+        with Image.open(io.BytesIO(data)) as img:
+            self.add_image(img)
+
+    def add_image_file(self, path):
+        with open(path, "rb") as f:
+            self.add_image_bytes(f.read())
+
+    # -- finish ------------------------------------------------------------
+    def close(self):
+        if self._f.closed:
+            return
+        kids = b" ".join(b"%d 0 R" % p for p in self._pages)
+        self._obj(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._pages)), num=2)
+        self._obj(b"<< /Type /Catalog /Pages 2 0 R >>", num=1)
+        xref = self._f.tell()
+        size = self._next_id
+        self._f.write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        for num in range(1, size):
+            self._f.write(b"%010d 00000 n \n" % self._offsets[num])
+        self._f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                      % (size, xref))
+        sync(self._f)
+        self._f.close()
+        commit(self.tmp, self.output_pdf)
+
+    def abort(self):
+        self._f.close()
+        discard(self.tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None and self._pages:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def images_to_pdf(image_paths, output_pdf, resolution=100.0):
+    """Write the given page images (reading order) to a PDF, streaming one page
+    at a time. Returns the PdfWriter (for its passthrough/re-encode counts).
+    Raises ValueError if there are no images."""
+    if not image_paths:
+        raise ValueError("no images to write into PDF")
+    with PdfWriter(output_pdf, resolution=resolution) as pdf:
+        for path in image_paths:
+            pdf.add_image_file(path)
+    return pdf
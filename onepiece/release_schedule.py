@@ -12,6 +12,13 @@ Strategy (purely time-based, robust to schedule drift):
     until it appears, which resets the clock.
   - If nothing shows up for ~2 weeks, assume a real break/hiatus and back off to a
     politer cadence (default: every 6h) so we're not hammering hourly for nothing.
+  - Around the expected release instant (the manual override, else the weekly
+    guess) poll in a short burst (default: every 45s, from 1h before to 6h
+    after). Burst polls only probe the TOC with a conditional request, so the
+    tight cadence cuts release-to-PDF latency without loading the source. If
+    the source doesn't answer those with 304s (no ETag/Last-Modified), every
+    probe is a full page, so the caller turns bursting off (``burst=False``)
+    and the normal cadence applies.
 
 All thresholds are env-configurable. ``expected_next_release`` is provided for
 display (e.g. the webapp) and is explicitly a guess, not a guarantee.
@@ -31,6 +38,9 @@ class ScheduleConfig:
     long_break: int = 21600    # cadence during a confirmed long break (6 hours)
     window_start_days: float = 6.0   # a chapter becomes "due" this long after the last
     long_break_days: float = 14.0    # past this with nothing new, assume a hiatus
+    burst: int = 45                  # cadence inside the release burst window (0 = off)
+    burst_before_hours: float = 1.0  # burst window opens this long before the expected release
+    burst_after_hours: float = 6.0   # ...and closes this long after it
 
     @classmethod
     def from_env(cls):
@@ -41,10 +51,42 @@ class ScheduleConfig:
             long_break=int(g("CHECK_INTERVAL_LONGBREAK", cls.long_break)),
             window_start_days=float(g("WINDOW_START_DAYS", cls.window_start_days)),
             long_break_days=float(g("LONG_BREAK_DAYS", cls.long_break_days)),
+            burst=int(g("CHECK_INTERVAL_BURST", cls.burst)),
+            burst_before_hours=float(g("BURST_BEFORE_HOURS", cls.burst_before_hours)),
+            burst_after_hours=float(g("BURST_AFTER_HOURS", cls.burst_after_hours)),
         )
 
 
-def next_check_delay(now, last_release, cfg=None, expected_release=None):
+def burst_window(target, cfg=None):
+    """(start, end) of the burst-poll window around an expected release instant,
+    or None if there's no target or bursting is disabled."""
+    cfg = cfg or ScheduleConfig()
+    if target is None or cfg.burst <= 0:
+        return None
+    return (target - timedelta(hours=cfg.burst_before_hours),
+            target + timedelta(hours=cfg.burst_after_hours))
+
+
+def in_burst_window(now, target, cfg=None):
+    window = burst_window(target, cfg)
+    return window is not None and window[0] <= now <= window[1]
+
+
+def _clamp_to_burst(delay, now, target, cfg):
+    """Shorten ``delay`` to the burst cadence inside the window, and never sleep
+    past the window opening."""
+    window = burst_window(target, cfg)
+    if window is None:
+        return delay
+    start, end = window
+    if start <= now <= end:
+        return min(delay, cfg.burst)
+    if now < start:
+        return int(min(delay, max(cfg.burst, (start - now).total_seconds())))
+    return delay
+
+
+def next_check_delay(now, last_release, cfg=None, expected_release=None, burst=True):
     """Seconds to sleep before the next check. ``now``, ``last_release`` and
     ``expected_release`` are timezone-aware datetimes.
 
@@ -52,9 +94,19 @@ def next_check_delay(now, last_release, cfg=None, expected_release=None):
     wins: idle until the set time (the idle cap still gives a light daily check on
     the way), then poll at the window cadence until a chapter lands, backing off
     only if it's long overdue. Otherwise fall back to the last-release heuristic.
-    ``last_release`` None -> window cadence to orient."""
+    ``last_release`` None -> window cadence to orient. Either way, inside the
+    burst window around the expected release the cadence tightens to
+    ``cfg.burst`` — unless ``burst`` is False (probes wouldn't be cheap)."""
     cfg = cfg or ScheduleConfig()
+    delay = _base_delay(now, last_release, cfg, expected_release)
+    if not burst:
+        return delay
+    target = expected_release if expected_release is not None \
+        else expected_next_release(last_release)
+    return _clamp_to_burst(delay, now, target, cfg)
+
 
+def _base_delay(now, last_release, cfg, expected_release):
     if expected_release is not None:
         until_open = (expected_release - now).total_seconds()  # window opens at the set time
         if until_open > 0:
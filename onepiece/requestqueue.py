@@ -0,0 +1,304 @@
+"""Chapter request queue (webapp/opctl -> downloader) with leases.
+
+``requests/`` used to be a set of ``<n>.request`` markers with no owner: a
+downloader served them one by one, and a second downloader (or ``opctl
+request`` racing the service) would download the same chapter twice.
+``RequestQueue`` keeps the same directory but gives it queue semantics:
+
+  <n>.request   queued. JSON: {"chapter", "source", "priority", "attempts",
+                "not_before", "enqueued_at", "last_error"}. Old markers (empty,
+                or just "webapp"/"opctl") are read as attempt 0, due now.
+  <n>.lease     claimed by a worker: the same record plus "owner" and
+                "leased_at".
+
+A worker ``claim``s a request by linking ``<n>.request`` to ``<n>.lease`` and
+removing the request — the link fails if a lease exists, so of any number of
+downloaders exactly one wins. It then either
+``complete``s it (the lease is removed) or ``release``s it after a failed
+attempt: the attempt is counted and the request goes back to ``<n>.request``,
+not due again for REQUEST_BACKOFF seconds, doubling per attempt up to
+REQUEST_BACKOFF_MAX — a chapter that isn't out yet is retried less and less
+often rather than every pass. While a claim is held, a heartbeat thread renews
+the lease (touches ``<n>.lease``) every third of REQUEST_LEASE, so a slow
+download keeps it; a lease not renewed for REQUEST_LEASE seconds (its holder
+died) is put back by the next ``ready()`` scan.
+
+``enqueue`` dedups: a chapter already queued keeps one marker (its priority
+raised if the new request is more urgent, and made due at once if it was
+backing off); one already leased is left to its worker. A new marker is
+created with link(), never over an existing one. Lower priority numbers are
+more urgent (opctl 1, webapp 2, as in onepiece.scheduler); ``ready()`` lists
+due requests most urgent first.
+
+Stdlib only.
+
+Env:
+  REQUEST_LEASE         seconds a claim survives without a heartbeat (default 1800)
+  REQUEST_BACKOFF       first retry delay after a failed attempt, seconds (default 300)
+  REQUEST_BACKOFF_MAX   cap on the retry delay, seconds (default 21600)
+"""
+
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+
+from .atomic import atomic_write, sync, temp_path
+
+SOURCE_PRIORITY = {"opctl": 1, "webapp": 2}
+DEFAULT_PRIORITY = SOURCE_PRIORITY["webapp"]
+
+_ENTRY_RE = re.compile(r"(\d+)\.(request|lease)$")
+
+
+class RequestQueue:
+    def __init__(self, directory):
+        self.directory = directory
+        self.lease_seconds = float(os.environ.get("REQUEST_LEASE", 1800))
+        self.backoff = float(os.environ.get("REQUEST_BACKOFF", 300))
+        self.backoff_max = float(os.environ.get("REQUEST_BACKOFF_MAX", 21600))
+        # Unique per queue object, so two workers in one process don't share leases.
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._heartbeats = {}      # chapter -> stop Event of its renewal thread
+        self._hb_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, chapter, state):
+        return os.path.join(self.directory, f"{int(chapter)}.{state}")
+
+    def _read(self, path, chapter):
+        """A marker's record; legacy plain-text markers are upgraded in memory."""
+        try:
+            with open(path) as f:
+                raw = f.read().strip()
+        except OSError:
+            return None
+        record = None
+        if raw.startswith("{"):
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                record = None
+        if not isinstance(record, dict):
+            source = raw if raw in SOURCE_PRIORITY else "webapp"
+            record = {"source": source}
+        record["chapter"] = int(chapter)
+        record.setdefault("source", "webapp")
+        record.setdefault("priority", SOURCE_PRIORITY.get(record["source"], DEFAULT_PRIORITY))
+        record.setdefault("attempts", 0)
+        record.setdefault("not_before", 0)
+        return record
+
+    # ----- producers -------------------------------------------------------
+    def enqueue(self, chapter, source="webapp", priority=None):
+        """Queue a chapter. Returns "queued", "raised" (already queued; now
+        more urgent, or taken out of its retry backoff), "duplicate" (already
+        queued, due, at least as urgently) or "leased" (a worker is on it).
+
+        A re-request is explicit, so it makes a request in backoff due now;
+        its attempt count is kept."""
+        priority = SOURCE_PRIORITY.get(source, DEFAULT_PRIORITY) if priority is None else priority
+        lease = self._path(chapter, "lease")
+        if os.path.exists(lease):
+            return "leased"
+        path = self._path(chapter, "request")
+        if self._create(path, {
+            "chapter": int(chapter), "source": source, "priority": priority,
+            "attempts": 0, "not_before": 0, "enqueued_at": time.time(),
+        }):
+            status = "queued"
+        else:
+            existing = self._read(path, chapter)
+            if existing is None:
+                return "leased"  # claimed since _create saw it
+            if priority >= existing["priority"] and existing["not_before"] <= time.time():
+                return "duplicate"
+            if priority < existing["priority"]:
+                existing.update(source=source, priority=priority)
+            existing["not_before"] = 0
+            atomic_write(path, json.dumps(existing))
+            status = "raised"
+        # A claim of the previous request may have landed between the checks
+        # and the write; a request next to a live lease is a duplicate.
+        if os.path.exists(lease):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return "leased"
+        return status
+
+    def _create(self, path, record):
+        """Write ``path`` only if it doesn't exist yet (link of a complete temp
+        file, so it never appears half-written). Returns whether we made it."""
+        tmp = temp_path(path)
+        with open(tmp, "w") as f:
+            json.dump(record, f)
+            sync(f)
+        try:
+            os.link(tmp, path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp)
+
+    def cancel(self, chapter):
+        """Drop a chapter's request, queued or leased. Returns whether one existed."""
+        removed = False
+        for state in ("request", "lease"):
+            try:
+                os.remove(self._path(chapter, state))
+                removed = True
+            except FileNotFoundError:
+                pass
+        return removed
+
+    # ----- inspection ------------------------------------------------------
+    def entries(self):
+        """{chapter: "request" | "lease"} for everything in the queue."""
+        found = {}
+        for name in os.listdir(self.directory):
+            m = _ENTRY_RE.match(name)
+            if m:
+                # A chapter can briefly have both (mid-release); the lease wins.
+                if found.get(int(m.group(1))) != "lease":
+                    found[int(m.group(1))] = m.group(2)
+        return found
+
+    def chapters(self):
+        """Every queued or in-flight chapter, ascending."""
+        return sorted(self.entries())
+
+    def get(self, chapter):
+        """The record of a chapter's request (with "state"), or None."""
+        for state in ("lease", "request"):
+            record = self._read(self._path(chapter, state), chapter)
+            if record is not None:
+                record["state"] = state
+                return record
+        return None
+
+    def ready(self, now=None):
+        """Requests due now, most urgent first (then oldest). Expired leases
+        are put back in the queue on the way."""
+        now = time.time() if now is None else now
+        due = []
+        for chapter, state in self.entries().items():
+            path = self._path(chapter, state)
+            if state == "lease":
+                self._expire(chapter, path, now)
+                continue
+            record = self._read(path, chapter)
+            if record is not None and record["not_before"] <= now:
+                due.append(record)
+        due.sort(key=lambda r: (r["priority"], r.get("enqueued_at") or 0, r["chapter"]))
+        return due
+
+    def _expire(self, chapter, path, now):
+        try:
+            age = now - os.path.getmtime(path)
+        except OSError:
+            return
+        if age < self.lease_seconds:
+            return
+        try:
+            os.rename(path, self._path(chapter, "request"))
+            print(f"[queue] lease on chapter {chapter} expired after {age:.0f}s; re-queued")
+        except FileNotFoundError:
+            pass  # finished, or someone else put it back
+
+    # ----- workers ---------------------------------------------------------
+    def claim(self, chapter):
+        """Take a queued chapter. Returns its record (now leased by us), or
+        None if it isn't queued or another worker got it first."""
+        lease = self._path(chapter, "lease")
+        request = self._path(chapter, "request")
+        # link() fails if a lease exists, so of any number of claimers exactly
+        # one wins, and a live lease is never overwritten.
+        try:
+            os.link(request, lease)
+        except (FileNotFoundError, FileExistsError):
+            return None
+        try:
+            os.remove(request)
+        except FileNotFoundError:
+            pass
+        record = self._read(lease, chapter) or {"chapter": int(chapter)}
+        record.update(owner=self.owner, leased_at=time.time())
+        atomic_write(lease, json.dumps(record))  # also restarts the lease clock
+        self._start_heartbeat(int(chapter))
+        return record
+
+    def renew(self, chapter):
+        """Restart the clock on our lease. False if it isn't ours any more."""
+        if self._owned(chapter) is None:
+            return False
+        try:
+            os.utime(self._path(chapter, "lease"))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _start_heartbeat(self, chapter):
+        stop = threading.Event()
+        with self._hb_lock:
+            old = self._heartbeats.pop(chapter, None)
+            if old is not None:
+                old.set()
+            self._heartbeats[chapter] = stop
+
+        def beat():
+            while not stop.wait(self.lease_seconds / 3):
+                if not self.renew(chapter):
+                    return
+
+        threading.Thread(target=beat, name=f"lease-{chapter}", daemon=True).start()
+
+    def _stop_heartbeat(self, chapter):
+        with self._hb_lock:
+            stop = self._heartbeats.pop(int(chapter), None)
+        if stop is not None:
+            stop.set()
+
+    def _owned(self, chapter):
+        record = self._read(self._path(chapter, "lease"), chapter)
+        if record is None or record.get("owner") != self.owner:
+            print(f"[queue] lost the lease on chapter {chapter}")
+            return None
+        return record
+
+    def complete(self, chapter):
+        """Finish our claim: the request is done. False if the lease was lost."""
+        self._stop_heartbeat(chapter)
+        if self._owned(chapter) is None:
+            return False
+        try:
+            os.remove(self._path(chapter, "lease"))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def release(self, chapter, error=None):
+        """Give our claim back after a failed attempt; it's retried after a
+        backoff that grows with the attempt count. Returns the delay."""
+        self._stop_heartbeat(chapter)
+        record = self._owned(chapter)
+        if record is None:
+            return None
+        attempts = int(record.get("attempts", 0)) + 1
+        delay = min(self.backoff_max, self.backoff * 2 ** (attempts - 1))
+        record.update(attempts=attempts, not_before=time.time() + delay,
+                      last_error=error)
+        record.pop("owner", None)
+        record.pop("leased_at", None)
+        lease = self._path(chapter, "lease")
+        atomic_write(lease, json.dumps(record))
+        try:
+            os.rename(lease, self._path(chapter, "request"))
+        except FileNotFoundError:
+            return None
+        return delay
@@ -0,0 +1,193 @@
+"""In-process priority job scheduler for the downloader service.
+
+``run_pass`` used to do everything in one blocking sequence — every queued
+request, then the new-chapter check — so a fresh release waited behind a
+backlog of old chapters (and vice versa). ``JobScheduler`` runs work as jobs
+on a small worker pool, most urgent first:
+
+  RELEASE   the new-chapter check / catch-up
+  OPCTL     a chapter explicitly queued with ``opctl request --queue``
+  WEBAPP    a chapter requested from the webapp (usually a backfill)
+  REPAIR    housekeeping: missing CBZ/preview rebuilds, backup sync
+
+Jobs are keyed; submitting a key that is already queued or running returns
+the existing job (raising its priority if the new submission is more urgent),
+so re-scanning the request queue every pass never double-books a chapter.
+One worker is reserved for RELEASE/OPCTL work: WEBAPP and REPAIR jobs may use
+at most ``workers - 1`` threads, so latency-sensitive work never waits for a
+bulk backfill to finish. Running jobs aren't interrupted.
+
+Each job records its state (queued -> running -> done/failed), timings and
+result or error; ``jobs()`` is a snapshot for logging and status.
+
+Stdlib only.
+
+Env:
+  JOB_WORKERS   worker threads (default 2; 1 disables the reservation)
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+RELEASE = 0
+OPCTL = 1
+WEBAPP = 2
+REPAIR = 3
+PRIORITY_NAMES = {RELEASE: "release", OPCTL: "opctl", WEBAPP: "webapp", REPAIR: "repair"}
+
+# Priorities at or above this are background work, kept off the reserved worker.
+BACKGROUND = WEBAPP
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+@dataclass
+class Job:
+    key: str
+    priority: int
+    fn: Callable[[], Any] = field(repr=False)
+    state: str = QUEUED
+    result: Any = None
+    error: Optional[BaseException] = None
+    submitted_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    _done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def label(self):
+        return f"{self.key} ({PRIORITY_NAMES.get(self.priority, self.priority)})"
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED)
+
+    def wait(self, timeout=None):
+        """Block until the job finishes; returns whether it did."""
+        return self._done.wait(timeout)
+
+
+class JobScheduler:
+    def __init__(self, workers=None):
+        self.workers = max(1, int(workers or os.environ.get("JOB_WORKERS", 2)))
+        self._heap = []               # (priority, seq, job)
+        self._seq = itertools.count()
+        self._active = {}             # key -> queued/running Job
+        self._history = []            # finished jobs, most recent last
+        self._background_running = 0
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._threads = [threading.Thread(target=self._work, name=f"job-worker-{i}",
+                                          daemon=True)
+                         for i in range(self.workers)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, key, priority, fn):
+        """Queue ``fn()`` as job ``key``. If that key is already queued or
+        running, return the existing job instead (a queued one is bumped to
+        ``priority`` if that is more urgent)."""
+        with self._cond:
+            job = self._active.get(key)
+            if job is not None:
+                if job.state == QUEUED and priority < job.priority:
+                    # The old heap entry is skipped when popped (priority mismatch).
+                    job.priority = priority
+                    heapq.heappush(self._heap, (priority, next(self._seq), job))
+                    self._cond.notify_all()
+                return job
+            job = Job(key=key, priority=priority, fn=fn)
+            self._active[key] = job
+            heapq.heappush(self._heap, (priority, next(self._seq), job))
+            print(f"[job] queued {job.label}; {len(self._active)} active")
+            self._cond.notify_all()
+            return job
+
+    def _limit_for(self, priority):
+        if priority >= BACKGROUND and self.workers > 1:
+            return self.workers - 1
+        return self.workers
+
+    def _next(self):
+        """Pop the most urgent runnable job, waiting as needed. None on stop."""
+        with self._cond:
+            while True:
+                if self._stopping:
+                    return None
+                # Drop stale entries left behind by priority bumps.
+                while self._heap and (self._heap[0][2].state != QUEUED
+                                      or self._heap[0][0] != self._heap[0][2].priority):
+                    heapq.heappop(self._heap)
+                if self._heap:
+                    priority, _, job = self._heap[0]
+                    if (priority < BACKGROUND
+                            or self._background_running < self._limit_for(priority)):
+                        heapq.heappop(self._heap)
+                        job.state = RUNNING
+                        job.started_at = time.monotonic()
+                        if priority >= BACKGROUND:
+                            self._background_running += 1
+                        return job
+                self._cond.wait()
+
+    def _work(self):
+        while True:
+            job = self._next()
+            if job is None:
+                return
+            print(f"[job] start {job.label} after "
+                  f"{job.started_at - job.submitted_at:.1f}s queued")
+            try:
+                job.result = job.fn()
+                job.state = DONE
+            except Exception as e:
+                job.error = e
+                job.state = FAILED
+            job.finished_at = time.monotonic()
+            took = job.finished_at - job.started_at
+            if job.state == DONE:
+                print(f"[job] done {job.label} in {took:.1f}s")
+            else:
+                print(f"[job] failed {job.label} after {took:.1f}s: {job.error}")
+            with self._cond:
+                if job.priority >= BACKGROUND:
+                    self._background_running -= 1
+                del self._active[job.key]
+                self._history = (self._history + [job])[-100:]
+                self._cond.notify_all()
+            job._done.set()
+
+    def jobs(self):
+        """Snapshot: queued/running jobs, then recently finished ones."""
+        with self._cond:
+            active = sorted(self._active.values(), key=lambda j: (j.priority, j.submitted_at))
+            return active + list(reversed(self._history))
+
+    def get(self, key):
+        with self._cond:
+            return self._active.get(key)
+
+    def join(self, timeout=None):
+        """Wait until nothing is queued or running. Returns whether it got there."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._active:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def shutdown(self, wait=True):
+        """Stop taking jobs (queued ones are dropped; running ones finish)."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if wait:
+            for t in self._threads:
+                t.join()
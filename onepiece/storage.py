@@ -9,26 +9,77 @@ Layout under the root:
     cbz/       one piece - <chapter>.cbz      (comic-archive copies)
     previews/  <chapter>.png                  (first-page cover thumbnails)
     meta/      <chapter>.json                 (chapter metadata sidecars)
-    requests/  <chapter>.request              (webapp -> downloader queue)
-    work/      <chapter>_<n>.<ext>            (transient page images)
+    requests/  <chapter>.request              (webapp/opctl -> downloader queue;
+               <chapter>.lease                 claimed by a downloader)
+    work/      <job>/<job>_<n>.<ext>          (one scratch dir per download job:
+               <job>/<job>.manifest.json       page images + resumable state)
+               <job>.lock                     (held while a job runs, and while a
+                                              caller keeps its pages)
+    blobs/     <aa>/<sha256>                  (page images by content hash; work/
+                                              pages link here. See onepiece.blobstore)
+    journal/   <first seq>.log                (append-only change events; see
+                                              onepiece.journal)
+    journal.lock                              (serializes journal appends)
+    catalog.sqlite3                           (indexed read model of the chapters;
+                                              see onepiece.catalog)
     last_chapter.txt                          (highest chapter fetched)
-    .processed_<name>.json                    (per-consumer reconcile state)
+    .processed_<name>.json                    (per-consumer reconcile state: snapshot
+    .processed_<name>.log                      + append-only mark/unmark log)
+    .journal_<name>.json                      (per-consumer journal offset)
+    .generation                               (bumped on every change except the
+                                              poll heartbeat; see onepiece.cache)
 
 Kept dependency-free (stdlib only) so storage-only consumers don't pull in
 Pillow/requests.
 """
 
+import fcntl
 import json
 import os
 import re
+import shutil
+import sqlite3
+import time
+from contextlib import contextmanager
 from datetime import date, datetime, timezone
 
+from .atomic import atomic_open, atomic_write, batch, sweep_temp, sync
+from .blobstore import BlobStore, page_refs
+from .catalog import Catalog
+from .journal import Journal, JournalReader
+from .requestqueue import RequestQueue
+
 DEFAULT_ROOT = "storage"
 
 # Chapter PDFs are named "one piece - <chapter>.pdf"; CBZ copies mirror that name.
 _PDF_RE = re.compile(r"one piece - (\d+)\.pdf$", re.IGNORECASE)
 _CBZ_RE = re.compile(r"one piece - (\d+)\.cbz$", re.IGNORECASE)
-_REQUEST_RE = re.compile(r"(\d+)\.request$")
+_JOB_KEY_RE = re.compile(r"[^\w.-]")
+
+
+class JobLock:
+    """A held job lock (Storage.acquire_job). If the job's scratch dir is gone
+    when it's released (remove_job), the lock file is removed too, while
+    still held."""
+
+    def __init__(self, job_dir, path, f):
+        self.dir = job_dir
+        self.path = path
+        self._file = f
+
+    def release(self):
+        if self._file is None:
+            return
+        f, self._file = self._file, None
+        try:
+            if not os.path.isdir(self.dir):
+                try:
+                    os.remove(self.path)
+                except FileNotFoundError:
+                    pass
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
 
 
 class Storage:
@@ -45,9 +96,101 @@ class Storage:
         self.work_dir = os.path.join(self.root, "work")
         self.last_chapter_file = os.path.join(self.root, "last_chapter.txt")
         self.last_check_file = os.path.join(self.root, "last_check.txt")
+        self.expected_file = os.path.join(self.root, "expected_next.txt")
         for d in (self.pdf_dir, self.cbz_dir, self.discord_dir, self.preview_dir,
                   self.meta_dir, self.requests_dir, self.work_dir):
             os.makedirs(d, exist_ok=True)
+        self.journal = Journal(os.path.join(self.root, "journal"), offsets_dir=self.root)
+        self.catalog_path = os.path.join(self.root, "catalog.sqlite3")
+        self.generation_file = os.path.join(self.root, ".generation")
+        self.requests = RequestQueue(self.requests_dir)
+        self.blobs = BlobStore(os.path.join(self.root, "blobs"))
+        self._catalog = None
+        self.sweep_temp()
+
+    # ----- writes -----------------------------------------------------------
+    # Every mutable file is replaced with onepiece.atomic.atomic_write, so a
+    # reader in another container never sees one half-written.
+    @staticmethod
+    def batch():
+        """Defer the fsyncs of this thread's storage writes to the end of the
+        block (see onepiece.atomic.batch) — for backfills writing many files."""
+        return batch()
+
+    def sweep_temp(self):
+        """Remove temp files left by atomic writes that crashed (see
+        onepiece.atomic.sweep_temp) from every directory Storage writes to,
+        including the artifact dirs and each job's scratch dir."""
+        dirs = [self.root, self.meta_dir, self.requests_dir, self.journal.path,
+                self.pdf_dir, self.cbz_dir, self.discord_dir, self.preview_dir]
+        try:
+            dirs += [entry.path for entry in os.scandir(self.work_dir) if entry.is_dir()]
+        except FileNotFoundError:
+            pass
+        removed = sum(sweep_temp(d) for d in dirs)
+        if removed:
+            print(f"[storage] removed {removed} stale temp file(s)")
+        return removed
+
+    def changed(self):
+        """Bump the generation stamp that in-memory caches of the storage
+        (onepiece.cache.CachedStorage) check before serving. Every mutating
+        method calls it; anything else that edits the files should too."""
+        try:
+            atomic_write(self.generation_file, str(time.time_ns()))
+        except OSError as e:
+            print(f"[storage] could not bump generation: {e}")
+
+    # ----- change journal ---------------------------------------------------
+    def record(self, type, **fields):
+        """Append a change event to the journal. Never fatal: if the append
+        fails, consumers still catch the change on their next rescan."""
+        try:
+            return self.journal.append(type, **fields)
+        except OSError as e:
+            print(f"[journal] could not record {type}: {e}")
+            return None
+
+    # ----- chapter catalog ------------------------------------------------
+    @property
+    def catalog(self):
+        """The chapter catalog, opened on first use (and built from disk if
+        it's new)."""
+        if self._catalog is None:
+            catalog = Catalog(self.catalog_path)
+            if not catalog.built:
+                count = catalog.rebuild(self)
+                print(f"[catalog] built from disk: {count} chapter(s)")
+            self._catalog = catalog
+        return self._catalog
+
+    def _update_catalog(self, fn):
+        try:
+            fn()
+        except sqlite3.Error as e:
+            print(f"[catalog] update failed ({e}); run 'opctl catalog --rebuild'")
+
+    def refresh_catalog(self, chapter, meta=None):
+        """Re-read one chapter's row (metadata and artifact flags) from disk."""
+        self._update_catalog(lambda: self.catalog.upsert(
+            chapter, meta or self.read_meta(chapter), has_pdf=self.has_chapter(chapter),
+            has_cbz=self.has_cbz(chapter),
+            has_preview=os.path.exists(self.preview_path(chapter))))
+        self.changed()
+
+    def note_artifact(self, chapter, kind):
+        """Record that a chapter's CBZ or preview was built outside a download
+        (webapp, repair): the catalog flag, and a journal event."""
+        self._update_catalog(lambda: self.catalog.set_artifact(chapter, kind))
+        self.changed()
+        self.record(f"{kind}_built", chapter=int(chapter))
+
+    def note_repair_failed(self, chapter, error):
+        """Record that a chapter's CBZ/preview couldn't be rebuilt from its PDF,
+        so the repair pass stops retrying it (until the chapter is re-downloaded
+        or the catalog rebuilt)."""
+        self._update_catalog(lambda: self.catalog.set_repair_error(chapter, str(error)))
+        self.changed()
 
     # ----- paths -----------------------------------------------------------
     def pdf_path(self, chapter):
@@ -75,6 +218,93 @@ class Storage:
     def meta_path(self, chapter):
         return os.path.join(self.meta_dir, f"{chapter}.json")
 
+    # ----- per-job scratch dirs -------------------------------------------
+    def job_key(self, key):
+        """Filesystem-safe name for a download job (a chapter number or a
+        manual download's output name)."""
+        return _JOB_KEY_RE.sub("_", str(key)) or "_"
+
+    def job_dir(self, key):
+        """A download job's own scratch dir under work/: its page images and
+        work manifest. Created on demand. Kept after a failed attempt so the
+        retry resumes; removed by remove_job once the job's files are done with."""
+        path = os.path.join(self.work_dir, self.job_key(key))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _lock_path(self, key):
+        return os.path.join(self.work_dir, f"{self.job_key(key)}.lock")
+
+    @staticmethod
+    def _is_current(f, path):
+        """Whether the open lock file ``f`` is still the one at ``path`` (its
+        last holder may have unlinked it while we waited)."""
+        try:
+            return os.fstat(f.fileno()).st_ino == os.stat(path).st_ino
+        except FileNotFoundError:
+            return False
+
+    def acquire_job(self, key):
+        """Take a job's lock (work/<job>.lock), waiting while another thread or
+        process holds it, and return a JobLock: ``.dir`` is the job's scratch
+        dir, ``.release()`` gives the lock back. Two different jobs never wait
+        on each other; the same job started twice (e.g. by the bot and the
+        downloader) runs one at a time, and the second resumes from the first's
+        pages. Blocks — async callers run the job in a thread."""
+        path = self._lock_path(key)
+        while True:
+            f = open(path, "a")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            except BaseException:
+                f.close()
+                raise
+            if self._is_current(f, path):
+                break
+            f.close()  # unlinked by the job we waited on; lock the new file
+        return JobLock(self.job_dir(key), path, f)
+
+    @contextmanager
+    def lock_job(self, key):
+        """Hold a job's lock for the duration of the block (see acquire_job)
+        and yield its scratch dir."""
+        job = self.acquire_job(key)
+        try:
+            yield job.dir
+        finally:
+            job.release()
+
+    def remove_job(self, job_dir):
+        """Delete a job's scratch dir and everything in it. Only dirs directly
+        under work/ are touched. Its lock file goes too, unless the job is
+        running (then lock_job removes it when the job ends)."""
+        job_dir = os.path.abspath(job_dir)
+        if os.path.dirname(job_dir) != os.path.abspath(self.work_dir):
+            return
+        shutil.rmtree(job_dir, ignore_errors=True)
+        path = job_dir + ".lock"
+        try:
+            f = open(path)
+        except FileNotFoundError:
+            return
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            if self._is_current(f, path) and not os.path.isdir(job_dir):
+                os.remove(path)
+
+    # ----- page blobs -------------------------------------------------------
+    def gc_blobs(self, dry_run=False):
+        """Drop page blobs outside the newest BLOB_KEEP_CHAPTERS chapters'
+        ``page_files`` (and not linked by a running job). Returns (removed,
+        bytes freed)."""
+        keep = set()
+        if self.blobs.keep_chapters > 0:
+            keep = set(page_refs(self.catalog.newest(self.blobs.keep_chapters)))
+        return self.blobs.gc(keep, dry_run=dry_run)
+
     # ----- chapter inventory ----------------------------------------------
     def has_chapter(self, chapter):
         return os.path.exists(self.pdf_path(chapter))
@@ -103,8 +333,12 @@ class Storage:
         data = {"chapter": int(chapter)}
         data.update(fields)
         data.setdefault("downloaded_at", datetime.now(timezone.utc).isoformat())
-        with open(self.meta_path(chapter), "w") as f:
+        existed = os.path.exists(self.meta_path(chapter))
+        with atomic_open(self.meta_path(chapter)) as f:
             json.dump(data, f, indent=2)
+        # Metadata is written last, so this is when a chapter counts as added.
+        self.refresh_catalog(chapter, data)  # also bumps the generation
+        self.record("meta_updated" if existed else "chapter_added", chapter=int(chapter))
         return data
 
     # ----- last-chapter state ---------------------------------------------
@@ -121,8 +355,8 @@ class Storage:
             return
         last = self.get_last_chapter()
         if last is None or int(chapter) > int(last):
-            with open(self.last_chapter_file, "w") as f:
-                f.write(str(int(chapter)))
+            atomic_write(self.last_chapter_file, str(int(chapter)))
+            self.changed()
 
     # ----- last-check state (downloader poll heartbeat) -------------------
     def get_last_check(self):
@@ -137,13 +371,15 @@ class Storage:
     def save_last_check(self, when=None):
         """Record that the downloader just polled. Defaults to now (UTC)."""
         when = when or datetime.now(timezone.utc)
-        with open(self.last_check_file, "w") as f:
-            f.write(when.isoformat() if hasattr(when, "isoformat") else str(when))
+        # Not a change to the library: no generation bump, or every poll
+        # would flush the webapp's caches (readers read this file directly).
+        atomic_write(self.last_check_file,
+                     when.isoformat() if hasattr(when, "isoformat") else str(when))
 
     # ----- expected next release (manual schedule override) ---------------
     @property
     def _expected_file(self):
-        return os.path.join(self.root, "expected_next.txt")
+        return self.expected_file
 
     def _read_expected(self):
         """Parse expected_next.txt into (aware-UTC datetime, tz_name|None), or None.
@@ -207,89 +443,314 @@ class Storage:
         """Persist a manual override. ``value`` is a date or an aware datetime.
         When ``tz_name`` is given, store JSON so the zone label survives for
         display; otherwise store the bare ISO string."""
-        with open(self._expected_file, "w") as f:
-            if tz_name:
-                f.write(json.dumps({"at": value.isoformat(), "tz": tz_name}))
-            else:
-                f.write(value.isoformat())
+        if tz_name:
+            atomic_write(self._expected_file,
+                         json.dumps({"at": value.isoformat(), "tz": tz_name}))
+        else:
+            atomic_write(self._expected_file, value.isoformat())
+        self.changed()
 
     def clear_expected_release(self):
         if os.path.exists(self._expected_file):
             os.remove(self._expected_file)
+            self.changed()
 
     # ----- request queue (webapp -> downloader) ---------------------------
-    def request_chapter(self, chapter):
-        path = os.path.join(self.requests_dir, f"{int(chapter)}.request")
-        open(path, "a").close()
-        return path
+    # A leased queue (onepiece.requestqueue): workers claim a request before
+    # serving it, so two downloaders never fetch the same chapter at once.
+    def request_chapter(self, chapter, source="webapp"):
+        """Queue a chapter for the downloader. ``source`` ("webapp" or
+        "opctl") sets its priority; re-requesting a queued chapter never
+        lowers it, and one already being downloaded is left alone."""
+        status = self.requests.enqueue(chapter, source=source)
+        if status in ("queued", "raised"):
+            self.changed()
+            self.record("request_enqueued", chapter=int(chapter), source=source)
+        return os.path.join(self.requests_dir, f"{int(chapter)}.request")
+
+    def request_source(self, chapter):
+        """Who queued a request: "opctl" or "webapp" (also for old, empty markers)."""
+        record = self.requests.get(chapter)
+        return record["source"] if record else "webapp"
 
     def pending_requests(self):
-        reqs = []
-        for name in os.listdir(self.requests_dir):
-            m = _REQUEST_RE.match(name)
-            if m:
-                reqs.append(int(m.group(1)))
-        return sorted(reqs)
+        """Chapters queued or being downloaded, ascending."""
+        return self.requests.chapters()
 
     def clear_request(self, chapter):
-        path = os.path.join(self.requests_dir, f"{int(chapter)}.request")
-        if os.path.exists(path):
-            os.remove(path)
+        """Cancel a chapter's request (queued or in progress)."""
+        if self.requests.cancel(chapter):
+            self.changed()
+            self.record("request_cleared", chapter=int(chapter))
+
+    def claim_request(self, chapter):
+        """Lease a queued chapter to this process (see RequestQueue.claim);
+        None if it isn't queued or another worker has it."""
+        return self.requests.claim(chapter)
+
+    def finish_request(self, chapter):
+        """The claimed request is done (downloaded, or already on disk)."""
+        if self.requests.complete(chapter):
+            self.changed()
+            self.record("request_cleared", chapter=int(chapter))
+
+    def retry_request(self, chapter, error=None):
+        """The claimed request failed this time: back in the queue after a
+        backoff. Returns the delay in seconds (None if the lease was lost)."""
+        return self.requests.release(chapter, error)
 
 
 class Reconciler:
     """Tracks which chapters a consumer has already handled, persisted so it
     survives restarts. Used identically by the bot (posted) and calibre
-    uploader (uploaded): on startup, ``pending()`` returns the backlog; after
-    handling a chapter, call ``mark()``.
+    uploader (uploaded): ``pending()`` returns what's new; after handling a
+    chapter, call ``mark()`` (or ``fail()`` if it couldn't be handled), and
+    after the pass, ``advance()``.
+
+    ``pending()`` tails the storage journal under the consumer's name rather
+    than listing every PDF, so a poll costs O(new events). It rescans the
+    storage when it has no journal offset yet, when the journal was compacted
+    past it, and every JOURNAL_RESCAN seconds (default 86400; 0 disables) as a
+    safety net for PDFs that arrive without an event (e.g. copied in by hand).
+
+    A failed chapter is recorded with its attempt count and time, so the
+    journal offset can move past it; ``pending()`` keeps returning it from
+    that record until it's marked, but only once its retry is due: after
+    RECONCILE_BACKOFF seconds, doubling per attempt up to RECONCILE_BACKOFF_MAX
+    (as in onepiece.requestqueue). An outage delays chapters, never drops
+    them. ``unmark()`` (``opctl reprocess``) makes one due at once;
+    ``opctl failures`` lists them.
     """
 
     def __init__(self, storage, name):
         self.storage = storage
         self.name = name
         self.state_path = os.path.join(storage.root, f".processed_{name}.json")
-        self.processed = self._load()
-
-    def _load(self):
-        if os.path.exists(self.state_path):
+        self.log_path = os.path.join(storage.root, f".processed_{name}.log")
+        # No state at all yet: this consumer has never run against this storage.
+        self.new = not (os.path.exists(self.state_path) or os.path.exists(self.log_path))
+        self.processed = set()
+        self.failed = {}           # chapter -> (attempts, last failure), while unmarked
+        self._snapshot_id = None
+        self._log_pos = 0
+        self.reload()
+        self.reader = JournalReader(storage.journal, name)
+        self.rescan_interval = float(os.environ.get("JOURNAL_RESCAN", 86400))
+        self.backoff = float(os.environ.get("RECONCILE_BACKOFF", 300))
+        self.backoff_max = float(os.environ.get("RECONCILE_BACKOFF_MAX", 21600))
+        self._rescanned_at = time.monotonic()
+        self._pending = []
+        self._cursor = None
+
+    # State is a snapshot (.processed_<name>.json: the sorted chapter list and
+    # the failed attempts, replaced atomically) plus an append-only op log
+    # (.processed_<name>.log, one "+<chapter>", "-<chapter>" or
+    # "!<chapter>@<unix time>" line per mark/unmark/failed attempt). A mark appends
+    # one line instead of rewriting the whole set; once the log passes
+    # _COMPACT_BYTES it is folded into a new snapshot and emptied. The log
+    # file doubles as the lock (flock) shared by every process that touches
+    # this consumer's state. Replaying ops is idempotent, so a crash between
+    # the snapshot replace and the log truncate loses nothing.
+    _COMPACT_BYTES = 64 * 1024
+
+    @contextmanager
+    def _locked(self, mode):
+        with open(self.log_path, "ab") as f:
+            fcntl.flock(f, mode)
             try:
-                with open(self.state_path) as f:
-                    return set(json.load(f))
-            except (ValueError, OSError):
-                return set()
-        return set()
+                yield f
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
 
-    def _save(self):
-        with open(self.state_path, "w") as f:
-            json.dump(sorted(self.processed), f)
+    @staticmethod
+    def _file_id(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _load_snapshot(self):
+        """(processed, failed) from the snapshot. Older snapshots are a bare
+        chapter list."""
+        if not os.path.exists(self.state_path):
+            return set(), {}
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            if isinstance(state, list):
+                return {int(c) for c in state}, {}
+            failed = {}
+            for c, entry in state.get("failed", {}).items():
+                attempts, at = entry if isinstance(entry, list) else (entry, 0)
+                failed[int(c)] = (int(attempts), float(at))
+            return {int(c) for c in state["processed"]}, failed
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            # Never fall back to an empty set: to the bot that means "post
+            # every chapter again".
+            raise ValueError(f"unreadable reconcile state {self.state_path}: {e}; "
+                             f"fix or remove it (removing it re-posts/re-uploads "
+                             f"the backlog unless it's marked again)") from e
+
+    def _catch_up(self):
+        """Bring ``processed`` up to date with the files. Caller holds the lock."""
+        snapshot_id = self._file_id(self.state_path)
+        log_id = self._file_id(self.log_path)
+        log_size = log_id[2] if log_id else 0
+        if snapshot_id != self._snapshot_id or log_size < self._log_pos:
+            # First read, or another process compacted: start over.
+            self.processed, self.failed = self._load_snapshot()
+            self._snapshot_id = snapshot_id
+            self._log_pos = 0
+        if log_size == self._log_pos:
+            return
+        with open(self.log_path, "rb") as f:
+            f.seek(self._log_pos)
+            data = f.read()
+        data = data[:data.rfind(b"\n") + 1]  # a torn last line isn't an op yet
+        for line in data.split():
+            self._apply(line.decode("ascii", "replace"))
+        self._log_pos += len(data)
+
+    def _apply(self, op):
+        number, _, at = op[1:].partition("@")
+        try:
+            chapter = int(number)
+            at = float(at or 0)
+        except ValueError:
+            return
+        if op[0] == "+":
+            self.processed.add(chapter)
+            self.failed.pop(chapter, None)
+        elif op[0] == "-":
+            self.processed.discard(chapter)
+            self.failed.pop(chapter, None)
+        elif op[0] == "!" and chapter not in self.processed:
+            attempts, _ = self.failed.get(chapter, (0, 0))
+            self.failed[chapter] = (attempts + 1, at)
+
+    def _append(self, ops):
+        """Durably append ops (after catching up on everyone else's)."""
+        if not ops:
+            return
+        data = "".join(f"{op}\n" for op in ops).encode("ascii")
+        with self._locked(fcntl.LOCK_EX) as f:
+            self._catch_up()
+            if os.path.getsize(self.log_path) > self._log_pos:
+                f.truncate(self._log_pos)  # drop a write torn by a crash
+            f.write(data)
+            sync(f)
+            for op in ops:
+                self._apply(op)
+            self._log_pos += len(data)
+            if self._log_pos >= self._COMPACT_BYTES:
+                self._compact(f)
+
+    def _compact(self, log):
+        """Fold the log into a fresh snapshot. Caller holds the lock."""
+        atomic_write(self.state_path, json.dumps({
+            "processed": sorted(self.processed),
+            "failed": {str(c): list(entry) for c, entry in sorted(self.failed.items())},
+        }))
+        log.truncate(0)
+        self._snapshot_id = self._file_id(self.state_path)
+        self._log_pos = 0
+
+    def compact(self):
+        with self._locked(fcntl.LOCK_EX) as f:
+            self._catch_up()
+            self._compact(f)
 
     def reload(self):
-        """Re-read the processed set from disk. Lets a long-running consumer (the
-        bot) pick up marks written by another process (the opctl helper) between
-        polls, instead of only at startup."""
-        self.processed = self._load()
+        """Catch up on marks written by another process (the opctl helper, the
+        downloader) since the last read. Only the log tail appended since then
+        is read, unless the state was compacted meanwhile."""
+        if not os.path.exists(self.log_path):
+            self._catch_up()  # nothing appended yet; don't create the log just to read
+            return self.processed
+        with self._locked(fcntl.LOCK_SH):
+            self._catch_up()
         return self.processed
 
     def pending(self):
-        """Chapters present in storage that this consumer hasn't handled yet."""
-        return [c for c in self.storage.list_chapters() if c not in self.processed]
+        """Chapters present in storage that this consumer hasn't handled yet:
+        those added (or un-marked for this consumer) since the last
+        ``advance()``, or everything on a rescan, plus earlier failures still
+        whose retry is due. Failures still backing off are left out."""
+        rescan_due = (self.rescan_interval > 0
+                      and time.monotonic() - self._rescanned_at >= self.rescan_interval)
+        if rescan_due:
+            events, self._cursor = None, self.storage.journal.position()
+        else:
+            events, self._cursor = self.reader.read()
+        if events is None:
+            self._rescanned_at = time.monotonic()
+            chapters = self.storage.list_chapters()
+        else:
+            if not events:
+                self._cursor = None  # nothing new; the offset is already there
+            wanted = {int(e["chapter"]) for e in events if self._wants(e)}
+            chapters = sorted(c for c in wanted | set(self.failed)
+                              if self.storage.has_chapter(c))
+        now = time.time()
+        self._pending = [c for c in chapters
+                         if c not in self.processed and self.retry_at(c) <= now]
+        return list(self._pending)
+
+    def _wants(self, event):
+        if event.get("type") in ("chapter_added", "meta_updated"):
+            return True
+        return event.get("type") == "chapter_unmarked" and event.get("consumer") == self.name
+
+    def advance(self):
+        """Commit the journal offset reached by the last ``pending()``, once
+        every chapter it returned is marked or recorded as failed (failures
+        are retried from that record, not by re-reading the journal). If one
+        is neither — it was skipped without a ``fail()`` — the offset stays
+        put and the next ``pending()`` returns it again."""
+        if self._cursor is None:
+            return False
+        if any(c not in self.processed and c not in self.failed for c in self._pending):
+            return False
+        self.reader.commit(self._cursor)
+        self._cursor = None
+        return True
 
     def is_done(self, chapter):
         return int(chapter) in self.processed
 
+    def retry_at(self, chapter):
+        """When a failed chapter is due for another attempt (unix time); 0 if
+        it hasn't failed."""
+        attempts, at = self.failed.get(int(chapter), (0, 0))
+        if not attempts:
+            return 0
+        return at + min(self.backoff_max, self.backoff * 2 ** (attempts - 1))
+
+    def fail(self, chapter):
+        """Record a failed attempt at a chapter. ``pending()`` returns it again
+        once the backoff for its attempt count has passed."""
+        chapter = int(chapter)
+        self._append([f"!{chapter}@{time.time():.0f}"])
+        attempts, _ = self.failed.get(chapter, (0, 0))
+        delay = self.retry_at(chapter) - time.time()
+        print(f"[reconcile] {self.name}: chapter {chapter} failed {attempts} time(s); "
+              f"retrying in {max(0, delay) / 60:.0f} min (opctl failures lists these)")
+
     def mark(self, chapter):
-        self.processed.add(int(chapter))
-        self._save()
+        self._append([f"+{int(chapter)}"])
+
+    def mark_many(self, chapters):
+        """Mark several chapters with one append."""
+        self._append([f"+{int(c)}" for c in chapters])
 
     def unmark(self, chapter):
-        """Forget a chapter so this consumer handles it again (e.g. to re-post or
-        re-upload a corrected chapter)."""
-        self.processed.discard(int(chapter))
-        self._save()
+        """Forget a chapter (and its failed attempts) so this consumer handles
+        it again (e.g. to re-post or re-upload a corrected chapter)."""
+        self._append([f"-{int(chapter)}"])
+        self.storage.record("chapter_unmarked", chapter=int(chapter), consumer=self.name)
 
     def mark_all_present(self):
         """Treat everything currently in storage as already handled (used to
         avoid re-posting/re-uploading the existing backlog on first run)."""
-        for c in self.storage.list_chapters():
-            self.processed.add(c)
-        self._save()
+        self.mark_many(c for c in self.storage.list_chapters() if c not in self.processed)
@@ -0,0 +1,135 @@
+"""Cached index of the source site's table of contents.
+
+Every chapter lookup used to download and parse the whole TOC page and scan
+every ``<a>`` tag. ``TableOfContents`` parses it once into a
+``{chapter number: url}`` dict and keeps it for ``TOC_TTL`` seconds; after that
+it revalidates with a conditional GET (ETag / Last-Modified), so an unchanged
+TOC costs a 304 with no body. A pass serving a backlog of requests therefore
+fetches the TOC once and each lookup is a dict hit.
+
+A lookup that misses (the chapter isn't listed yet) revalidates early, but at
+most once per ``TOC_MISS_RECHECK`` seconds, so a freshly released chapter is
+seen promptly without every miss costing a request.
+
+On release day the downloader forces a revalidation per check
+(``refresh(force=True)``, see MangaDownloader.probe_many), so "which of the
+next chapters are listed yet?" costs one small conditional request, and
+``fingerprint`` tells callers whether the set of chapter links changed at all.
+That's only cheap if the source supports it: ``cheap`` says whether the last
+response carried a validator and most recent revalidations came back 304.
+When it doesn't, each forced refresh is a full GET, and the downloader keeps
+its normal cadence instead of bursting.
+
+Env:
+  TOC_TTL            seconds a parsed TOC is trusted without revalidating (default 300)
+  TOC_MISS_RECHECK   min seconds between revalidations triggered by misses (default 30)
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from bs4 import BeautifulSoup
+
+# Chapter links look like ".../one-piece-chapter-1176/". The lookahead keeps
+# chapter 117 from matching a link to 1176.
+_CHAPTER_HREF_RE = re.compile(r"one-piece-chapter-(\d+)(?!\d)")
+
+# ``cheap`` judges the 304 rate over this many recent conditional requests,
+# once it has at least _MIN_SAMPLES of them.
+_SAMPLES = 20
+_MIN_SAMPLES = 5
+_MIN_NOT_MODIFIED = 0.5
+
+
+def parse_index(html):
+    """Map chapter number -> first link to it on the page."""
+    soup = BeautifulSoup(html, 'html.parser')
+    index = {}
+    for link in soup.find_all('a', href=True):
+        m = _CHAPTER_HREF_RE.search(link['href'])
+        if m:
+            index.setdefault(int(m.group(1)), link['href'])
+    return index
+
+
+class TableOfContents:
+    def __init__(self, transport, url, ttl=None, miss_recheck=None):
+        g = os.environ.get
+        self.transport = transport
+        self.url = url
+        self.ttl = float(ttl if ttl is not None else g("TOC_TTL", 300))
+        self.miss_recheck = float(miss_recheck if miss_recheck is not None
+                                  else g("TOC_MISS_RECHECK", 30))
+        self.index = {}
+        self._etag = None
+        self._last_modified = None
+        self._checked_at = None  # monotonic time of the last fetch/revalidation
+        self._not_modified = deque(maxlen=_SAMPLES)  # conditional request -> got a 304?
+        self._lock = threading.Lock()
+
+    def _age(self):
+        if self._checked_at is None:
+            return float("inf")
+        return time.monotonic() - self._checked_at
+
+    def refresh(self, force=False):
+        """Make sure the index is current: no-op while within the TTL (unless
+        ``force``), otherwise a conditional GET. Returns True if the TOC changed."""
+        with self._lock:
+            if not force and self._age() < self.ttl:
+                return False
+            headers = {}
+            if self.index:
+                if self._etag:
+                    headers["If-None-Match"] = self._etag
+                if self._last_modified:
+                    headers["If-Modified-Since"] = self._last_modified
+            response = self.transport.get(self.url, headers=headers)
+            if headers:
+                self._not_modified.append(response.status_code == 304)
+            if response.status_code == 304:
+                self._checked_at = time.monotonic()
+                return False
+            response.raise_for_status()
+            index = parse_index(response.content)
+            changed = index != self.index
+            self.index = index
+            self._etag = response.headers.get("ETag")
+            self._last_modified = response.headers.get("Last-Modified")
+            self._checked_at = time.monotonic()
+            return changed
+
+    def lookup(self, chapter):
+        """URL for a chapter, or None if the TOC doesn't list it."""
+        chapter = int(chapter)
+        self.refresh()
+        if chapter not in self.index and self._age() >= self.miss_recheck:
+            self.refresh(force=True)
+        return self.index.get(chapter)
+
+    @property
+    def cheap(self):
+        """Whether revalidating is likely a bodyless 304: the last full response
+        had an ETag or Last-Modified, and (once there are enough samples) at
+        least half of the recent conditional requests got a 304. False before
+        the first fetch."""
+        if self._checked_at is None or not (self._etag or self._last_modified):
+            return False
+        if len(self._not_modified) < _MIN_SAMPLES:
+            return True
+        return sum(self._not_modified) / len(self._not_modified) >= _MIN_NOT_MODIFIED
+
+    @property
+    def fingerprint(self):
+        """Short digest of the chapter link set; changes iff a link is added,
+        removed or repointed. None before the first fetch."""
+        if self._checked_at is None:
+            return None
+        digest = hashlib.sha1()
+        for chapter, url in sorted(self.index.items()):
+            digest.update(f"{chapter} {url}\n".encode())
+        return digest.hexdigest()[:12]
@@ -0,0 +1,83 @@
+"""Shared HTTP transport for the downloader.
+
+One pooled ``requests.Session`` per downloader instead of a bare ``requests.get``
+per call: connections (and TLS sessions) to the source site and its CDNs are
+reused across the table of contents, chapter page and every page image. Every
+request gets a connect/read timeout, so a stalled CDN can't hang a pass forever,
+and 5xx responses / connection errors are retried with jittered exponential
+backoff.
+
+The downloader takes a transport at construction, so a test (or a one-off
+script) can hand it its own — e.g. one whose session is mounted on a local
+stand-in server.
+
+Env:
+  HTTP_CONNECT_TIMEOUT   seconds to establish a connection (default 10)
+  HTTP_READ_TIMEOUT      seconds to wait for data between bytes (default 30)
+  HTTP_RETRIES           extra attempts on 5xx/connection errors (default 3)
+  HTTP_BACKOFF           base backoff in seconds, doubled per attempt (default 1)
+  HTTP_POOL_SIZE         pooled connections kept per host (default 16)
+"""
+
+import os
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+MAX_BACKOFF = 30.0
+
+
+class HttpTransport:
+    def __init__(self, session=None, connect_timeout=None, read_timeout=None,
+                 retries=None, backoff=None, pool_size=None):
+        g = os.environ.get
+        self.connect_timeout = float(connect_timeout or g("HTTP_CONNECT_TIMEOUT", 10))
+        self.read_timeout = float(read_timeout or g("HTTP_READ_TIMEOUT", 30))
+        self.retries = int(retries if retries is not None else g("HTTP_RETRIES", 3))
+        self.backoff = float(backoff if backoff is not None else g("HTTP_BACKOFF", 1))
+        if session is None:
+            pool = int(pool_size or g("HTTP_POOL_SIZE", 16))
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool, pool_maxsize=pool)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def _sleep_before_retry(self, attempt, url, why):
+        # "Full jitter": a random wait up to the exponential cap, so parallel page
+        # fetches that failed together don't retry in lockstep.
+        delay = random.uniform(0, min(MAX_BACKOFF, self.backoff * (2 ** attempt)))
+        print(f"[http] {why} for {url}; retry {attempt + 1}/{self.retries} in {delay:.1f}s")
+        time.sleep(delay)
+
+    def request(self, method, url, **kwargs):
+        """Send a request, retrying 5xx responses and connection errors/timeouts.
+        Returns the final response (which may still be a 5xx after the last
+        attempt — callers decide with ``raise_for_status``). 4xx is never retried."""
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last:
+                    raise
+                self._sleep_before_retry(attempt, url, type(e).__name__)
+                continue
+            if response.status_code >= 500 and not last:
+                response.close()
+                self._sleep_before_retry(attempt, url, f"HTTP {response.status_code}")
+                continue
+            return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,79 @@
+"""Compiled allow/block filter for page image URLs.
+
+``MangaDownloader.is_allowed`` used to ``re.search`` every pattern in
+BLOCKED_PATTERNS and ALLOWED_DOMAINS for every image URL. ``UrlFilter`` folds
+each list into one compiled alternation (blocked case-sensitive, allowed
+case-insensitive — the same flags as before).
+
+Page URLs are unique per chapter, so decisions aren't cached per URL; what
+repeats is the host. The allow half of a decision is memoized per host: a
+host matched by an allowed pattern (one without anchors or lookarounds, so a
+match inside the host is a match inside the URL) allows every URL on it
+without searching the path. Path markers ("wp-content", "cdn") and every
+block pattern are still checked against the whole URL.
+
+``filter_for`` hands out one compiled filter per pair of pattern lists, so
+callers passing custom lists don't recompile them per URL.
+
+Stdlib only.
+"""
+
+import os
+import re
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+
+def env_extra_hosts():
+    """Extra allowed hosts from ALLOWED_IMAGE_HOSTS (comma/space-separated),
+    regex-escaped. Read once, when the downloader module is imported."""
+    raw = os.environ.get("ALLOWED_IMAGE_HOSTS", "")
+    return [re.escape(h) for h in re.split(r"[,\s]+", raw.strip()) if h]
+
+
+def _alternation(patterns, flags=0):
+    """One regex matching if any pattern matches, or None for an empty list.
+    Each pattern is wrapped in a non-capturing group so alternation can't
+    bleed across them."""
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{p})" for p in patterns), flags)
+
+
+def _host_safe(pattern):
+    """Whether a match of ``pattern`` inside the host implies one inside the
+    URL: no anchors or lookarounds, whose meaning changes on a substring."""
+    return not re.search(r"\^|\$|\\[AZ]|\(\?[=!<]", pattern)
+
+
+class UrlFilter:
+    def __init__(self, allowed, blocked, cache_size=4096):
+        self.allowed = list(allowed)
+        self.blocked = list(blocked)
+        self._blocked_re = _alternation(self.blocked)
+        self._allowed_re = _alternation(self.allowed, re.IGNORECASE)
+        self._host_re = _alternation([p for p in self.allowed if _host_safe(p)],
+                                     re.IGNORECASE)
+        self._host_allowed = lru_cache(maxsize=cache_size)(self._host_allowed_uncached)
+
+    def _host_allowed_uncached(self, host):
+        return self._host_re is not None and self._host_re.search(host) is not None
+
+    def __call__(self, url):
+        # Block junk first.
+        if self._blocked_re is not None and self._blocked_re.search(url):
+            return False
+        if self._host_allowed(urlsplit(url).hostname or ""):
+            return True
+        # Allow if any pattern matches the whole URL (host OR path) — path
+        # markers like "wp-content" need the full URL, not just the host.
+        return self._allowed_re is not None and self._allowed_re.search(url) is not None
+
+    def cache_info(self):
+        return self._host_allowed.cache_info()
+
+
+@lru_cache(maxsize=32)
+def filter_for(allowed, blocked):
+    """The compiled UrlFilter for these pattern lists (tuples), built once."""
+    return UrlFilter(allowed, blocked)
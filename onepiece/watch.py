@@ -0,0 +1,220 @@
+"""Wake up when files in the shared storage change, instead of polling.
+
+The service loops used to sleep in fixed chunks and re-read their inputs each
+time (the downloader: ``expected_next.txt`` and ``requests/`` every
+REACT_INTERVAL; the bot and calibre: a full chapter rescan every poll). A
+``Watcher`` blocks until something under its paths changes or a timeout passes:
+
+    watcher = watch([storage.requests_dir, storage.expected_file])
+    while True:
+        if watcher.wait(timeout=3600):
+            ...  # something changed — react now
+
+On Linux it uses inotify (through ctypes; no extra dependency), so a change
+wakes the caller within milliseconds and an idle wait costs no I/O at all.
+Elsewhere, or if inotify is unavailable (no libc, watch limit reached), it
+falls back to the old behaviour: comparing a snapshot of the paths every
+``poll_interval`` seconds. inotify doesn't see writes made by another machine
+on a network filesystem, so the inotify watcher also compares snapshots every
+WATCH_RESCAN seconds as a safety net.
+
+Paths may be directories (any entry added, removed, rewritten or renamed) or
+files (watched through their directory; only that name counts). After the
+first event, ``wait`` keeps collecting until the paths have been quiet for
+``settle`` seconds, so a burst of writes — a PDF, then its CBZ and metadata —
+wakes the caller once, after the burst.
+
+Stdlib only.
+
+Env:
+  WATCH_BACKEND   auto (default) | inotify | poll
+  WATCH_RESCAN    seconds between safety-net snapshot checks under inotify (default 300)
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+# inotify(7) event masks.
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ATTRIB
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def _targets(paths):
+    """{directory: set of names to watch, or None for every entry}."""
+    targets = {}
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            targets[path] = None
+        else:
+            parent, name = os.path.split(path)
+            if parent in targets and targets[parent] is None:
+                continue
+            targets.setdefault(parent, set()).add(name)
+    return targets
+
+
+def _snapshot(targets):
+    """Names, sizes and mtimes of the watched entries — equal iff unchanged."""
+    state = []
+    for directory, names in sorted(targets.items()):
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            state.append((directory, None))
+            continue
+        for entry in entries:
+            if names is not None and entry.name not in names:
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            state.append((directory, entry.name, st.st_size, st.st_mtime_ns))
+    return sorted(state, key=repr)
+
+
+class PollingWatcher:
+    """Fallback: compare a snapshot of the paths every ``poll_interval`` seconds."""
+
+    backend = "poll"
+
+    def __init__(self, paths, poll_interval=60.0, settle=1.0):
+        self.targets = _targets(paths)
+        self.poll_interval = float(poll_interval)
+        self.settle = float(settle)
+        self._last = _snapshot(self.targets)
+
+    def wait(self, timeout=None):
+        """Block until a watched path changes (True) or ``timeout`` seconds
+        pass (False). None waits forever."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            time.sleep(self.poll_interval if remaining is None
+                       else min(self.poll_interval, remaining))
+            current = _snapshot(self.targets)
+            if current != self._last:
+                time.sleep(self.settle)  # let a burst of writes finish
+                self._last = _snapshot(self.targets)
+                return True
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """inotify-backed watcher (Linux). Raises OSError if inotify can't be set up."""
+
+    backend = "inotify"
+
+    def __init__(self, paths, rescan=None, settle=1.0):
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            raise OSError("libc not found")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.targets = _targets(paths)
+        self.settle = float(settle)
+        self.rescan = float(rescan if rescan is not None
+                            else os.environ.get("WATCH_RESCAN", 300))
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._wds = {}
+        try:
+            for directory in self.targets:
+                wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), _MASK)
+                if wd < 0:
+                    err = ctypes.get_errno()
+                    raise OSError(err, f"inotify_add_watch {directory}: {os.strerror(err)}")
+                self._wds[wd] = directory
+        except OSError:
+            os.close(self.fd)
+            raise
+        self._last = _snapshot(self.targets)
+
+    def _relevant(self):
+        """Drain pending events; True if any touched a watched name."""
+        hit = False
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return hit
+            if not buf:
+                return hit
+            offset = 0
+            while offset + _EVENT.size <= len(buf):
+                wd, mask, _, length = _EVENT.unpack_from(buf, offset)
+                offset += _EVENT.size
+                name = buf[offset:offset + length].split(b"\0", 1)[0]
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    hit = True
+                    continue
+                names = self.targets.get(self._wds.get(wd))
+                if names is None or os.fsdecode(name) in names:
+                    hit = True
+
+    def _ready(self, seconds):
+        readable, _, _ = select.select([self.fd], [], [], max(0.0, seconds))
+        return bool(readable)
+
+    def wait(self, timeout=None):
+        """Block until a watched path changes (True) or ``timeout`` seconds
+        pass (False). None waits forever."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            chunk = self.rescan if remaining is None else min(self.rescan, remaining)
+            if self._ready(chunk):
+                if not self._relevant():
+                    continue
+                # Let a burst of writes finish before waking the caller (but
+                # don't let a steady stream of writes hold it off forever).
+                settle_until = time.monotonic() + 30 * self.settle
+                while time.monotonic() < settle_until and self._ready(self.settle):
+                    self._relevant()
+                self._last = _snapshot(self.targets)
+                return True
+            # Safety net for changes inotify can't see (network filesystems).
+            current = _snapshot(self.targets)
+            if current != self._last:
+                self._last = current
+                return True
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def watch(paths, poll_interval=60.0, settle=1.0, backend=None):
+    """A watcher for ``paths``: inotify where available, else polling every
+    ``poll_interval`` seconds. ``backend`` (or WATCH_BACKEND) forces one."""
+    backend = (backend or os.environ.get("WATCH_BACKEND", "auto")).lower()
+    if backend != "poll":
+        try:
+            return InotifyWatcher(paths, settle=settle)
+        except (OSError, AttributeError) as e:
+            if backend == "inotify":
+                raise
+            print(f"[watch] inotify unavailable ({e}); polling every {poll_interval:.0f}s")
+    return PollingWatcher(paths, poll_interval=poll_interval, settle=settle)
@@ -49,13 +49,16 @@ def main(argv=None):
         return 0
 
     built = failed = 0
-    for ch in missing:
-        try:
-            pdf_to_cbz(storage.pdf_path(ch), storage.cbz_path(ch))
-            built += 1
-        except Exception as e:
-            print(f"[error] chapter {ch}: {e}")
-            failed += 1
+    # One sync for the whole run instead of an fsync per journal/catalog write.
+    with storage.batch():
+        for ch in missing:
+            try:
+                pdf_to_cbz(storage.pdf_path(ch), storage.cbz_path(ch))
+                storage.note_artifact(ch, "cbz")
+                built += 1
+            except Exception as e:
+                print(f"[error] chapter {ch}: {e}")
+                failed += 1
 
     print(f"done: {built} built, {failed} failed")
     return 1 if failed else 0
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Benchmark: full decode vs JPEG draft-mode decode for downscaled pages.
+
+Builds a synthetic 20-page chapter (2000x3000 JPEGs, noisy line art so the
+codec has real work) in a temp dir, then — each in a fresh subprocess so peak
+RSS is per-mode — decodes every page and downscales it to the target width the
+way the Discord-copy and preview paths do:
+
+  full   Image.open(p).convert("RGB") then a LANCZOS resize (the old path)
+  draft  onepiece.artifacts.open_rgb (1/2, 1/4 ... scale decode) then a
+         small LANCZOS resize
+
+Pages are held in memory until the end, as compress_pdf_to_size holds them.
+
+Usage (from the repo root, with Pillow installed):
+    python scripts/bench_decode.py
+    python scripts/bench_decode.py --width 800 --pages 20
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# Make `onepiece` importable when run straight from the repo root.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_chapter(directory, pages, size=(2000, 3000)):
+    from PIL import Image, ImageDraw
+
+    paths = []
+    w, h = size
+    for i in range(pages):
+        rnd = random.Random(i)
+        img = Image.effect_noise((w // 4, h // 4), 60).convert("RGB").resize(size)
+        draw = ImageDraw.Draw(img)
+        for _ in range(400):
+            x, y = rnd.randrange(w), rnd.randrange(h)
+            draw.line((x, y, x + rnd.randrange(-300, 300), y + rnd.randrange(-300, 300)),
+                      fill=(0, 0, 0), width=rnd.randrange(1, 6))
+        path = os.path.join(directory, f"bench_{i + 1}.jpeg")
+        img.save(path, "JPEG", quality=90)
+        paths.append(path)
+    return paths
+
+
+def child(mode, width, paths):
+    from PIL import Image
+    from onepiece.artifacts import fit_width, open_rgb
+
+    t = time.perf_counter()
+    held = []
+    for p in paths:
+        if mode == "full":
+            img = Image.open(p).convert("RGB")
+        else:
+            img = open_rgb(p, width)
+        held.append(fit_width(img, width))
+    secs = time.perf_counter() - t
+    # ru_maxrss is KiB on Linux.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"mode": mode, "seconds": secs, "peak_mb": peak,
+                      "size": list(held[0].size)}))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1000, help="target width, px (default 1000)")
+    parser.add_argument("--pages", type=int, default=20, help="chapter length (default 20)")
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.child[0], args.width, args.child[1:])
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"building a synthetic {args.pages}-page chapter in {tmp} ...")
+        paths = make_chapter(tmp, args.pages)
+        results = {}
+        for mode in ("full", "draft"):
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--width", str(args.width),
+                 "--child", mode, *paths],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            results[mode] = json.loads(out.strip().splitlines()[-1])
+
+    full, draft = results["full"], results["draft"]
+    print(f"decode + downscale to {args.width}px, {args.pages} pages:")
+    for r in (full, draft):
+        print(f"  {r['mode']:<6} {r['seconds']:6.2f}s  peak RSS {r['peak_mb']:7.1f}MB  "
+              f"page {r['size'][0]}x{r['size'][1]}")
+    print(f"  draft is {full['seconds'] / draft['seconds']:.1f}x faster, "
+          f"{full['peak_mb'] / draft['peak_mb']:.1f}x less peak memory")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
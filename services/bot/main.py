@@ -9,6 +9,7 @@ from PIL import Image
 from onepiece.storage import Storage, Reconciler
 from onepiece.downloader import MangaDownloader
 from onepiece.backup import sync_to_backup
+from onepiece.watch import watch
 
 # Load .env if present (no-op if python-dotenv isn't installed or no .env exists)
 try:
@@ -136,6 +137,7 @@ class MangaBotClient(discord.Client):
         self.storage = Storage()
         self.downloader = MangaDownloader(self.storage)
         self.reconciler = None
+        self.watcher = None
         self.channel_id = get_channel_id()
 
     async def on_ready(self):
@@ -168,9 +170,8 @@ class MangaBotClient(discord.Client):
     def _setup_autopost(self):
         if self.reconciler is not None:
             return  # already set up (on_ready can fire more than once)
-        state_path = os.path.join(self.storage.root, ".processed_bot.json")
-        first_run = not os.path.exists(state_path)
         self.reconciler = Reconciler(self.storage, "bot")
+        first_run = self.reconciler.new
 
         if self.channel_id is None:
             print("[autopost] DISCORD_CHANNEL_ID not set; auto-posting disabled")
@@ -184,6 +185,8 @@ class MangaBotClient(discord.Client):
                   f"existing chapter(s) as already posted")
 
         if not autopost_loop.is_running():
+            self.watcher = watch([self.storage.journal.path],
+                                 poll_interval=BOT_POLL_INTERVAL)
             autopost_loop.start()
             print(f"[autopost] watching {self.storage.root} for new chapters")
 
@@ -246,15 +249,26 @@ async def post_chapter(channel, chapter):
             print(f"[autopost] could not remove Discord copy for {chapter}: {e}")
 
 
-@tasks.loop(seconds=float(os.environ.get("BOT_POLL_INTERVAL", "60")))
+BOT_POLL_INTERVAL = float(os.environ.get("BOT_POLL_INTERVAL", "60"))
+
+
+@tasks.loop(seconds=0)
 async def autopost_loop():
     if bot.reconciler is None or bot.channel_id is None:
         return
+    await autopost_pass()
+    # Wait until the next journal event (a chapter landing, an opctl
+    # reprocess): inotify wakes us at once, else this polls.
+    await asyncio.to_thread(bot.watcher.wait, BOT_POLL_INTERVAL)
+
+
+async def autopost_pass():
     # Re-read processed state so marks written by the opctl helper (e.g.
     # `request --no-post`) are honored without restarting the bot.
     bot.reconciler.reload()
     pending = bot.reconciler.pending()
     if not pending:
+        bot.reconciler.advance()
         return
     channel = bot.get_channel(bot.channel_id)
     if channel is None:
@@ -268,8 +282,10 @@ async def autopost_loop():
             await post_chapter(channel, chapter)
             bot.reconciler.mark(chapter)
         except Exception as e:
-            # Leave unmarked so the next pass retries.
+            # Recorded so the journal offset can move on; later passes retry it.
             print(f"[autopost] failed to post chapter {chapter}: {e}")
+            bot.reconciler.fail(chapter)
+    bot.reconciler.advance()
 
 
 @autopost_loop.before_loop
@@ -280,18 +296,30 @@ async def _before_autopost():
 async def handle_download(interaction: discord.Interaction, url: str, chapter: int = None):
     await interaction.response.defer(ephemeral=True, thinking=True)
 
+    images = []
     try:
-        manga_title = bot.downloader.download_and_get_title(url, chapter)
+        # Fetch + parse the chapter page once; the download below reuses it
+        # instead of requesting the same page again for its images.
+        # Downloads block (network, and the job lock while the downloader is
+        # building the same chapter), so they run off the event loop.
+        page = await asyncio.to_thread(bot.downloader.fetch_page, url, chapter)
+        manga_title = page.title
+        print(manga_title)
         trim = trim_title(manga_title)
 
         if chapter:
-            path, images = bot.downloader.download_chapter(chapter, delete_images=False)
+            path, images = await asyncio.to_thread(
+                bot.downloader.download_chapter,
+                chapter, delete_images=False, page=page
+            )
         else:
             output_name = trim.replace(" ", "_").lower()
-            path, images = bot.downloader.download_from_url(
+            path, images = await asyncio.to_thread(
+                bot.downloader.download_from_url,
                 url,
                 output_name=output_name,
-                delete_images=False
+                delete_images=False,
+                page=page
             )
 
         if path is None or not images:
@@ -361,7 +389,8 @@ async def handle_download(interaction: discord.Interaction, url: str, chapter: i
         # ------------------------
         # Cleanup + state
         # ------------------------
-        bot.downloader.delete_images()
+        bot.downloader.delete_images(images)  # also lets other downloads of it run
+        images = []
         # Drop the compressed copy now that it's posted; full PDF stays.
         if os.path.exists(discord_copy):
             try:
@@ -378,7 +407,7 @@ async def handle_download(interaction: discord.Interaction, url: str, chapter: i
         # webapp too. Only for real chapter downloads (which build a CBZ) — a
         # raw /url grab doesn't. No-op if BACKUP_PATH is unset; never fatal.
         if chapter:
-            sync_to_backup(bot.storage)
+            await asyncio.to_thread(sync_to_backup, bot.storage)
 
         print(f"Chapter {'from URL' if not chapter else chapter} uploaded successfully")
 
@@ -387,6 +416,11 @@ async def handle_download(interaction: discord.Interaction, url: str, chapter: i
         await interaction.edit_original_response(
             content=f"❌ Failed to download{' chapter ' + str(chapter) if chapter else ' from URL'}"
         )
+    finally:
+        # Still holding the pages (and their job lock) after an error: the
+        # chapter is built either way, so they aren't needed for a retry.
+        if images:
+            bot.downloader.delete_images(images)
 
 
 @tree.command(name="napier", description="Check if Merphy Napier has a video for a specific One Piece chapter")
@@ -411,7 +445,7 @@ async def check_napier_video(interaction: discord.Interaction, chapter: int = No
 @tree.command(name="check", description="Check the latest chapter of One Piece")
 async def check_latest_chapter(interaction: discord.Interaction):
     chapter = bot.downloader.get_last_chapter() + 1
-    url = bot.downloader.get_url(chapter)
+    url = await asyncio.to_thread(bot.downloader.get_url, chapter)
     print(f'Latest chapter URL (probably {chapter}): {url}')
     await handle_download(interaction, url, chapter)
 
@@ -419,7 +453,7 @@ async def check_latest_chapter(interaction: discord.Interaction):
 @tree.command(name="chapter", description="Download a specific chapter of One Piece")
 @app_commands.describe(chapter="The chapter number to download")
 async def download_chapter(interaction: discord.Interaction, chapter: int):
-    url = bot.downloader.get_url(chapter)
+    url = await asyncio.to_thread(bot.downloader.get_url, chapter)
     print(f'Chapter {chapter} URL: {url}')
     await handle_download(interaction, url, chapter)
 
@@ -3,12 +3,13 @@
 
 A consumer like the bot: it reconciles against the shared storage and uploads
 each chapter PDF to Calibre-Web. On startup it backfills everything Calibre-Web
-is missing, then watches for new chapters.
+is missing, then tails the storage journal for new chapters.
 
 Env:
   CALIBRE_URL              base url, e.g. http://valhalla:8083  (required)
   CALIBRE_USERNAME/PASSWORD  Calibre-Web login
-  CALIBRE_POLL_INTERVAL    seconds between watch passes (default 300)
+  CALIBRE_POLL_INTERVAL    max seconds between passes (default 300); a new journal
+                           event wakes it at once via onepiece.watch
   CALIBRE_UPLOAD_FIELD, CALIBRE_AUTHOR/SERIES/TAGS  see client.py
   RUN_ONCE                 single pass then exit
 """
@@ -18,6 +19,7 @@ import time
 
 from onepiece.storage import Storage, Reconciler
 from onepiece.calibre import CalibreWebClient
+from onepiece.watch import watch
 
 try:
     from dotenv import load_dotenv
@@ -31,9 +33,8 @@ def backfill(storage, reconciler, client):
     existing = client.existing_chapter_numbers()
     if existing is None:
         return  # OPDS unreadable; rely on persisted reconcile state
-    for chapter in storage.list_chapters():
-        if chapter in existing and not reconciler.is_done(chapter):
-            reconciler.mark(chapter)
+    reconciler.mark_many(c for c in storage.list_chapters()
+                         if c in existing and not reconciler.is_done(c))
     print(f"[calibre] backfill: {len(existing & set(storage.list_chapters()))} "
           f"chapter(s) already in library")
 
@@ -43,6 +44,7 @@ def upload_pending(storage, reconciler, client):
     reconciler.reload()
     pending = reconciler.pending()
     if not pending:
+        reconciler.advance()
         return 0
     uploaded = 0
     for chapter in pending:
@@ -51,18 +53,22 @@ def upload_pending(storage, reconciler, client):
         pdf = storage.pdf_path(chapter)  # full quality for the library
         if not os.path.exists(pdf):
             print(f"[calibre] chapter {chapter} has no PDF on disk; skipping")
+            reconciler.fail(chapter)
             continue
         try:
             book_id = client.upload(pdf, title)
         except Exception as e:
             print(f"[calibre] upload error for chapter {chapter}: {e}")
+            reconciler.fail(chapter)
             continue
         if book_id is None and not _treat_unknown_id_as_success():
             print(f"[calibre] no book id for chapter {chapter}; will retry")
+            reconciler.fail(chapter)
             continue
         client.set_metadata(book_id, title, chapter)
         reconciler.mark(chapter)
         uploaded += 1
+    reconciler.advance()  # failures above are retried from the reconcile state
     if uploaded:
         print(f"[calibre] uploaded {uploaded} chapter(s)")
     return uploaded
@@ -93,12 +99,14 @@ def main():
 
     backfill(storage, reconciler, client)
 
+    # Every change (a chapter landing, `opctl reprocess`) is a journal event.
+    watcher = watch([storage.journal.path], poll_interval=interval)
     while True:
         upload_pending(storage, reconciler, client)
         if run_once:
             print("[calibre] RUN_ONCE set; exiting")
             return
-        time.sleep(interval)
+        watcher.wait(interval)
 
 
 if __name__ == "__main__":
@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
 """Downloader service: the producer in the pipeline.
 
-Runs forever. Each pass it (1) fulfills any chapter requests dropped by the
-webapp, then (2) checks for the next chapter(s), downloading PDF + preview +
-metadata into the shared storage. The poll cadence adapts via the release
+Runs forever. Each pass it queues jobs on an in-process priority scheduler
+(onepiece.scheduler): (1) the check for the next chapter(s), (2) any chapter
+requests dropped by opctl or the webapp, (3) rebuilds of missing CBZ /
+preview files and (4) an hourly sweep of the page store (onepiece.blobstore) —
+downloading PDF + preview + metadata into the shared storage. A release never
+waits behind a backlog of requests. The poll cadence adapts via the release
 heuristic so we check hard only when a chapter is plausibly due.
 
 The bot and calibre uploader watch the same storage and react to new PDFs;
@@ -12,22 +15,42 @@ this service never talks to them directly.
 Env:
   ONEPIECE_STORAGE        storage root (default: storage)
   START_CHAPTER           baseline if last_chapter.txt is empty (optional)
-  MAX_CATCHUP             max consecutive new chapters to grab per pass (default 3)
-  RUN_ONCE               if set, do a single pass and exit (for testing/cron)
-  CHECK_INTERVAL_*, WINDOW_START_DAYS, LONG_BREAK_DAYS  see release_schedule
+  MAX_CATCHUP             max consecutive new chapters to grab per pass (default 3;
+                          at least 1)
+  CATCHUP_WORKERS         chapters downloaded at once while catching up (default 2)
+  RUN_ONCE               if set, do a single pass (waiting for its jobs) and exit
+  REACT_INTERVAL          seconds between checks of requests/schedule when inotify
+                          isn't available (default 60; see onepiece.watch)
+  JOB_WORKERS             scheduler worker threads (default 2; see onepiece.scheduler)
+  REPAIR_ARTIFACTS        rebuild missing CBZ/preview files from the PDF in the
+                          background (default 1; needs PyMuPDF)
+  REQUEST_LEASE, REQUEST_BACKOFF, REQUEST_BACKOFF_MAX   see onepiece.requestqueue
+  BLOB_KEEP_CHAPTERS      newest chapters whose page images stay in the page store
+                          (default 20; see onepiece.blobstore)
+  BLOB_GC_INTERVAL        min seconds between page store sweeps (default 3600)
+  CHECK_INTERVAL_*, WINDOW_START_DAYS, LONG_BREAK_DAYS,
+  BURST_BEFORE_HOURS, BURST_AFTER_HOURS   see release_schedule
 """
 
+import io
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
+from onepiece.artifacts import save_preview
+from onepiece.cbz import pdf_page_image, pdf_to_cbz
 from onepiece.storage import Storage, Reconciler
 from onepiece.downloader import MangaDownloader
 from onepiece.backup import sync_to_backup
+from onepiece.scheduler import JobScheduler, OPCTL, RELEASE, REPAIR, WEBAPP
+from onepiece.watch import watch
 from onepiece.release_schedule import (
     ScheduleConfig,
     next_check_delay,
     expected_next_release,
+    in_burst_window,
 )
 
 
@@ -45,43 +68,129 @@ def latest_release_time(storage):
     return None
 
 
-def serve_requests(storage, downloader):
-    """Fulfill webapp-requested chapters. Successful ones are cleared; failures
-    are left in the queue to retry on a later pass.
+def serve_request(storage, downloader, ch, post_requested=False):
+    """Fulfill one queued chapter request. The request is claimed first, so
+    another downloader (or opctl) can't fetch the same chapter meanwhile;
+    it's finished on success (or if the chapter is already on disk), and a
+    failure puts it back in the queue to retry after a growing backoff.
 
-    By default a queued (webapp) request does NOT trigger a Discord post — it's
-    treated as a backfill. Set WEBAPP_REQUEST_POST=1 to let the bot post them.
+    By default a queued request does NOT trigger a Discord post — it's treated
+    as a backfill. Set WEBAPP_REQUEST_POST=1 to let the bot post them.
 
-    Returns how many chapters were freshly downloaded."""
-    post_requested = bool(os.environ.get("WEBAPP_REQUEST_POST"))
-    fetched = 0
-    for ch in storage.pending_requests():
+    Returns 1 if the chapter was freshly downloaded, else 0."""
+    if storage.claim_request(ch) is None:
+        return 0  # done, cancelled, or claimed by another worker
+    try:
         if storage.has_chapter(ch):
-            storage.clear_request(ch)
-            continue
+            storage.finish_request(ch)
+            return 0
         if not post_requested:
             # Mark the bot done BEFORE the PDF appears so its poll can't catch it
             # first. Calibre is left unmarked, so it still uploads the chapter.
             Reconciler(storage, "bot").mark(ch)
         print(f"[request] downloading requested chapter {ch}")
-        try:
-            pdf, _ = downloader.download_chapter(ch)
-        except Exception as e:
-            print(f"[request] error on chapter {ch}: {e}")
+        pdf, _ = downloader.download_chapter(ch)
+    except Exception as e:
+        storage.retry_request(ch, str(e))
+        raise
+    if not pdf:
+        delay = storage.retry_request(ch, "not available")
+        if delay is not None:
+            print(f"[request] chapter {ch} not available yet; retrying in "
+                  f"{delay / 60:.0f} min")
+        return 0
+    downloader.save_last_chapter(ch)
+    storage.finish_request(ch)
+    print(f"[request] chapter {ch} done")
+    return 1
+
+
+def queue_requests(storage, downloader, scheduler):
+    """One job per request that is due: opctl-queued ones ahead of webapp
+    ones. Requests in backoff or leased by another worker are skipped, and
+    already queued/running chapters are left as they are."""
+    post_requested = bool(os.environ.get("WEBAPP_REQUEST_POST"))
+    for req in storage.requests.ready():
+        ch = req["chapter"]
+        # opctl requests post like `opctl request` does (--no-post already
+        # marked the bot); webapp ones follow WEBAPP_REQUEST_POST.
+        opctl = req["source"] == "opctl"
+        scheduler.submit(f"chapter:{ch}", OPCTL if opctl else WEBAPP, then_backup(
+            storage, scheduler,
+            lambda ch=ch, post=opctl or post_requested:
+                serve_request(storage, downloader, ch, post)))
+
+
+def then_backup(storage, scheduler, fn):
+    """Wrap a job so that, if it fetched anything, a backup sync is queued
+    after it. Mirrors new chapters to the backup dir (NAS, etc.); a no-op when
+    BACKUP_PATH is unset and never fatal if the target is unavailable."""
+    def job():
+        fetched = fn()
+        if fetched:
+            scheduler.submit("backup", REPAIR, lambda: sync_to_backup(storage))
+        return fetched
+    return job
+
+
+def repair_chapter(storage, ch):
+    """Rebuild a chapter's missing CBZ and/or preview from its PDF. A failure
+    is recorded in the catalog, so a broken PDF isn't retried every pass."""
+    pdf = storage.pdf_path(ch)
+    try:
+        if not storage.has_cbz(ch):
+            pdf_to_cbz(pdf, storage.cbz_path(ch))
+            storage.note_artifact(ch, "cbz")
+        if not os.path.exists(storage.preview_path(ch)):
+            data, _ = pdf_page_image(pdf, 0)
+            save_preview(io.BytesIO(data), storage.preview_path(ch))
+            storage.note_artifact(ch, "preview")
+            print(f"[repair] preview rebuilt for chapter {ch}")
+    except Exception as e:
+        storage.refresh_catalog(ch)
+        storage.note_repair_failed(ch, e)
+        raise
+    storage.refresh_catalog(ch)  # also clears a stale "missing" flag
+
+
+def queue_repairs(storage, scheduler):
+    """Background jobs for chapters missing their CBZ or preview."""
+    if os.environ.get("REPAIR_ARTIFACTS", "1") in ("0", "false", "no", ""):
+        return
+    try:
+        import fitz  # noqa: F401 — PyMuPDF, only needed to read the PDFs
+    except ImportError:
+        return
+    catalog = storage.catalog
+    failed = catalog.repair_failed()
+    for ch in sorted(set(catalog.missing("cbz")) | set(catalog.missing("preview"))):
+        if ch in failed:
             continue
-        if pdf:
-            downloader.save_last_chapter(ch)
-            storage.clear_request(ch)
-            fetched += 1
-            print(f"[request] chapter {ch} done")
-        else:
-            print(f"[request] chapter {ch} not available yet; will retry")
-    return fetched
+        scheduler.submit(f"repair:{ch}", REPAIR,
+                         lambda ch=ch: repair_chapter(storage, ch))
 
 
-def check_new(storage, downloader, max_catchup):
+def collect_blobs(storage):
+    """Drop page blobs no recent chapter (or running job) uses. A no-op until
+    BLOB_GC_INTERVAL has passed since the last sweep."""
+    if not storage.blobs.gc_due():
+        return
+    removed, freed = storage.gc_blobs()
+    if removed:
+        print(f"[blobs] removed {removed} unreferenced page(s), {freed / 1e6:.1f} MB")
+
+
+def check_new(storage, downloader, max_catchup, workers=None):
     """Grab the next chapter(s) above last_chapter, catching up multiple if a gap
-    or multiple releases exist. Returns how many were fetched."""
+    or multiple releases exist. Returns how many were fetched.
+
+    One conditional TOC request says which of the next ``max_catchup`` chapters
+    are listed; the run of listed chapters from last+1 (up to the first one
+    that isn't) is downloaded up to ``workers`` (CATCHUP_WORKERS) at a time.
+    The pages come down in parallel, but each chapter is built, published
+    (metadata + journal event) and moves last_chapter strictly in order, so
+    consumers see them in order. After a failure, later chapters aren't
+    published; their pages are kept and the next pass resumes them."""
     last = storage.get_last_chapter()
     if last is None:
         start = os.environ.get("START_CHAPTER")
@@ -90,22 +199,70 @@ def check_new(storage, downloader, max_catchup):
                   "skipping new-chapter check")
             return 0
         last = int(start) - 1
+    if workers is None:
+        workers = int(os.environ.get("CATCHUP_WORKERS", "2"))
+
+    nxt = last + 1
+    print(f"[check] looking for chapter(s) {nxt}-{last + max_catchup}")
+    try:
+        # One conditional TOC request answers "is it out?" for the whole range;
+        # only a hit escalates to a full download. Keeps burst polling cheap.
+        listed = set(downloader.probe_many(range(nxt, nxt + max_catchup)))
+    except Exception as e:
+        print(f"[check] error probing for {nxt}: {e}")
+        return 0
+    run = []
+    for ch in range(nxt, nxt + max_catchup):
+        if ch not in listed:
+            break
+        run.append(ch)
+    if not run:
+        print(f"[check] chapter {nxt} not available yet")
+        return 0
+
+    # Publishing turn: chapter ``turn["next"]`` may publish; ``ok`` drops to
+    # False at the first failure, and no later chapter publishes.
+    cond = threading.Condition()
+    turn = {"next": run[0], "ok": True}
+
+    def wait_turn(ch):
+        with cond:
+            cond.wait_for(lambda: turn["next"] == ch)
+            return turn["ok"]
+
+    def end_turn(ch, ok):
+        with cond:
+            turn["ok"] = turn["ok"] and ok
+            if turn["ok"]:
+                downloader.save_last_chapter(ch)
+            turn["next"] = ch + 1
+            cond.notify_all()
 
-    fetched = 0
-    for _ in range(max_catchup):
-        nxt = last + 1
-        print(f"[check] looking for chapter {nxt}")
+    def fetch(ch):
+        """'present', 'fetched', or None on failure / not published."""
+        result = None
         try:
-            pdf, _ = downloader.download_chapter(nxt)
+            if storage.has_chapter(ch):
+                result = "present" if wait_turn(ch) else None
+            elif turn["ok"]:
+                pdf, _ = downloader.download_chapter(
+                    ch, publish_gate=lambda: wait_turn(ch))
+                if pdf:
+                    result = "fetched"
+                elif turn["ok"]:
+                    print(f"[check] chapter {ch} not available yet")
+                else:
+                    print(f"[check] chapter {ch} held back behind an earlier failure")
         except Exception as e:
-            print(f"[check] error fetching {nxt}: {e}")
-            break
-        if not pdf:
-            print(f"[check] chapter {nxt} not available yet")
-            break
-        downloader.save_last_chapter(nxt)
-        last = nxt
-        fetched += 1
+            print(f"[check] error fetching {ch}: {e}")
+        finally:
+            wait_turn(ch)  # already our turn if we published
+            end_turn(ch, result is not None)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(fetch, run))
+    fetched = results.count("fetched")
     if fetched:
         print(f"[check] fetched {fetched} new chapter(s)")
         # A real release happened — drop any manual schedule override so we revert
@@ -119,34 +276,54 @@ def expected_release_dt(storage):
     return storage.get_expected_release_dt()
 
 
-def wait_with_reactivity(storage, delay, chunk=60.0):
-    """Sleep up to `delay` seconds, but wake early if the schedule override or the
-    pending-request set changes, so the downloader reacts promptly to opctl/webapp.
-    Compares the full instant so a time-only edit (same date) still wakes us."""
+def wait_with_reactivity(storage, delay, chunk=60.0, watcher=None):
+    """Sleep up to `delay` seconds, but wake early if the schedule override
+    changes or a new request is queued, so the downloader reacts promptly to
+    opctl/webapp. Blocks on a file watcher (onepiece.watch: inotify, so a
+    request wakes us at once; else polling every `chunk` seconds). Compares the
+    full instant so a time-only edit (same date) still wakes us; requests that
+    merely disappear (fulfilled or cancelled) don't."""
+    own = watcher is None
+    if own:
+        watcher = watch([storage.requests_dir, storage.expected_file], poll_interval=chunk)
     baseline_sched = storage.get_expected_release_dt()
-    baseline_reqs = storage.pending_requests()
-    waited = 0.0
-    while waited < delay:
-        time.sleep(min(chunk, delay - waited))
-        waited += chunk
-        if storage.get_expected_release_dt() != baseline_sched:
-            print("[downloader] schedule changed; re-checking now")
-            return
-        if storage.pending_requests() != baseline_reqs:
-            print("[downloader] request queue changed; re-checking now")
-            return
+    baseline_reqs = set(storage.pending_requests())
+    deadline = time.monotonic() + delay
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not watcher.wait(remaining):
+                return
+            if storage.get_expected_release_dt() != baseline_sched:
+                print("[downloader] schedule changed; re-checking now")
+                return
+            reqs = set(storage.pending_requests())
+            if reqs - baseline_reqs:
+                print("[downloader] request queue changed; re-checking now")
+                return
+            baseline_reqs = reqs
+    finally:
+        if own:
+            watcher.close()
 
 
-def run_pass(storage, downloader, max_catchup):
-    fetched = serve_requests(storage, downloader)
-    fetched += check_new(storage, downloader, max_catchup)
-    # Mirror new PDFs to the backup dir (NAS, etc.). No-op when BACKUP_PATH is
-    # unset; never fatal if the backup target is unavailable.
-    if fetched:
-        sync_to_backup(storage)
-    # Heartbeat: record that we polled, so consumers (e.g. the Homepage widget)
-    # can show when the downloader last looked for chapters.
-    storage.save_last_check()
+def run_pass(storage, downloader, max_catchup, scheduler):
+    """Queue this pass's jobs and wait for the release check (the requests and
+    repairs carry on in the background while we sleep)."""
+    def release_check():
+        fetched = check_new(storage, downloader, max_catchup)
+        # Heartbeat: record that we polled, so consumers (e.g. the Homepage
+        # widget) can show when the downloader last looked for chapters.
+        storage.save_last_check()
+        return fetched
+
+    release = scheduler.submit("release-check", RELEASE,
+                               then_backup(storage, scheduler, release_check))
+    queue_requests(storage, downloader, scheduler)
+    queue_repairs(storage, scheduler)
+    if storage.blobs.gc_due():
+        scheduler.submit("blob-gc", REPAIR, lambda: collect_blobs(storage))
+    release.wait()
 
 
 def main():
@@ -154,30 +331,46 @@ def main():
     downloader = MangaDownloader(storage)
     cfg = ScheduleConfig.from_env()
     max_catchup = int(os.environ.get("MAX_CATCHUP", "3"))
+    if max_catchup < 1:
+        print(f"[downloader] MAX_CATCHUP={max_catchup} would never check for a "
+              f"chapter; using 1")
+        max_catchup = 1
     run_once = bool(os.environ.get("RUN_ONCE"))
     react_interval = float(os.environ.get("REACT_INTERVAL", "60"))
 
-    print(f"[downloader] starting; storage={storage.root} run_once={run_once}")
+    scheduler = JobScheduler()
+    watcher = watch([storage.requests_dir, storage.expected_file],
+                    poll_interval=react_interval)
+
+    print(f"[downloader] starting; storage={storage.root} run_once={run_once} "
+          f"job_workers={scheduler.workers}")
     print(f"[downloader] schedule {cfg}")
 
     while True:
-        run_pass(storage, downloader, max_catchup)
+        run_pass(storage, downloader, max_catchup, scheduler)
 
         if run_once:
+            scheduler.join()
             print("[downloader] RUN_ONCE set; exiting")
             return
 
         now = datetime.now(timezone.utc)
         last_rel = latest_release_time(storage)
         expected_dt = expected_release_dt(storage)
-        delay = next_check_delay(now, last_rel, cfg, expected_release=expected_dt)
+        # Burst polling is only worth it while TOC probes are 304s; a source
+        # without validators would get a full page every few seconds.
+        cheap = downloader.toc.cheap
+        delay = next_check_delay(now, last_rel, cfg, expected_release=expected_dt,
+                                 burst=cheap)
         if expected_dt:
             exp_display = f"{expected_dt.isoformat()} (manual)"
         else:
             exp_display = expected_next_release(last_rel)
+        burst = in_burst_window(now, expected_dt or expected_next_release(last_rel), cfg)
+        tag = (" [burst]" if cheap else " [no burst: TOC probes aren't 304s]") if burst else ""
         print(f"[downloader] last_release={last_rel} expected_next~{exp_display} "
-              f"sleeping {delay}s ({delay / 3600:.1f}h)")
-        wait_with_reactivity(storage, delay, react_interval)
+              f"sleeping {delay}s ({delay / 3600:.1f}h){tag}")
+        wait_with_reactivity(storage, delay, react_interval, watcher)
 
 
 if __name__ == "__main__":
@@ -9,6 +9,7 @@ drops a marker in the storage request queue, which the downloader fulfills.
 Env:
   ONEPIECE_STORAGE   storage root (shared volume)
   WEBAPP_PORT        listen port (default 8080)
+  STORAGE_CACHE_TTL  see onepiece/cache.py
 """
 
 import json
@@ -20,7 +21,7 @@ from fastapi import Body, FastAPI, HTTPException
 from fastapi.responses import FileResponse, HTMLResponse
 from starlette.staticfiles import StaticFiles
 
-from onepiece.storage import Storage
+from onepiece.cache import CachedStorage
 from onepiece.release_schedule import expected_next_release
 
 try:
@@ -29,7 +30,8 @@ try:
 except ImportError:
     pass
 
-storage = Storage()
+# Memoized reads, invalidated by the producer's generation bump (onepiece.cache).
+storage = CachedStorage()
 STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
 
 app = FastAPI(title="One Piece Library")
@@ -38,19 +40,16 @@ app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
 # --- framework-free helpers (unit-testable without FastAPI) ----------------
 def chapters_payload(store):
-    """Chapters present in storage, newest first, with display metadata."""
-    out = []
-    for ch in sorted(store.list_chapters(), reverse=True):
-        meta = store.read_meta(ch) or {}
-        out.append({
-            "chapter": ch,
-            "title": meta.get("title") or f"One Piece Chapter {ch}",
-            "pages": meta.get("pages"),
-            "downloaded_at": meta.get("downloaded_at"),
-            "has_preview": os.path.exists(store.preview_path(ch)),
-            "has_cbz": store.has_cbz(ch),
-        })
-    return out
+    """Chapters present in storage, newest first, with display metadata.
+    One query against the catalog rather than a file read per chapter."""
+    return [{
+        "chapter": row["chapter"],
+        "title": row["title"] or f"One Piece Chapter {row['chapter']}",
+        "pages": row["pages"],
+        "downloaded_at": row["downloaded_at"],
+        "has_preview": row["has_preview"],
+        "has_cbz": row["has_cbz"],
+    } for row in store.catalog.newest()]
 
 
 def enqueue_request(store, chapter):
@@ -77,11 +76,8 @@ SCHEDULE_ZONES = [
 def latest_release_dt(store):
     """When we fetched the newest chapter we have (aware UTC), or None — the basis
     for the auto heuristic, mirroring the downloader's latest_release_time."""
-    chapters = store.list_chapters()
-    if not chapters:
-        return None
-    meta = store.read_meta(max(chapters)) or {}
-    stamp = meta.get("downloaded_at")
+    newest = store.catalog.newest(1)
+    stamp = newest[0]["downloaded_at"] if newest else None
     if not stamp:
         return None
     try:
@@ -90,6 +86,17 @@ def latest_release_dt(store):
         return None
 
 
+def stats_payload(store):
+    newest = store.catalog.newest(1)
+    return {
+        "last_chapter": store.get_last_chapter(),
+        "file_count": store.catalog.count(),
+        "downloaded_at": newest[0]["downloaded_at"] if newest else None,
+        "pending_requests": len(store.pending_requests()),
+        "last_check": store.get_last_check(),
+    }
+
+
 def schedule_payload(store):
     """Current next-release estimate: a user-set instant ('manual') or the weekly
     auto-guess ('auto'). Drives the dashboard schedule panel."""
@@ -119,7 +126,7 @@ def schedule_payload(store):
 # --- API -------------------------------------------------------------------
 @app.get("/api/chapters")
 def api_chapters():
-    return chapters_payload(storage)
+    return storage.cached("api_chapters", lambda: chapters_payload(storage))
 
 
 @app.get("/api/requests")
@@ -130,15 +137,12 @@ def api_requests():
 @app.get("/api/stats")
 def api_stats():
     """Library status for dashboards (e.g. Homepage's Custom API widget)."""
-    chapters = storage.list_chapters()
-    newest_meta = storage.read_meta(chapters[-1]) if chapters else {}
-    return {
-        "last_chapter": storage.get_last_chapter(),
-        "file_count": len(chapters),
-        "downloaded_at": (newest_meta or {}).get("downloaded_at"),
-        "pending_requests": len(storage.pending_requests()),
-        "last_check": storage.get_last_check(),
-    }
+    payload = dict(storage.cached("api_stats", lambda: stats_payload(storage)))
+    # Polls and queue leases expiring don't bump the storage generation, so
+    # the cached copy of these may be stale.
+    payload["last_check"] = storage.get_last_check()
+    payload["pending_requests"] = len(storage.pending_requests())
+    return payload
 
 
 @app.post("/api/request/{chapter}")
@@ -170,6 +174,7 @@ def api_make_cbz(chapter: int):
         pdf_to_cbz(storage.pdf_path(chapter), storage.cbz_path(chapter))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"cbz build failed: {e}")
+    storage.note_artifact(chapter, "cbz")
     return {"status": "created", "chapter": chapter}
 
 
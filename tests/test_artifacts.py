@@ -0,0 +1,84 @@
+"""The single-pass artifact build (onepiece.artifacts, MangaDownloader.build_artifacts)."""
+
+import os
+import zipfile
+
+import pytest
+from PIL import Image
+
+from onepiece import artifacts
+from onepiece.artifacts import CbzSink, PdfSink, PreviewSink, run_sinks
+from onepiece.downloader import MangaDownloader
+from onepiece.storage import Storage
+
+
+def _pages(directory, count):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"page_{i + 1}.jpg")
+        Image.new("RGB", (240, 360), (40 * i % 255, 90, 160)).save(path, "JPEG")
+        paths.append(path)
+    return paths
+
+
+def test_run_sinks_reads_each_page_once(tmp_path, monkeypatch):
+    pages = _pages(str(tmp_path), 5)
+    opened = []
+    real_open = open
+
+    def counting_open(path, *args, **kwargs):
+        opened.append(path)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(artifacts, "open", counting_open, raising=False)
+    pdf, cbz, preview = (str(tmp_path / name) for name in ("c.pdf", "c.cbz", "c.png"))
+    run_sinks(pages, [PdfSink(pdf), CbzSink(cbz), PreviewSink(preview, width=120)])
+
+    assert [p for p in opened if p in pages] == pages
+    fitz = pytest.importorskip("fitz")
+    with fitz.open(pdf) as doc:
+        assert doc.page_count == 5
+    with zipfile.ZipFile(cbz) as z:
+        assert len(z.namelist()) == 5
+    with Image.open(preview) as img:
+        assert img.width == 120
+
+
+def test_run_sinks_discards_everything_on_failure(tmp_path):
+    pages = _pages(str(tmp_path), 3)
+
+    class Broken:
+        path = None
+
+        def add(self, index, path, data):
+            if index == 1:
+                raise RuntimeError("disk full")
+
+        def close(self):
+            raise AssertionError("closed after a failure")
+
+        def abort(self):
+            pass
+
+    pdf, cbz = str(tmp_path / "c.pdf"), str(tmp_path / "c.cbz")
+    with pytest.raises(RuntimeError, match="disk full"):
+        run_sinks(pages, [PdfSink(pdf), CbzSink(cbz), Broken()])
+    assert not os.path.exists(pdf)
+    assert not os.path.exists(cbz)
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in pages)
+
+
+def test_build_artifacts_leaves_no_temp_files_when_planning_fails(tmp_path, monkeypatch):
+    storage = Storage(str(tmp_path / "storage"))
+    pages = _pages(str(tmp_path), 3)
+    with open(pages[1], "wb") as f:
+        f.write(b"\xff\xd8 not really a jpeg" * 64)
+    monkeypatch.setenv("DISCORD_PDF_LIMIT", "1000")  # forces the compression plan
+
+    with pytest.raises(OSError):
+        MangaDownloader(storage).build_artifacts(
+            pages, storage.pdf_path(5), output_cbz=storage.cbz_path(5),
+            preview_image=storage.preview_path(5))
+    for directory in (storage.pdf_dir, storage.cbz_dir, storage.preview_dir,
+                      storage.discord_dir):
+        assert os.listdir(directory) == []
@@ -0,0 +1,92 @@
+"""The reconciler's state log and failure record (onepiece.storage.Reconciler).
+
+Run from the repo root: ``python -m pytest -q``.
+"""
+
+import os
+import time
+
+import pytest
+
+from onepiece.storage import Reconciler, Storage
+
+
+# ----- reconciler state ------------------------------------------------------
+@pytest.fixture
+def storage(tmp_path):
+    return Storage(str(tmp_path))
+
+
+def test_reconciler_compacts_log_into_snapshot(storage, monkeypatch):
+    monkeypatch.setattr(Reconciler, "_COMPACT_BYTES", 32)
+    r = Reconciler(storage, "bot")
+    for ch in range(1, 21):
+        r.mark(ch)
+    r.unmark(4)
+
+    assert os.path.exists(r.state_path)
+    assert os.path.getsize(r.log_path) < 32
+    other = Reconciler(storage, "bot")
+    assert other.processed == set(range(1, 21)) - {4}
+
+    # A process that read before the compaction catches up after it.
+    r.mark(4)
+    assert other.reload() == set(range(1, 21))
+
+
+def test_reconciler_ignores_and_drops_a_torn_line(storage):
+    r = Reconciler(storage, "calibre")
+    r.mark(1)
+    with open(r.log_path, "ab") as f:
+        f.write(b"+12")  # crash mid-append: no newline
+
+    other = Reconciler(storage, "calibre")
+    assert other.processed == {1}
+    other.mark(2)
+    with open(r.log_path, "rb") as f:
+        assert f.read() == b"+1\n+2\n"
+    assert r.reload() == {1, 2}
+
+
+def test_failed_chapter_does_not_pin_the_journal(storage, monkeypatch):
+    monkeypatch.setenv("RECONCILE_BACKOFF", "60")
+    r = Reconciler(storage, "bot")
+    r.pending()
+    r.advance()
+    for ch in (1, 2):
+        with open(storage.pdf_path(ch), "wb") as f:
+            f.write(b"%PDF-1.4\n")
+        storage.write_meta(ch, title=f"Chapter {ch}")
+
+    assert r.pending() == [1, 2]
+    r.mark(1)
+    r.fail(2)
+    assert r.advance()
+    assert r.pending() == []  # backing off
+
+    clock = time.time()
+    monkeypatch.setattr(time, "time", lambda: clock + 61)
+    assert r.pending() == [2]  # retried from the failure record
+    r.fail(2)
+    assert r.retry_at(2) == pytest.approx(clock + 61 + 120, abs=1)
+    assert r.pending() == []
+
+    # Never given up on: due again once the doubled backoff passes, and the
+    # record survives a restart and compaction.
+    monkeypatch.setattr(time, "time", lambda: clock + 61 + 121)
+    r.compact()
+    again = Reconciler(storage, "bot")
+    assert again.failed[2][0] == 2
+    assert again.pending() == [2]
+    again.mark(2)
+    assert 2 not in again.failed
+
+
+def test_unmark_retries_a_failing_chapter_now(storage):
+    r = Reconciler(storage, "calibre")
+    with open(storage.pdf_path(3), "wb") as f:
+        f.write(b"%PDF-1.4\n")
+    r.fail(3)
+    assert r.pending() == []
+    r.unmark(3)
+    assert r.pending() == [3]
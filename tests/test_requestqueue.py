@@ -0,0 +1,69 @@
+"""Request queue leases: the claim race, expiry, renewal and retry backoff."""
+
+import os
+import threading
+import time
+
+from onepiece.requestqueue import RequestQueue
+
+
+def test_claim_race_has_one_winner(tmp_path):
+    queues = [RequestQueue(str(tmp_path)) for _ in range(8)]
+    queues[0].enqueue(5)
+    barrier = threading.Barrier(len(queues))
+    wins = []
+
+    def claim(q):
+        barrier.wait()
+        if q.claim(5) is not None:
+            wins.append(q)
+
+    threads = [threading.Thread(target=claim, args=(q,)) for q in queues]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(wins) == 1
+    assert sorted(os.listdir(tmp_path)) == ["5.lease"]
+    assert queues[0].enqueue(5) == "leased"
+    assert wins[0].complete(5)
+    assert os.listdir(tmp_path) == []
+
+
+def test_expired_lease_is_requeued_and_old_owner_loses_it(tmp_path):
+    a, b = RequestQueue(str(tmp_path)), RequestQueue(str(tmp_path))
+    a.enqueue(7)
+    assert a.claim(7) is not None
+    a._stop_heartbeat(7)  # the holder died
+
+    assert b.ready() == []  # still within the lease
+    b.ready(now=time.time() + a.lease_seconds + 1)  # puts it back
+    assert b.entries() == {7: "request"}
+    assert [r["chapter"] for r in b.ready()] == [7]
+    assert b.claim(7) is not None
+    assert not a.complete(7)  # the lease is b's now
+    assert b.complete(7)
+
+
+def test_heartbeat_keeps_a_slow_claim(tmp_path):
+    q = RequestQueue(str(tmp_path))
+    q.lease_seconds = 0.3
+    q.enqueue(9)
+    q.claim(9)
+    try:
+        time.sleep(1.0)
+        q.ready()
+        assert q.entries() == {9: "lease"}
+    finally:
+        assert q.complete(9)
+
+
+def test_release_backs_off_and_rerequest_makes_due(tmp_path):
+    q = RequestQueue(str(tmp_path))
+    q.enqueue(3)
+    q.claim(3)
+    assert q.release(3, "not available") == q.backoff
+    assert q.ready() == []
+    assert q.enqueue(3) == "raised"
+    assert [r["attempts"] for r in q.ready()] == [1]
@@ -0,0 +1,92 @@
+"""Per-job scratch dirs and job locks (Storage.acquire_job / remove_job)."""
+
+import os
+import threading
+
+from onepiece.atomic import temp_path
+from onepiece.downloader import MangaDownloader
+from onepiece.storage import Storage
+
+
+def _fake_build(downloader, tag, built):
+    """Stand-in for _download_chapter: writes the chapter's pages into the job
+    dir and, like the real one, removes the dir itself when not keeping them."""
+    def build(chapter, delete_images, page, job_dir, publish_gate=None):
+        pages = []
+        for i in range(3):
+            path = os.path.join(job_dir, f"{chapter}_{i + 1}.jpg")
+            with open(path, "w") as f:
+                f.write(tag)
+            pages.append(path)
+        built.append(tag)
+        if delete_images:
+            downloader.storage.remove_job(job_dir)
+        return f"{chapter}.pdf", pages
+    return build
+
+
+def test_kept_pages_survive_a_concurrent_build_of_the_same_chapter(tmp_path):
+    storage = Storage(str(tmp_path))
+    bot, service = MangaDownloader(storage), MangaDownloader(storage)
+    built = []
+    bot._download_chapter = _fake_build(bot, "bot", built)
+    service._download_chapter = _fake_build(service, "service", built)
+
+    _, pages = bot.download_chapter(12, delete_images=False)
+    other = threading.Thread(target=service.download_chapter, args=(12,))
+    other.start()
+    other.join(timeout=0.5)
+
+    # The service waits for the bot's job lock instead of removing its pages.
+    assert other.is_alive()
+    assert built == ["bot"]
+    for path in pages:
+        with open(path) as f:
+            assert f.read() == "bot"
+
+    bot.delete_images(pages)
+    other.join(timeout=5)
+    assert not other.is_alive()
+    assert built == ["bot", "service"]
+    assert os.listdir(storage.work_dir) == []
+
+
+def test_lock_job_serializes_and_cleans_up(tmp_path):
+    storage = Storage(str(tmp_path))
+    inside, peak = [], []
+    lock = threading.Lock()
+
+    def job():
+        with storage.lock_job(5) as job_dir:
+            with lock:
+                inside.append(1)
+                peak.append(len(inside))
+            open(os.path.join(job_dir, "page.jpg"), "w").close()
+            with lock:
+                inside.pop()
+            storage.remove_job(job_dir)
+
+    threads = [threading.Thread(target=job) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert max(peak) == 1
+    assert os.listdir(storage.work_dir) == []
+
+
+def test_startup_sweeps_stale_artifact_and_job_temp_files(tmp_path):
+    storage = Storage(str(tmp_path))
+    job_dir = storage.job_dir(12)
+    stale = [temp_path(os.path.join(d, "x")) for d in (storage.pdf_dir, storage.cbz_dir,
+                                                       storage.preview_dir, job_dir)]
+    fresh = temp_path(os.path.join(storage.pdf_dir, "y"))
+    for path in stale + [fresh]:
+        open(path, "w").close()
+    for path in stale:
+        os.utime(path, (0, 0))
+
+    assert Storage(str(tmp_path)).sweep_temp() == 0  # the constructor already ran it
+    assert not any(os.path.exists(p) for p in stale)
+    assert os.path.exists(fresh)
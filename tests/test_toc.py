@@ -0,0 +1,62 @@
+"""TOC revalidation cost and the release-burst cadence that depends on it."""
+
+from datetime import datetime, timedelta, timezone
+
+from onepiece.release_schedule import ScheduleConfig, next_check_delay
+from onepiece.toc import TableOfContents
+
+_HTML = b'<a href="/manga/one-piece-chapter-1160/">1160</a>'
+
+
+class _Response:
+    def __init__(self, status, headers=None):
+        self.status_code = status
+        self.headers = headers or {}
+        self.content = _HTML
+
+    def raise_for_status(self):
+        pass
+
+
+class _Transport:
+    def __init__(self, etag=None, honor=True):
+        self.etag = etag
+        self.honor = honor
+
+    def get(self, url, headers=None):
+        if self.honor and self.etag and (headers or {}).get("If-None-Match") == self.etag:
+            return _Response(304)
+        return _Response(200, {"ETag": self.etag} if self.etag else {})
+
+
+def _probe(toc, times):
+    for _ in range(times):
+        toc.refresh(force=True)
+
+
+def test_toc_with_validators_is_cheap():
+    toc = TableOfContents(_Transport(etag='"v1"'), "https://example.test/")
+    assert not toc.cheap  # nothing fetched yet
+    _probe(toc, 10)
+    assert toc.cheap
+    assert toc.index == {1160: "/manga/one-piece-chapter-1160/"}
+
+
+def test_toc_without_validators_or_304s_is_not_cheap():
+    bare = TableOfContents(_Transport(), "https://example.test/")
+    _probe(bare, 3)
+    assert not bare.cheap
+
+    ignored = TableOfContents(_Transport(etag='"v1"', honor=False), "https://example.test/")
+    _probe(ignored, 10)
+    assert not ignored.cheap
+
+
+def test_burst_only_when_probes_are_cheap():
+    cfg = ScheduleConfig()
+    expected = datetime(2026, 10, 18, 15, tzinfo=timezone.utc)
+    now = expected + timedelta(minutes=30)
+    last = expected - timedelta(days=7)
+    assert next_check_delay(now, last, cfg, expected_release=expected) == cfg.burst
+    assert next_check_delay(now, last, cfg, expected_release=expected,
+                            burst=False) == cfg.window